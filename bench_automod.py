@@ -0,0 +1,141 @@
+# =========================
+# automod 처리량 벤치마크 (한 코어)
+#   python bench_automod.py [--messages 300000] [--users 20000] [--guilds 50] [--spam 0.05]
+# 1) 엔진만: AUTOMOD.check(guild, user, content, mentions, now) — 가짜 시계로 초당 --rate 개 흐름
+# 2) 전체 경로: 실제 discord.Message 객체로 automod_check(message) (속성 꺼내기 포함)
+# 스팸 유저(--spam 비율)는 빠르게/같은 내용/멘션 폭탄을 섞어 보냄 → 규칙별 적발 수도 출력
+# =========================
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _user(uid: int) -> dict:
+    return {"id": str(uid), "username": f"user{uid}", "discriminator": "0", "avatar": None, "global_name": None}
+
+
+def _guild(gid: int) -> dict:
+    return {
+        "id": str(gid), "name": f"guild{gid}", "owner_id": "1", "member_count": 0, "members": [],
+        "roles": [{"id": str(gid), "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": str(gid + 1), "type": 0, "name": "general", "position": 0, "guild_id": str(gid)}],
+        "emojis": [], "stickers": [], "features": [],
+    }
+
+
+NORMAL = ["안녕하세요", "ㅋㅋㅋㅋ", "오늘 뭐함?", "점메추 좀", "그거 봤어?", "ㄹㅇ", "gg", "내일 보자"]
+
+
+def build_stream(args):
+    # (guild_id, user_id, content, mention_ids) 목록
+    rnd = random.Random(42)
+    gids = [(i + 1) * 10_000_000 for i in range(args.guilds)]
+    users = [(gids[u % len(gids)], 1_000_000_000 + u) for u in range(args.users)]
+    spammers = set(rnd.sample(range(args.users), int(args.users * args.spam)))
+    stream = []
+    n = 0
+    while n < args.messages:
+        u = rnd.randrange(args.users)
+        gid, uid = users[u]
+        if u in spammers:
+            kind = rnd.random()
+            if kind < 0.1:
+                mentions = [1_000_000_000 + rnd.randrange(args.users) for _ in range(8)]
+                burst = [(gid, uid, "핑 " + " ".join(f"<@{m}>" for m in mentions), mentions)]
+            elif kind < 0.6:
+                burst = [(gid, uid, "무료 니트로 받아가세요 discord.gift/xyz", [])] * 6
+            else:
+                burst = [(gid, uid, f"{rnd.choice(NORMAL)} {i}", []) for i in range(10)]
+            stream.extend(burst)
+            n += len(burst)
+        else:
+            stream.append((gid, uid, f"{rnd.choice(NORMAL)} {rnd.randrange(1000)}", []))
+            n += 1
+    return gids, stream[:args.messages]
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--messages", type=int, default=300_000)
+    p.add_argument("--users", type=int, default=20_000)
+    p.add_argument("--guilds", type=int, default=50)
+    p.add_argument("--spam", type=float, default=0.05, help="스팸 유저 비율")
+    p.add_argument("--rate", type=float, default=2000.0, help="가짜 시계 기준 초당 메시지 수")
+    args = p.parse_args()
+
+    os.environ.setdefault("DISCORD_TOKEN", "bench")
+    os.chdir(os.environ.get("TMPDIR", "/tmp"))  # sbot_data.json 등을 저장소 폴더에 만들지 않게
+    sys.path.insert(0, ROOT)
+    import discord
+    import sbot
+
+    gids, stream = build_stream(args)
+    print(f"messages={len(stream)} users={args.users} guilds={args.guilds} spam={args.spam:.0%}")
+
+    # 1) 엔진만
+    engine = sbot.AutoModEngine(sbot.AUTOMOD_STATE_SIZE, sbot.AUTOMOD_STATE_TTL)
+    rules: dict[str, int] = {}
+    step = 1.0 / args.rate
+    gc.collect()
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    now = 1000.0
+    for gid, uid, content, mentions in stream:
+        now += step
+        rule = engine.check(gid, uid, content, len(mentions), now)
+        if rule is not None:
+            rules[rule] = rules.get(rule, 0) + 1
+    dt = time.perf_counter() - t0
+    print(f"  engine: {len(stream) / dt:,.0f} msg/s ({dt / len(stream) * 1e6:.2f}µs/msg)  "
+          f"hits={rules}  tracked={len(engine)}  state RSS +{(rss_bytes() - rss0) / 1024 / 1024:.1f}MB")
+
+    # 2) 실제 Message 객체로 automod_check
+    state = sbot.client._connection
+    sbot.client.dispatch = lambda *a, **k: None
+    for gid in gids:
+        state._add_guild_from_data(_guild(gid))
+    channels = {gid: sbot.client.get_guild(gid).get_channel(gid + 1) for gid in gids}
+    for gid in gids:
+        sbot.CONFIG.set_automod(gid, True, None, None)  # 기본은 꺼짐 → 길드별로 켠 경로를 잼
+    messages = []
+    for i, (gid, uid, content, mentions) in enumerate(stream):
+        data = {
+            "id": str((i + 1) << 22), "channel_id": str(gid + 1), "guild_id": str(gid), "author": _user(uid),
+            "content": content, "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False,
+            "mention_everyone": False, "mentions": [_user(m) for m in mentions], "mention_roles": [],
+            "attachments": [], "embeds": [], "pinned": False, "type": 0,
+        }
+        messages.append(discord.Message(state=state, channel=channels[gid], data=data))
+
+    sbot.AUTOMOD = sbot.AutoModEngine(sbot.AUTOMOD_STATE_SIZE, sbot.AUTOMOD_STATE_TTL)
+    gc.collect()
+    t0 = time.perf_counter()
+    hits = 0
+    for msg in messages:
+        if sbot.automod_check(msg) is not None:
+            hits += 1
+    dt = time.perf_counter() - t0
+    # 여기선 실제 시계라 몰아서 넣은 메시지가 대부분 속도 규칙에 걸림 → 처리량만 볼 것
+    print(f"  on_message path: {len(messages) / dt:,.0f} msg/s ({dt / len(messages) * 1e6:.2f}µs/msg)  hits={hits}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,565 @@
+# =========================
+# 오프라인 부하 테스트: 가짜 게이트웨이 + 레이트리밋 있는 가짜 REST 서버로 sbot.py 실제 핸들러 돌리기
+#   python bench_load.py                       # 10 / 1000 / 10000 길드
+#   python bench_load.py --guilds 10 1000 --time-scale 1
+#   python bench_load.py --guilds 1000 --storage sqlite --store-delay 200   # 느린 저장소 (경고 읽기/쓰기마다 +200ms)
+#
+# - REST: 같은 프로세스 안 aiohttp 서버가 Discord API 흉내 (라우트별/글로벌 레이트리밋 + 429)
+#   discord.py HTTP 클라이언트를 그대로 쓰고 Route.BASE만 이 서버로 돌림
+# - 게이트웨이: GUILD_CREATE / INTERACTION_CREATE payload를 ConnectionState에 직접 넣음
+# - 시나리오: setlog → setauto → warn(누적 처벌 포함) → clear → auto_message_task 한 바퀴 → 삭제 큐
+# - 결과: 처리량, interaction 지연 p50/p99, REST 호출 수/429, 우선순위 클래스별 큐 대기, RSS
+# 길드 수마다 새 프로세스(임시 폴더)에서 돌림
+# =========================
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BOT_ID = 1
+APP_ID = 1
+ALL_PERMISSIONS = str((1 << 53) - 1)  # Discord는 관리자에게도 계산된 전체 비트를 보냄
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+# =========================
+# 가짜 payload
+# =========================
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _user(uid: int) -> dict:
+    return {"id": str(uid), "username": f"user{uid}", "discriminator": "0", "avatar": None, "global_name": None,
+            "bot": uid == BOT_ID}
+
+
+def _member(uid: int, permissions: str | None = None) -> dict:
+    m = {"user": _user(uid), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False,
+         "flags": 0, "communication_disabled_until": None}
+    if permissions is not None:
+        m["permissions"] = permissions
+    return m
+
+
+def _channel(cid: int, gid: int) -> dict:
+    return {"id": str(cid), "type": 0, "name": f"ch{cid}", "position": 0, "guild_id": str(gid),
+            "permission_overwrites": [], "nsfw": False, "parent_id": None}
+
+
+class Synthetic:
+    # 길드 gid: 채널 gid+1, 멤버 gid*100 + 1..members (1번이 관리자)
+    def __init__(self, guilds: int, members: int):
+        self.gids = [(i + 1) * 1_000_000 for i in range(guilds)]
+        self.members = members
+        self._ids = itertools.count(10_000)
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def guild(self, gid: int) -> dict:
+        return {
+            "id": str(gid), "name": f"guild{gid}", "owner_id": str(gid * 100 + 1), "member_count": self.members,
+            "roles": [{"id": str(gid), "name": "@everyone", "permissions": "8", "position": 0, "color": 0,
+                       "hoist": False, "managed": False, "mentionable": False}],
+            "channels": [_channel(gid + 1, gid)],
+            "members": [_member(BOT_ID)] + [_member(gid * 100 + i) for i in range(1, self.members + 1)],
+            "emojis": [], "stickers": [], "features": [],
+        }
+
+    def interaction(self, gid: int, name: str, options: list[dict], resolved: dict | None = None) -> dict:
+        iid = self.next_id()
+        invoker = gid * 100 + 1
+        data = {"id": str(self.next_id()), "name": name, "type": 1, "options": options, "guild_id": str(gid)}
+        if resolved:
+            data["resolved"] = resolved
+        return {
+            "id": str(iid), "application_id": str(APP_ID), "type": 2, "token": f"tok{iid}", "version": 1,
+            "guild_id": str(gid), "channel_id": str(gid + 1), "channel": _channel(gid + 1, gid),
+            "member": _member(invoker, permissions=ALL_PERMISSIONS), "app_permissions": ALL_PERMISSIONS,
+            "locale": "ko", "guild_locale": "ko", "entitlements": [], "authorizing_integration_owners": {},
+            "attachment_size_limit": 8 * 1024 * 1024,
+            "data": data,
+        }
+
+    def channel_option(self, gid: int) -> tuple[dict, dict]:
+        cid = gid + 1
+        ch = dict(_channel(cid, gid), permissions=ALL_PERMISSIONS)
+        return {"name": "channel", "type": 7, "value": str(cid)}, {"channels": {str(cid): ch}}
+
+    def setlog(self, gid: int) -> dict:
+        opt, resolved = self.channel_option(gid)
+        return self.interaction(gid, "setlog", [opt], resolved)
+
+    def setauto(self, gid: int) -> dict:
+        opt, resolved = self.channel_option(gid)
+        return self.interaction(gid, "setauto", [opt, {"name": "message", "type": 3, "value": "bench 자동 메시지"}], resolved)
+
+    def warn(self, gid: int, uid: int) -> dict:
+        member = {k: v for k, v in _member(uid, permissions="0").items() if k != "user"}
+        resolved = {"users": {str(uid): _user(uid)}, "members": {str(uid): member}}
+        opts = [{"name": "member", "type": 6, "value": str(uid)}, {"name": "reason", "type": 3, "value": "bench"}]
+        return self.interaction(gid, "warn", opts, resolved)
+
+    def clear(self, gid: int, count: int) -> dict:
+        return self.interaction(gid, "clear", [{"name": "count", "type": 4, "value": count}])
+
+
+# =========================
+# 가짜 REST 서버 (레이트리밋 포함)
+# =========================
+class MockDiscord:
+    # 라우트별 (limit, per초), 버킷은 major 파라미터(채널/길드/웹훅 토큰)별
+    LIMITS = {
+        "send": (5, 5.0),
+        "history": (5, 1.0),
+        "delete": (5, 1.0),
+        "bulk": (1, 1.0),
+        "member_edit": (10, 10.0),
+        "kick": (5, 1.0),
+        "followup": (5, 1.0),
+        "followup_edit": (5, 1.0),
+        "sync": (2, 60.0),
+    }
+    # 실제 디스코드처럼 interaction 웹훅(followup)은 글로벌 제한에서 빠짐
+    GLOBAL_EXEMPT = {"followup", "followup_edit"}
+
+    def __init__(self, time_scale: float, global_limit: int, history_per_channel: int):
+        from aiohttp import web
+        self.web = web
+        self.scale = time_scale
+        self.global_limit = global_limit
+        self.history_per_channel = history_per_channel
+        self.calls: dict[str, int] = {}
+        self.rate_limited: dict[str, int] = {}
+        self.buckets: dict[tuple, list] = {}
+        self.global_window = [0.0, 0]
+        self.history_left: dict[int, int] = {}
+        self.t0: dict[int, float] = {}
+        self.latency: dict[str, list[float]] = {}
+        self.pending: dict[int, asyncio.Future] = {}
+        self.command_of: dict[int, str] = {}
+        self._ids = itertools.count(1)
+
+    def snowflake(self) -> int:
+        ms = int(time.time() * 1000) - 1420070400000
+        return (ms << 22) + (next(self._ids) % (1 << 22))
+
+    def message(self, cid: int, content: str, webhook: bool = False) -> dict:
+        m = {"id": str(self.snowflake()), "channel_id": str(cid), "author": _user(BOT_ID), "content": content,
+             "timestamp": _now_iso(), "edited_timestamp": None, "tts": False, "mention_everyone": False,
+             "mentions": [], "mention_roles": [], "attachments": [], "embeds": [], "pinned": False, "type": 0,
+             "flags": 64 if webhook else 0}
+        if webhook:
+            m["webhook_id"] = str(APP_ID)
+        return m
+
+    def _limited(self, name: str | None, major: str | None, handler):
+        web = self.web
+
+        async def wrapped(request):
+            label = name or request.path.split("/")[3]
+            self.calls[label] = self.calls.get(label, 0) + 1
+            now = time.monotonic()
+            headers = {}
+            if name is not None and name not in self.GLOBAL_EXEMPT:
+                # 글로벌 (interaction 콜백/웹훅은 제외)
+                gw = self.global_window
+                if now - gw[0] >= self.scale:
+                    gw[0], gw[1] = now, 0
+                if gw[1] >= self.global_limit:
+                    self.rate_limited["global"] = self.rate_limited.get("global", 0) + 1
+                    retry = max(0.001, gw[0] + self.scale - now)
+                    return self._json({"message": "global", "retry_after": retry, "global": True}, status=429,
+                                             headers={"X-RateLimit-Global": "true", "X-RateLimit-Scope": "global", "Via": "1.1 google",
+                                                      "Retry-After": f"{retry:.3f}"})
+                gw[1] += 1
+
+            if name is not None:
+                limit, per = self.LIMITS[name]
+                per *= self.scale
+                key = (name, request.match_info.get(major, "") if major else "")
+                b = self.buckets.get(key)
+                if b is None or now - b[0] >= per:
+                    b = self.buckets[key] = [now, 0]
+                reset_after = max(0.001, b[0] + per - now)
+                if b[1] >= limit:
+                    self.rate_limited[name] = self.rate_limited.get(name, 0) + 1
+                    return self._json(
+                        {"message": "rate limited", "retry_after": reset_after, "global": False}, status=429,
+                        headers={"X-RateLimit-Limit": str(limit), "X-RateLimit-Remaining": "0",
+                                 "X-RateLimit-Reset-After": f"{reset_after:.3f}", "X-RateLimit-Bucket": name,
+                                 "X-RateLimit-Scope": "user", "Retry-After": f"{reset_after:.3f}",
+                                 "Via": "1.1 google"})
+                b[1] += 1
+                headers = {"X-RateLimit-Limit": str(limit), "X-RateLimit-Remaining": str(limit - b[1]),
+                           "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+                           "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}", "X-RateLimit-Bucket": name}
+
+            res = await handler(request)
+            res.headers.update(headers)
+            return res
+
+        return wrapped
+
+    def _json(self, obj, status: int = 200, headers: dict | None = None):
+        # discord.py는 content-type이 정확히 application/json 이어야 JSON으로 파싱함
+        # (429에 Via 헤더가 없으면 Cloudflare 차단으로 보고 재시도 없이 바로 실패시킴)
+        return self.web.Response(body=json.dumps(obj).encode("utf-8"), status=status,
+                                 content_type="application/json", headers=headers)
+
+    # ---- 핸들러 ----
+    async def h_me(self, request):
+        return self._json(_user(BOT_ID))
+
+    async def h_app(self, request):
+        return self._json({
+            "id": str(APP_ID), "name": "sbot-bench", "icon": None, "description": "", "bot_public": True,
+            "bot_require_code_grant": False, "owner": _user(2), "verify_key": "x", "flags": 0,
+            "interactions_endpoint_url": None,
+        })
+
+    async def h_sync(self, request):
+        cmds = await request.json()
+        for c in cmds:
+            c.update(id=str(self.snowflake()), application_id=str(APP_ID), version="1")
+        return self._json(cmds)
+
+    async def h_callback(self, request):
+        iid = int(request.match_info["iid"])
+        t0 = self.t0.pop(iid, None)
+        if t0 is not None:
+            self.latency.setdefault(self.command_of.pop(iid, "?"), []).append(time.perf_counter() - t0)
+        fut = self.pending.pop(iid, None)
+        if fut and not fut.done():
+            fut.set_result(None)
+        return self._json({"interaction": {"id": str(iid), "type": 2}})
+
+    async def h_followup(self, request):
+        return self._json(self.message(0, "followup", webhook=True))
+
+    async def h_followup_edit(self, request):
+        return self._json(self.message(0, "edited", webhook=True))
+
+    async def h_send(self, request):
+        cid = int(request.match_info["cid"])
+        return self._json(self.message(cid, ""))
+
+    async def h_history(self, request):
+        cid = int(request.match_info["cid"])
+        left = self.history_left.setdefault(cid, self.history_per_channel)
+        n = min(left, int(request.query.get("limit", "50")))
+        self.history_left[cid] = left - n
+        now = datetime.now(timezone.utc)
+        out = []
+        for i in range(n):
+            m = self.message(cid, "spam")
+            m["author"] = _user(cid * 100 + 2)
+            m["timestamp"] = (now - timedelta(seconds=i)).isoformat()
+            out.append(m)
+        return self._json(out)
+
+    async def h_no_content(self, request):
+        return self.web.Response(status=204)
+
+    async def h_member_edit(self, request):
+        gid, uid = int(request.match_info["gid"]), int(request.match_info["uid"])
+        body = await request.json()
+        m = _member(uid)
+        m["guild_id"] = str(gid)
+        m["communication_disabled_until"] = body.get("communication_disabled_until")
+        return self._json(m)
+
+    async def start(self) -> int:
+        web = self.web
+        app = web.Application()
+        b = "/api/v10"
+        L = self._limited
+        app.router.add_get(f"{b}/users/@me", L(None, None, self.h_me))
+        app.router.add_get(f"{b}/oauth2/applications/@me", L(None, None, self.h_app))
+        app.router.add_put(f"{b}/applications/{{app}}/commands", L("sync", None, self.h_sync))
+        app.router.add_post(f"{b}/interactions/{{iid}}/{{token}}/callback", L(None, None, self.h_callback))
+        app.router.add_post(f"{b}/webhooks/{{app}}/{{token}}", L("followup", "token", self.h_followup))
+        app.router.add_patch(f"{b}/webhooks/{{app}}/{{token}}/messages/{{mid}}", L("followup_edit", "token", self.h_followup_edit))
+        app.router.add_post(f"{b}/channels/{{cid}}/messages/bulk-delete", L("bulk", "cid", self.h_no_content))
+        app.router.add_post(f"{b}/channels/{{cid}}/messages", L("send", "cid", self.h_send))
+        app.router.add_get(f"{b}/channels/{{cid}}/messages", L("history", "cid", self.h_history))
+        app.router.add_delete(f"{b}/channels/{{cid}}/messages/{{mid}}", L("delete", "cid", self.h_no_content))
+        app.router.add_patch(f"{b}/guilds/{{gid}}/members/{{uid}}", L("member_edit", "gid", self.h_member_edit))
+        app.router.add_delete(f"{b}/guilds/{{gid}}/members/{{uid}}", L("kick", "gid", self.h_no_content))
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+
+# =========================
+# 가짜 게이트웨이
+# =========================
+class MockGateway:
+    # client.ws 자리에 끼워 넣음 (on_ready의 change_presence / client.latency 용)
+    latency = 0.0
+
+    def __init__(self, sbot, server: MockDiscord):
+        self.sbot = sbot
+        self.state = sbot.client._connection
+        self.server = server
+
+    async def change_presence(self, **kwargs):
+        return None
+
+    def guild_create(self, payload: dict) -> None:
+        self.state._add_guild_from_data(payload)
+
+    async def interact(self, payloads: list[dict], concurrency: int) -> float:
+        # INTERACTION_CREATE를 동시에 최대 concurrency개까지 흘려보내고 콜백(응답) 올 때까지 기다림
+        sem = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def one(p):
+            async with sem:
+                iid = int(p["id"])
+                fut = self.server.pending[iid] = loop.create_future()
+                self.server.command_of[iid] = p["data"]["name"]
+                self.server.t0[iid] = time.perf_counter()
+                self.state.parse_interaction_create(p)
+                try:
+                    await asyncio.wait_for(fut, 60)
+                except asyncio.TimeoutError:
+                    print(f"[bench] interaction {p['data']['name']} timed out", file=sys.stderr)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(p) for p in payloads))
+        return time.perf_counter() - started
+
+
+async def _wait_idle(sbot, timeout: float = 120.0) -> None:
+    # 로그 묶음/진행 중 자동메시지/저장이 다 끝날 때까지
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        busy = sbot.LOG_BATCHER.depth() or sbot.LOG_BATCHER._tasks or sbot.AUTO_SCHEDULER._inflight
+        if not busy:
+            return
+        await asyncio.sleep(0.05)
+
+
+async def check_reserved_slots(sbot) -> None:
+    # 로그/예약 메시지가 다 막혀 있어도(429로 자리를 쥔 채 대기) interaction 은 바로 나가야 함
+    d = sbot.OUTBOUND
+    hold = asyncio.Event()
+    low = [asyncio.create_task(d.submit(prio, hold.wait, ("check", prio, i)))
+           for prio in (sbot.PRIO_LOG, sbot.PRIO_SCHEDULED) for i in range(d.concurrency + 4)]
+    await asyncio.sleep(0)
+    running = d.inflight
+    started = asyncio.Event()
+
+    async def reply():
+        started.set()
+
+    task = asyncio.create_task(d.submit(sbot.PRIO_INTERACTION, reply))
+    await asyncio.wait_for(started.wait(), 1.0)
+    assert d.low_running == running <= d.concurrency - sbot.OUTBOUND_RESERVED, (d.low_running, running)
+    hold.set()
+    await asyncio.gather(task, *low)
+    d.waited = [[0, 0.0, 0.0] for _ in sbot.PRIO_NAMES]
+    print(f"[bench] reserved slots ok: low classes held {running}/{d.concurrency}, interaction started", file=sys.stderr)
+
+
+async def scenario(args) -> dict:
+    import discord.http
+
+    server = MockDiscord(args.time_scale, args.global_limit, history_per_channel=args.clear_count)
+    port = await server.start()
+    discord.http.Route.BASE = f"http://127.0.0.1:{port}/api/v10"
+
+    os.environ.setdefault("DISCORD_TOKEN", "bench")
+    sys.path.insert(0, ROOT)
+    import sbot
+
+    if args.store_delay:
+        # 느린 디스크/원격 DB 흉내: 경고 저장/조회 호출마다 지연
+        def slow(fn):
+            async def wrapped(*a, **k):
+                await asyncio.sleep(args.store_delay / 1000)
+                return await fn(*a, **k)
+            return wrapped
+        for name in ("add_warning", "warning_times"):
+            setattr(sbot.STORE, name, slow(getattr(sbot.STORE, name)))
+
+    await check_reserved_slots(sbot)
+
+    rss_start = rss_bytes()
+    syn = Synthetic(args.guilds, args.members)
+    await sbot.client.login("bench")
+    gw = MockGateway(sbot, server)
+    sbot.client.ws = gw
+    for gid in syn.gids:
+        gw.guild_create(syn.guild(gid))
+    sbot.client._ready.set()
+    await sbot.on_ready()
+    sbot.auto_message_task.cancel()  # 틱은 아래에서 직접 돌림(시간 앞당기기)
+    sbot.auto_delete_task.cancel()
+
+    phases = {}
+    rng = random.Random(1)
+
+    def done(name: str) -> None:
+        print(f"[bench] guilds={args.guilds} {name} {phases[name]:.2f}s", file=sys.stderr, flush=True)
+
+    phases["setlog"] = await gw.interact([syn.setlog(g) for g in syn.gids], args.concurrency)
+    done("setlog")
+    phases["setauto"] = await gw.interact([syn.setauto(g) for g in syn.gids], args.concurrency)
+    done("setauto")
+
+    n_warn = min(len(syn.gids) * 3, args.max_warns)
+    targets = [(g, g * 100 + rng.randint(2, min(args.members, 4) + 1)) for g in (rng.choice(syn.gids) for _ in range(n_warn))]
+    phases["warn"] = await gw.interact([syn.warn(g, u) for g, u in targets], args.concurrency)
+    done("warn")
+
+    clear_gids = syn.gids[: min(len(syn.gids), args.max_clears)]
+    phases["clear"] = await gw.interact([syn.clear(g, args.clear_count) for g in clear_gids], args.concurrency)
+    await asyncio.sleep(0)
+    while sbot.ACTIVE_PURGES:
+        await asyncio.sleep(0.05)
+    await _wait_idle(sbot)
+    done("clear")
+
+    # auto_message_task: 시간을 하루 앞당겨 모든 길드 슬롯이 한 번씩 나가게
+    started = time.perf_counter()
+    fired = sbot.AUTO_SCHEDULER.run_due(time.time() + 24 * 3600)
+    await asyncio.gather(*list(sbot.AUTO_SCHEDULER._inflight))
+    phases["auto_tick"] = time.perf_counter() - started
+    done("auto_tick")
+
+    started = time.perf_counter()
+    await sbot.DELETE_QUEUE.run_due(time.time() + 3600)
+    phases["auto_delete"] = time.perf_counter() - started
+    done("auto_delete")
+
+    await _wait_idle(sbot)
+    await sbot._saver.flush()
+
+    lat = [v for vs in server.latency.values() for v in vs]
+    interactions = sum(len(v) for v in server.latency.values())
+    interact_time = sum(phases[k] for k in ("setlog", "setauto", "warn", "clear"))
+    result = {
+        "guilds": args.guilds,
+        "interactions": interactions,
+        "throughput": interactions / interact_time if interact_time else 0.0,
+        "p50_ms": pct(lat, 0.50) * 1000,
+        "p99_ms": pct(lat, 0.99) * 1000,
+        "per_command": {k: {"n": len(v), "p50_ms": pct(v, 0.5) * 1000, "p99_ms": pct(v, 0.99) * 1000}
+                        for k, v in server.latency.items()},
+        "phases_s": phases,
+        "auto_fired": fired,
+        "rest_calls": server.calls,
+        "rest_total": sum(server.calls.values()),
+        "rate_limited": server.rate_limited,
+        "outbound_wait": {name: {"n": n, "avg_ms": total / n * 1000 if n else 0.0, "max_ms": worst * 1000}
+                          for name, (n, total, worst) in zip(sbot.PRIO_NAMES, sbot.OUTBOUND.waited)},
+        "rss_mb": rss_bytes() / 1024 / 1024,
+        "rss_growth_mb": (rss_bytes() - rss_start) / 1024 / 1024,
+    }
+    await sbot.client.http.close()
+    await server.runner.cleanup()
+    return result
+
+
+def child(args) -> None:
+    result = asyncio.run(scenario(args))
+    print(json.dumps(result, ensure_ascii=False))
+
+
+def run_scale(guilds: int, args) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--guilds", str(guilds),
+           "--members", str(args.members), "--concurrency", str(args.concurrency),
+           "--time-scale", str(args.time_scale), "--global-limit", str(args.global_limit),
+           "--max-warns", str(args.max_warns), "--max-clears", str(args.max_clears),
+           "--clear-count", str(args.clear_count), "--store-delay", str(args.store_delay)]
+    env = dict(os.environ, DISCORD_TOKEN="bench", STORAGE_BACKEND=args.storage)
+    with tempfile.TemporaryDirectory() as tmp:
+        out = subprocess.run(cmd, cwd=tmp, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        sys.stderr.write(out.stderr)
+        raise SystemExit(f"guilds={guilds} failed")
+    if args.verbose:
+        sys.stderr.write(out.stderr)
+    lines = out.stdout.strip().splitlines()
+    result = json.loads(lines[-1])
+    # sbot 은 실패를 "[tag] failed ..." 로 찍음 → 재시도 다 쓰고 포기한 요청 수
+    failed: dict[str, int] = {}
+    for line in lines[:-1]:
+        if line.startswith("[") and "] " in line and "failed" in line:
+            tag = line[1:line.index("]")]
+            failed[tag] = failed.get(tag, 0) + 1
+    result["failed"] = failed
+    return result
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--guilds", type=int, nargs="+", default=[10, 1000, 10000])
+    p.add_argument("--members", type=int, default=5)
+    p.add_argument("--concurrency", type=int, default=100, help="동시에 처리 중인 interaction 수")
+    p.add_argument("--time-scale", type=float, default=0.05, help="레이트리밋 창 길이 배율 (1 = 실제 Discord)")
+    p.add_argument("--global-limit", type=int, default=50, help="창당 글로벌 요청 수")
+    p.add_argument("--max-warns", type=int, default=20000)
+    p.add_argument("--max-clears", type=int, default=100)
+    p.add_argument("--clear-count", type=int, default=250)
+    p.add_argument("--storage", choices=("json", "sqlite"), default="json")
+    p.add_argument("--store-delay", type=float, default=0.0, help="경고 저장/조회 호출마다 더하는 지연(ms)")
+    p.add_argument("--json", action="store_true", help="결과를 JSON 한 줄씩 출력")
+    p.add_argument("--verbose", action="store_true")
+    p.add_argument("--child", action="store_true")
+    args = p.parse_args()
+
+    if args.child:
+        args.guilds = args.guilds[0]
+        return child(args)
+
+    for g in args.guilds:
+        r = run_scale(g, args)
+        if args.json:
+            print(json.dumps(r, ensure_ascii=False))
+            continue
+        print(f"== guilds={r['guilds']}  interactions={r['interactions']}  "
+              f"throughput={r['throughput']:.0f}/s  p50={r['p50_ms']:.1f}ms  p99={r['p99_ms']:.1f}ms  "
+              f"RSS={r['rss_mb']:.0f}MB (+{r['rss_growth_mb']:.0f}MB)")
+        for name, c in sorted(r["per_command"].items()):
+            print(f"   {name:>10}: n={c['n']:<6} p50={c['p50_ms']:.1f}ms p99={c['p99_ms']:.1f}ms")
+        print("   phases: " + "  ".join(f"{k}={v:.2f}s" for k, v in r["phases_s"].items()) + f"  auto_fired={r['auto_fired']}")
+        print(f"   REST calls={r['rest_total']} " + json.dumps(r["rest_calls"]) + f"  429={json.dumps(r['rate_limited'])}")
+        print("   outbound queue wait: " + "  ".join(
+            f"{k}=avg {v['avg_ms']:.1f}ms/max {v['max_ms']:.0f}ms (n={v['n']})" for k, v in r["outbound_wait"].items()))
+        print(f"   gave up: {json.dumps(r['failed'])}")
+
+
+if __name__ == "__main__":
+    main()
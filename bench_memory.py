@@ -0,0 +1,131 @@
+# =========================
+# 메모리 벤치마크: 기본 모드 vs LOW_MEMORY=1
+#   python bench_memory.py [--guilds 200] [--members 2000] [--messages 5000]
+# 가짜 길드/멤버/메시지 payload를 discord.py 상태(ConnectionState)에 그대로 넣고 RSS를 잼
+# 모드마다 새 프로세스에서 돌려서 서로 영향 없음
+# =========================
+import argparse
+import asyncio
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _user(uid: int) -> dict:
+    return {"id": str(uid), "username": f"user{uid}", "discriminator": "0", "avatar": None, "global_name": None}
+
+
+def _member(uid: int) -> dict:
+    return {"user": _user(uid), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0}
+
+
+def _guild(gid: int, members: int) -> dict:
+    base = gid * 1_000_000
+    return {
+        "id": str(gid),
+        "name": f"guild{gid}",
+        "owner_id": str(base + 1),
+        "member_count": members,
+        "roles": [{"id": str(gid), "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": str(gid + 1), "type": 0, "name": "general", "position": 0, "guild_id": str(gid)}],
+        "members": [_member(base + i) for i in range(1, members + 1)],
+        "emojis": [],
+        "stickers": [],
+        "features": [],
+    }
+
+
+def _message(mid: int, gid: int, uid: int) -> dict:
+    return {
+        "id": str(mid), "channel_id": str(gid + 1), "guild_id": str(gid),
+        "author": _user(uid), "member": {k: v for k, v in _member(uid).items() if k != "user"},
+        "content": "안녕하세요 " * 8, "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None,
+        "tts": False, "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [],
+        "embeds": [], "pinned": False, "type": 0,
+    }
+
+
+def child(guilds: int, members: int, messages: int) -> None:
+    os.environ.setdefault("DISCORD_TOKEN", "bench")
+    sys.path.insert(0, ROOT)
+    import sbot
+
+    async def populate():
+        state = sbot.client._connection
+        # 이벤트 핸들러는 안 돌림 (ConnectionState 는 client.dispatch 를 따로 들고 있어서 둘 다 바꿈)
+        sbot.client.dispatch = state.dispatch = lambda *a, **k: None
+        gc.collect()
+        before = rss_bytes()
+
+        gids = [(i + 1) * 10_000_000_000 for i in range(guilds)]
+        for gid in gids:
+            state._add_guild_from_data(_guild(gid, members))
+        for n in range(messages):
+            gid = gids[n % guilds]
+            state.parse_message_create(_message(gid * 10 + n + 2, gid, gid * 1_000_000 + 1 + n % members))
+
+        gc.collect()
+        after = rss_bytes()
+        cached = sum(len(g.members) for g in sbot.client.guilds)
+        cached_msgs = len(state._messages) if state._messages is not None else 0
+        print(json.dumps({"before": before, "after": after, "cached_members": cached, "cached_messages": cached_msgs}))
+
+    asyncio.run(populate())
+
+
+def run_mode(low: bool, args) -> dict:
+    env = dict(os.environ, LOW_MEMORY="1" if low else "0", DISCORD_TOKEN="bench")
+    env.pop("MESSAGE_CACHE_SIZE", None)
+    with tempfile.TemporaryDirectory() as tmp:  # sbot_data.json 등은 임시 폴더에서
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child",
+             "--guilds", str(args.guilds), "--members", str(args.members), "--messages", str(args.messages)],
+            cwd=tmp, env=env, capture_output=True, text=True, check=True,
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--guilds", type=int, default=200)
+    p.add_argument("--members", type=int, default=2000)
+    p.add_argument("--messages", type=int, default=5000)
+    p.add_argument("--child", action="store_true")
+    args = p.parse_args()
+
+    if args.child:
+        return child(args.guilds, args.members, args.messages)
+
+    print(f"guilds={args.guilds} members/guild={args.members} messages={args.messages}")
+    results = {}
+    for label, low in (("default", False), ("low-memory", True)):
+        r = results[label] = run_mode(low, args)
+        grown = (r["after"] - r["before"]) / 1024 / 1024
+        print(f"{label:>10}: RSS {r['before'] / 1024 / 1024:7.1f}MB → {r['after'] / 1024 / 1024:7.1f}MB "
+              f"(+{grown:.1f}MB)  members cached={r['cached_members']}  messages cached={r['cached_messages']}")
+
+    d, l = results["default"], results["low-memory"]
+    saved = (d["after"] - l["after"]) / 1024 / 1024
+    print(f"low-memory saves {saved:.1f}MB RSS ({saved / max(d['after'] / 1024 / 1024, 1e-9) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
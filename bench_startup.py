@@ -0,0 +1,229 @@
+# =========================
+# 시작/종료 벤치마크: 콜드 스타트 vs 웜 스타트 (SIGTERM 정상 종료 때 남긴 스냅샷)
+#   python bench_startup.py [--guilds 100] [--members 2000] [--chunk-delay 0.02]
+#
+# - 게이트웨이: 같은 프로세스 안 aiohttp 웹소켓 서버가 HELLO → READY → GUILD_CREATE → 멤버 청크 응답
+#   (청크는 하나씩 --chunk-delay 간격으로 보냄 = Discord 쪽 전송 속도 흉내)
+# - REST: bench_load.py의 MockDiscord 그대로
+# - 같은 임시 폴더에서 세 번 띄움: 준비(명령어 sync) → 콜드(스냅샷 지움) → 웜
+#   각 실행은 준비 완료 후 로그를 쌓고 자기 자신에게 SIGTERM → 정상 종료 시간 / 로그가 다 나갔는지 확인
+# - 결과: 시작 → on_ready (sbot_startup_seconds), 멤버 캐시가 다 찰 때까지, 종료 시간
+# =========================
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BOT_ID = 1
+APP_ID = 1
+
+
+def _user(uid: int, bot: bool = False) -> dict:
+    return {"id": str(uid), "username": f"user{uid}", "discriminator": "0", "avatar": None, "global_name": None,
+            "bot": bot}
+
+
+def _member(uid: int) -> dict:
+    return {"user": _user(uid), "roles": [], "joined_at": "2024-01-01T00:00:00+00:00", "deaf": False, "mute": False,
+            "flags": 0}
+
+
+def _guild(gid: int, members: int) -> dict:
+    return {
+        "id": str(gid), "name": f"guild{gid}", "owner_id": "2", "member_count": members, "large": True,
+        "unavailable": False, "members": [_member(BOT_ID)], "presences": [], "voice_states": [], "threads": [],
+        "stage_instances": [], "guild_scheduled_events": [], "emojis": [], "stickers": [], "features": [],
+        "roles": [{"id": str(gid), "name": "@everyone", "permissions": "0", "position": 0, "color": 0,
+                   "hoist": False, "managed": False, "mentionable": False}],
+        "channels": [{"id": str(gid + 1), "type": 0, "name": "general", "position": 0, "guild_id": str(gid)}],
+    }
+
+
+class MockGatewayServer:
+    def __init__(self, guilds: int, members: int, chunk_delay: float):
+        self.gids = [(i + 1) * 10_000_000 for i in range(guilds)]
+        self.members = members
+        self.chunk_delay = chunk_delay
+        self.chunk_requests = 0
+
+    async def handler(self, request):
+        from aiohttp import WSMsgType, web
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        out: asyncio.Queue = asyncio.Queue()
+        seq = 0
+
+        def send(op: int, d=None, t: str | None = None) -> None:
+            nonlocal seq
+            msg = {"op": op, "d": d, "s": None, "t": None}
+            if op == 0:
+                seq += 1
+                msg.update(s=seq, t=t)
+            out.put_nowait(json.dumps(msg))
+
+        async def writer():
+            while True:
+                await ws.send_str(await out.get())
+
+        chunks: asyncio.Queue = asyncio.Queue()
+
+        async def chunker():
+            # 청크 요청은 하나씩 순서대로, 청크(1000명)마다 chunk_delay
+            while True:
+                d = await chunks.get()
+                gid = int(d["guild_id"])
+                ids = [BOT_ID] + list(range(gid * 10, gid * 10 + self.members - 1))
+                count = -(-len(ids) // 1000)
+                for i in range(count):
+                    await asyncio.sleep(self.chunk_delay)
+                    members = [_member(uid) for uid in ids[i * 1000:(i + 1) * 1000]]
+                    send(0, {"guild_id": str(gid), "members": members, "chunk_index": i, "chunk_count": count,
+                             "nonce": d.get("nonce")}, "GUILD_MEMBERS_CHUNK")
+
+        tasks = [asyncio.create_task(writer()), asyncio.create_task(chunker())]
+        send(10, {"heartbeat_interval": 41250})
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    break
+                p = json.loads(msg.data)
+                if p["op"] == 1:
+                    send(11)
+                elif p["op"] == 2:
+                    send(0, {
+                        "v": 10, "user": _user(BOT_ID, bot=True), "session_id": "bench", "resume_gateway_url": "ws://x",
+                        "guilds": [{"id": str(g), "unavailable": True} for g in self.gids],
+                        "application": {"id": str(APP_ID), "flags": 0},
+                    }, "READY")
+                    for g in self.gids:
+                        send(0, _guild(g, self.members), "GUILD_CREATE")
+                elif p["op"] == 8:
+                    self.chunk_requests += 1
+                    chunks.put_nowait(p["d"])
+        finally:
+            for t in tasks:
+                t.cancel()
+        return ws
+
+    async def start(self) -> int:
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/", self.handler)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+
+def seed_data(guilds: int) -> None:
+    # 로그 채널 + 자동메시지 (스냅샷에 위치가 들어가는지 보려고)
+    gids = [(i + 1) * 10_000_000 for i in range(guilds)]
+    data = {
+        "log_channel_id": {str(g): g + 1 for g in gids},
+        "auto_jobs": {str(g): {"1": {"channel_id": g + 1, "message": "bench", "interval": 60}} for g in gids},
+        "word_filters": {}, "warn_ttl_days": {}, "warnings": {}, "warnings_expired": {},
+    }
+    with open("sbot_data.json", "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+async def child_main(args) -> dict:
+    import discord.gateway
+    import discord.http
+    import yarl
+
+    sys.path.insert(0, ROOT)
+    from bench_load import MockDiscord
+
+    rest = MockDiscord(time_scale=0.05, global_limit=50, history_per_channel=0)
+    discord.http.Route.BASE = f"http://127.0.0.1:{await rest.start()}/api/v10"
+    gateway = MockGatewayServer(args.guilds, args.members, args.chunk_delay)
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(f"ws://127.0.0.1:{await gateway.start()}/")
+
+    import sbot
+
+    result: dict = {"warm": bool(sbot.WARM_START)}
+
+    async def driver():
+        # main()이 로그인하기 전이라 wait_until_ready()는 못 씀 / is_ready()는 on_ready 핸들러보다 먼저 켜짐
+        while not sbot.STARTUP_SECONDS.value:
+            await asyncio.sleep(0.01)
+        result["ready_s"] = sbot.STARTUP_SECONDS.value
+        while not all(g.chunked for g in sbot.client.guilds):
+            await asyncio.sleep(0.01)
+        result["cached_s"] = time.monotonic() - sbot.BOOT_STARTED
+        result["members_cached"] = sum(len(g.members) for g in sbot.client.guilds)
+
+        sends_before = rest.calls.get("send", 0)
+        for g in sbot.client.guilds:
+            await sbot.log_action(g, "bench: 종료 직전 로그")
+        result["logs_queued"] = sbot.LOG_BATCHER.depth()
+        result["sigterm_at"] = time.monotonic()
+        os.kill(os.getpid(), signal.SIGTERM)
+        result["sends_before"] = sends_before
+
+    drive = asyncio.create_task(driver())
+    await sbot.main()
+    result["shutdown_s"] = time.monotonic() - result.pop("sigterm_at")
+    result["log_messages_sent"] = rest.calls.get("send", 0) - result.pop("sends_before")
+    result["snapshot"] = os.path.exists(sbot.WARM_START_FILE)
+    result["chunk_requests"] = gateway.chunk_requests
+    drive.cancel()
+    await rest.runner.cleanup()
+    await gateway.runner.cleanup()
+    return result
+
+
+def run_child(args, cwd: str) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", "--guilds", str(args.guilds),
+           "--members", str(args.members), "--chunk-delay", str(args.chunk_delay)]
+    env = dict(os.environ, DISCORD_TOKEN="bench", PORT="0", LOW_MEMORY="0")
+    out = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True, timeout=600)
+    if out.returncode != 0:
+        sys.stderr.write(out.stdout + out.stderr)
+        raise SystemExit("child failed")
+    if args.verbose:
+        sys.stderr.write(out.stdout)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--guilds", type=int, default=100)
+    p.add_argument("--members", type=int, default=2000)
+    p.add_argument("--chunk-delay", type=float, default=0.02, help="멤버 청크(1000명) 하나당 게이트웨이 전송 간격(초)")
+    p.add_argument("--verbose", action="store_true")
+    p.add_argument("--child", action="store_true")
+    args = p.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(child_main(args))))
+        return
+
+    print(f"guilds={args.guilds} members/guild={args.members} chunk_delay={args.chunk_delay * 1000:.0f}ms")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        seed_data(args.guilds)
+        run_child(args, tmp)                             # 명령어 sync 등 한 번 해둠
+        os.remove(os.path.join(tmp, "sbot_warm.json"))   # → 다음은 콜드
+        runs = {"cold": run_child(args, tmp), "warm": run_child(args, tmp)}
+
+    for label, r in runs.items():
+        print(f"{label:>5}: ready {r['ready_s']:.2f}s  members cached {r['cached_s']:.2f}s ({r['members_cached']})  "
+              f"shutdown {r['shutdown_s']:.2f}s  logs queued={r['logs_queued']} sent={r['log_messages_sent']} msgs  "
+              f"snapshot={'yes' if r['snapshot'] else 'no'}  (warm={r['warm']})")
+    cold, warm = runs["cold"]["ready_s"], runs["warm"]["ready_s"]
+    print(f"warm start reaches ready {cold - warm:.2f}s sooner ({(cold - warm) / max(cold, 1e-9):.0%})")
+
+
+if __name__ == "__main__":
+    main()
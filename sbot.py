@@ -1,9 +1,32 @@
+import aiohttp
 from aiohttp import web
 
+import bisect
+import csv
+import gzip
+import io
+import hashlib
+import hmac
 import json
 import os
+import re
 import asyncio
-from datetime import timedelta
+import atexit
+import signal
+import sqlite3
+import subprocess
+import sys
+import heapq
+import threading
+import time
+import traceback
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from tempfile import SpooledTemporaryFile
+from typing import Literal
 
 import discord
 from discord import app_commands
@@ -12,12 +35,29 @@ from discord.ext import tasks
 # =========================
 # 토큰: 환경변수로만 받기
 # =========================
-TOKEN = os.getenv("DISCORD_TOKEN")
-if not TOKEN:
-    raise RuntimeError("DISCORD_TOKEN 환경변수 설정 안 됨 (토큰을 환경변수로 넣어야 함)")
+TOKEN = os.getenv("DISCORD_TOKEN")  # 실행할 때 확인 (import만 하는 벤치/도구는 토큰 없어도 됨)
+BOOT_STARTED = time.monotonic()     # startup 메트릭 기준 (import 끝난 시점)
 
 DATA_FILE = "sbot_data.json"
 
+# 샤딩: single(기본) | auto(AutoShardedClient, 한 프로세스) | cluster(샤드 범위를 여러 프로세스로 나눔)
+SHARD_MODE = os.getenv("SHARD_MODE", "single").strip().lower()
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None                     # 비우면 Discord 추천값
+SHARD_IDS = [int(x) for x in os.getenv("SHARD_IDS", "").split(",") if x.strip().isdigit()] or None
+CLUSTER_PROCESSES = int(os.getenv("CLUSTER_PROCESSES", "2"))
+CLUSTER_ID = os.getenv("CLUSTER_ID")                                         # cluster 워커만 (슈퍼바이저가 넣어줌)
+IS_CLUSTER_WORKER = SHARD_MODE == "cluster" and CLUSTER_ID is not None
+IS_PRIMARY = not IS_CLUSTER_WORKER or CLUSTER_ID == "0"                      # 웹서버/명령어 sync는 여기서만
+CONFIG_POLL_SECONDS = 5.0                                                    # cluster: 다른 프로세스 설정 변경 반영 주기
+
+# 저장소: json(기본) | sqlite (경고/길드 설정을 SQLite에 인덱스로 보관)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").strip().lower()
+SQLITE_FILE = os.getenv("SQLITE_FILE", "sbot_data.db")
+if SHARD_MODE == "cluster" and STORAGE_BACKEND != "sqlite":
+    # json 파일 하나를 여러 프로세스가 통째로 덮어쓰면 서로 변경을 날림
+    print("[storage] cluster 모드는 sqlite 저장소를 사용함")
+    STORAGE_BACKEND = "sqlite"
+
 # -------------------------
 # 경고 누적 처벌 단계 (3회부터 적용)
 # 3회: 5분, 4회: 10분, 5회: 1시간, 6회: 1일, 7회: 1주, 8회: 강퇴
@@ -30,38 +70,878 @@ WARN_TIMEOUT_MINUTES = {
     7: 7 * 24 * 60,
 }
 WARN_KICK_AT = 8
+# 경고 만료: 이 기간 안의 경고만 위 단계 계산에 들어감 (기본 0 = 만료 없음, 길드별로 /warnexpiry 로 켬)
+# 만료된 경고는 주기적으로 보관 영역으로 옮김 (json: WARN_ARCHIVE_FILE, sqlite: warnings_archive 테이블)
+#   → 활성 목록/메모리는 안 커지고, 기록은 /exportwarnings 로 그대로 꺼낼 수 있음
+WARN_TTL_DAYS = int(os.getenv("WARN_TTL_DAYS", "0"))
+WARN_COMPACT_HOURS = float(os.getenv("WARN_COMPACT_HOURS", "6"))
+WARN_ARCHIVE_FILE = os.getenv("WARN_ARCHIVE_FILE", "sbot_warnings_archive.jsonl")
 
 AUTO_DELETE_SECONDS = 10  # 자동메시지만 삭제 딜레이
 
+# 개발용: 이 길드들에만 바로 sync (쉼표 구분). 비우면 글로벌 sync
+DEV_GUILD_IDS = [int(x) for x in os.getenv("DEV_GUILD_IDS", "").replace(" ", "").split(",") if x.isdigit()]
+FORCE_COMMAND_SYNC = os.getenv("FORCE_COMMAND_SYNC", "") == "1"  # 해시 무시하고 무조건 sync
+
+# 저메모리 모드: 멤버 청킹/캐시 끔, 메시지 캐시 축소 (명령어/메시지 이벤트는 멤버 정보를 같이 받아서 캐시 없이도 됨)
+LOW_MEMORY = os.getenv("LOW_MEMORY", "") == "1"
+MESSAGE_CACHE_SIZE = int(os.getenv("MESSAGE_CACHE_SIZE", "0" if LOW_MEMORY else "1000"))  # 0 = 캐시 안 함
+
+# 종료: SIGTERM/SIGINT → 예약 작업 멈춤 → 나가는 요청/로그/예약 전송을 SHUTDOWN_DRAIN_SECONDS 안에 비움
+# → 저장 한 번 + 웜 스타트 스냅샷 → 게이트웨이 정상 종료
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "10"))   # Render는 SIGTERM 후 30초 뒤 강제 종료
+# 웜 스타트: 정상 종료 때 남긴 스냅샷(샤드 수, 자동메시지 위치)이 있으면 다음 시작은
+# 샤드 수 조회 생략 + 멤버 청킹을 안 기다리고 바로 준비 완료 (청킹은 준비 후 뒤에서)
+WARM_START_FILE = os.getenv("WARM_START_FILE", "sbot_warm.json" if CLUSTER_ID is None else f"sbot_warm.{CLUSTER_ID}.json")
+WARM_START_MAX_AGE = float(os.getenv("WARM_START_MAX_AGE", "900"))   # 이보다 오래된 스냅샷은 무시 (콜드 스타트)
+WARM_GUILD_READY_TIMEOUT = 0.5                                       # 마지막 GUILD_CREATE 후 기다림 (discord.py 기본 2초)
+CHUNK_CONCURRENCY = int(os.getenv("CHUNK_CONCURRENCY", "4"))         # 웜 스타트 후 동시에 청킹하는 길드 수
+AUTO_DEFAULT_MESSAGE = "10분마다 자동 메시지"
+AUTO_DEFAULT_INTERVAL_MINUTES = 10
+AUTO_MAX_SLOTS = 5                                                     # 길드당 자동메시지 개수 상한
+AUTO_SEND_CONCURRENCY = int(os.getenv("AUTO_SEND_CONCURRENCY", "8"))   # 동시에 보내는 자동메시지(+예약 삭제) 수
+# 조용한 채널 자동메시지 정책 (길드별로 /setauto idle:로 바꿈)
+#   always = 항상 보냄 / skip = 마지막 자동메시지 뒤로 사람이 말한 채널만 / backoff = 조용하면 주기를 2배씩(최대 AUTO_BACKOFF_MAX배)
+AUTO_IDLE_POLICIES = ("always", "skip", "backoff")
+AUTO_IDLE_POLICY = os.getenv("AUTO_IDLE_POLICY", "always")
+if AUTO_IDLE_POLICY not in AUTO_IDLE_POLICIES:
+    print(f"[config] unknown AUTO_IDLE_POLICY={AUTO_IDLE_POLICY!r}, using always")
+    AUTO_IDLE_POLICY = "always"
+AUTO_BACKOFF_MAX = 8
+AUTO_TICK_SECONDS = 1.0                                                # 스케줄러 확인 주기
+
+# 삭제 예약 큐: (삭제 시각, 채널, 메시지) 힙을 파일로 보관 → 재시작해도 안 지워진 메시지가 안 남음
+AUTO_DELETE_FILE = os.getenv("AUTO_DELETE_FILE", "sbot_deletes.json" if CLUSTER_ID is None else f"sbot_deletes.{CLUSTER_ID}.json")
+AUTO_DELETE_TICK_SECONDS = 2.0
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=5)  # 일괄삭제 API는 14일 이내 메시지만 가능
+
+# 로그 묶음 전송: 이 시간 안에 들어온 로그는 메시지 하나로 합쳐서 보냄
+LOG_BATCH_SECONDS = float(os.getenv("LOG_BATCH_SECONDS", "1.5"))
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "200"))  # 길드별 대기 줄 수 상한(넘으면 버리고 요약)
+DISCORD_MESSAGE_LIMIT = 2000
+# 명령어가 이 시간 안에 응답을 시작 안 하면 자동 defer (interaction 응답 기한 3초)
+AUTO_DEFER_SECONDS = float(os.getenv("AUTO_DEFER_SECONDS", "1.5"))
+
+# 자동 관리(automod): 메시지마다 O(1) 검사 → 걸리면 삭제 + 경고 1회(누적 처벌 그대로)
+# 길드가 /automod 로 켜고 기준도 정함, 아래는 안 정한 길드 기본값 (기본 꺼짐)
+AUTOMOD_ENABLED = os.getenv("AUTOMOD_ENABLED", "0") == "1"
+AUTOMOD_RATE = float(os.getenv("AUTOMOD_RATE", "5"))               # 유저당 허용 메시지 수 (AUTOMOD_RATE_SECONDS 동안)
+AUTOMOD_RATE_SECONDS = float(os.getenv("AUTOMOD_RATE_SECONDS", "5"))
+AUTOMOD_DUP_COUNT = int(os.getenv("AUTOMOD_DUP_COUNT", "4"))       # 최근 AUTOMOD_DUP_WINDOW개 중 같은 내용이 이만큼이면 도배
+AUTOMOD_DUP_WINDOW = 8
+AUTOMOD_DUP_SECONDS = float(os.getenv("AUTOMOD_DUP_SECONDS", "30"))
+AUTOMOD_MENTION_LIMIT = int(os.getenv("AUTOMOD_MENTION_LIMIT", "6"))  # 메시지 하나의 유저/역할 멘션 수 상한
+AUTOMOD_STATE_SIZE = int(os.getenv("AUTOMOD_STATE_SIZE", "50000"))    # 추적하는 (길드, 유저) 수 상한
+AUTOMOD_STATE_TTL = 120.0                                             # 이 시간 조용하면 상태 버림
+AUTOMOD_WARN_COOLDOWN = 15.0                                          # 같은 유저 연속 경고 간격 (그 사이엔 삭제만)
+FILTER_MAX_PATTERNS = 500                                             # 길드당 금지어+금지 도메인 수 상한
+
+# 레이드 방어: 길드별 입장 슬라이딩 윈도우 → 몰려 들어오면 의심 계정(새 계정/비슷한 이름)을 한 번에 처리
+# 처벌(timeout/kick)은 길드가 /raidguard 로 켬 (입장 기준도 길드별), 아래는 안 정한 길드 기본값
+RAID_POLICIES = ("timeout", "kick", "log", "off")
+RAID_ACTION = os.getenv("RAID_ACTION", "log").strip().lower()         # timeout | kick | log(기록만) | off
+if RAID_ACTION not in RAID_POLICIES:
+    print(f"[config] unknown RAID_ACTION={RAID_ACTION!r}, using log")
+    RAID_ACTION = "log"
+RAID_JOINS = int(os.getenv("RAID_JOINS", "10"))                       # RAID_WINDOW_SECONDS 안에 이만큼 들어오면 레이드
+RAID_WINDOW_SECONDS = float(os.getenv("RAID_WINDOW_SECONDS", "30"))
+RAID_MIN_ACCOUNT_AGE_DAYS = float(os.getenv("RAID_MIN_ACCOUNT_AGE_DAYS", "7"))  # 이보다 새 계정은 의심
+RAID_SIMILAR_NAMES = 3                                                # 창 안에 이름 뼈대가 같은 계정이 이만큼이면 의심
+RAID_MODE_SECONDS = 300.0                                             # 감지 후 이 시간 동안은 의심 입장을 바로 처리
+RAID_BATCH_SECONDS = 2.0                                              # 레이드 모드 중 입장은 이만큼 모아서 한 번에
+RAID_TIMEOUT_MINUTES = int(os.getenv("RAID_TIMEOUT_MINUTES", "60"))
+RAID_CONCURRENCY = int(os.getenv("RAID_CONCURRENCY", "5"))            # 동시에 처리하는 계정 수
+
+# 나가는 REST 요청 우선순위: interaction 응답 > 처벌(타임아웃/강퇴/삭제) > 로그 > 예약 메시지
+OUTBOUND_CONCURRENCY = int(os.getenv("OUTBOUND_CONCURRENCY", "16"))   # 동시에 나가는 요청 수
+OUTBOUND_RESERVED = int(os.getenv("OUTBOUND_RESERVED", "4"))          # 로그/예약 메시지가 못 쓰는(응답/처벌 전용) 자리
+OUTBOUND_PER_BUCKET = 2                                               # 같은 채널/길드로 동시에 보내는 요청 수
+
+# 이벤트 루프 감시: 예정보다 이만큼 늦게 깨면 멈춤으로 보고 그때 돌던 스택을 기록
+LOOP_STALL_SECONDS = float(os.getenv("LOOP_STALL_SECONDS", "0.5"))
+# /debug/profile 접근 토큰 (Authorization: Bearer <토큰>). 비우면 /debug/* 자체를 안 엶
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", "")
+PROFILE_MAX_SECONDS = 60.0
+# POST /admin/config (여러 길드 설정 일괄 적용) 토큰. 비우면 안 엶
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+BULK_CONFIG_MAX_ROWS = 5000
+BULK_CONFIG_MAX_BYTES = 1024 * 1024
+BULK_CONFIG_CONCURRENCY = 8                                           # 다른 워커 길드 채널 확인(REST) 동시 수
+PROFILE_SAMPLE_SECONDS = 0.005                                        # 스택 샘플링 간격 (200Hz)
+
+
+# =========================
+# 메트릭 (Prometheus 텍스트 포맷, /metrics)
+# =========================
+# 외부 라이브러리 없이 최소한만: 기록은 dict 조회 + 덧셈 정도라 핫패스 부담 거의 없음
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_METRICS: list = []
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: dict[tuple, float] = {}
+        _METRICS.append(self)
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        out += [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in self._values.items()]
+        return out
+
+
+class Gauge:
+    # fn을 주면 스크레이프할 때 값을 읽어옴(평소엔 비용 0)
+    def __init__(self, name: str, help: str, fn=None):
+        self.name, self.help, self.fn = name, help, fn
+        self.value = 0.0
+        _METRICS.append(self)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> list[str]:
+        value = self.value
+        if self.fn is not None:
+            try:
+                value = float(self.fn())
+            except Exception:
+                value = float("nan")
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = _LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series: dict[tuple, list] = {}  # labels → [버킷별 개수..., 합계, 개수]
+        _METRICS.append(self)
+
+    def observe(self, value: float, *labels) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        n = len(self.buckets)
+        for key, series in self._series.items():
+            acc = 0
+            for i, le in enumerate(self.buckets):
+                acc += series[i]
+                le_label = f'le="{le}"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le_label)} {acc}")
+            inf_label = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, inf_label)} {series[n + 1]}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {series[n]}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {series[n + 1]}")
+        return out
+
+
+def render_metrics() -> str:
+    lines: list[str] = []
+    for m in _METRICS:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+COMMAND_REPLY_SECONDS = Histogram("sbot_command_reply_seconds", "interaction 수신 → 첫 응답(safe_reply)까지", ("command",))
+COMMAND_DURATION_SECONDS = Histogram("sbot_command_duration_seconds", "interaction 수신 → 핸들러 종료까지", ("command", "status"))
+REST_REQUESTS = Counter("sbot_rest_requests_total", "Discord REST 호출 수", ("method", "status"))
+RATE_LIMIT_HITS = Counter("sbot_rate_limit_hits_total", "429 응답 수", ("scope",))
+LOOP_LAG_SECONDS = Histogram("sbot_event_loop_lag_seconds", "이벤트 루프 지연")
+AUTO_MESSAGES = Counter("sbot_auto_messages_total", "자동메시지 회차 결과 (skipped = 조용한 채널이라 건너뜀)",
+                        ("policy", "result"))
+AUTO_DEFERS = Counter("sbot_auto_defers_total", "AUTO_DEFER_SECONDS 안에 응답 안 해서 자동 defer한 수", ("command",))
+LOOP_STALLS = Counter("sbot_event_loop_stalls_total", "LOOP_STALL_SECONDS 넘게 멈춘 횟수")
+SAVE_SECONDS = Histogram("sbot_save_seconds", "저장(write-behind flush) 소요 시간", ("target",))
+AUTO_TICK_SECONDS_HIST = Histogram("sbot_auto_message_tick_seconds", "auto_message_task 한 틱 소요 시간")
+COMMAND_SYNC = Counter("sbot_command_sync_total", "명령어 트리 sync 결과", ("scope", "result"))
+COMMAND_SYNC_SECONDS = Histogram("sbot_command_sync_seconds", "명령어 트리 sync 확인/실행 시간", ("scope", "result"))
+OUTBOUND_QUEUE_SECONDS = Histogram("sbot_outbound_queue_seconds", "나가는 요청 대기 시간(우선순위 큐)", ("class",))
+AUTOMOD_HITS = Counter("sbot_automod_hits_total", "automod 적발 수", ("rule",))
+RAID_ACTIONS = Counter("sbot_raid_actions_total", "레이드 대응 결과(계정 수)", ("result",))
+BULK_CONFIG_ROWS = Counter("sbot_bulk_config_rows_total", "일괄 설정 행 처리 결과", ("op", "result"))
+OUTBOUND_REQUESTS = Counter("sbot_outbound_requests_total", "우선순위 큐를 거친 요청 수", ("class", "result"))
+STARTUP_SECONDS = Gauge("sbot_startup_seconds", "프로세스 시작 → 첫 on_ready(명령어 처리 가능)까지")
+# 아래는 스크레이프할 때 읽기만 함
+Gauge("sbot_gateway_latency_seconds", "게이트웨이 heartbeat 지연", lambda: client.latency)
+Gauge("sbot_event_loop_lag_last_seconds", "마지막 측정 이벤트 루프 지연", lambda: _loop_lag_last)
+Gauge("sbot_save_bytes", "마지막 save_data 저장 크기(바이트)", lambda: _saver.last_bytes)
+Gauge("sbot_log_queue_depth", "로그 대기 줄 수", lambda: LOG_BATCHER.depth())
+Gauge("sbot_log_flush_latency_seconds", "마지막 로그 묶음 대기 → 전송 시간", lambda: LOG_BATCHER.last_flush_latency)
+Gauge("sbot_log_lines_dropped", "큐 초과로 버린 로그 줄 수(누적)", lambda: LOG_BATCHER.lines_dropped)
+Gauge("sbot_auto_jobs", "예약된 자동메시지 수", lambda: len(AUTO_SCHEDULER))
+Gauge("sbot_auto_messages_sent", "보낸 자동메시지 수(누적)", lambda: AUTO_SCHEDULER.sent)
+Gauge("sbot_delete_queue_pending", "삭제 대기 메시지 수", lambda: DELETE_QUEUE.pending())
+Gauge("sbot_delete_queue_overdue", "삭제 시각 지난 메시지 수", lambda: DELETE_QUEUE.overdue())
+Gauge("sbot_automod_tracked_users", "automod가 추적 중인 (길드, 유저) 수", lambda: len(AUTOMOD))
+Gauge("sbot_outbound_queue_depth", "우선순위 큐에서 기다리는 요청 수", lambda: OUTBOUND.depth())
+Gauge("sbot_outbound_inflight", "실행 중인 나가는 요청 수", lambda: OUTBOUND.inflight)
+Gauge("sbot_warm_start", "이번 시작이 웜 스타트였는지 (1/0)", lambda: 1 if WARM_START else 0)
+
 
 # =========================
 # 데이터 저장/로드
 # =========================
+# 변경은 바로 쓰지 않고 dirty 표시만 → SAVE_DELAY_SECONDS 안의 변경을 한 번에 묶어서 저장
+SAVE_DELAY_SECONDS = float(os.getenv("SAVE_DELAY_SECONDS", "2"))
+
+
 def load_data() -> dict:
     if not os.path.exists(DATA_FILE):
         return {
             "log_channel_id": {},     # log_channel_id[guild_id] = channel_id
-            "auto_channel_id": {},    # auto_channel_id[guild_id] = channel_id
-            "auto_message": {},       # auto_message[guild_id] = "문구"
-            "warnings": {},           # warnings[guild_id][user_id] = [ ... ]
+            "auto_jobs": {},          # auto_jobs[guild_id][slot] = {"channel_id", "message", "interval"}
+            "word_filters": {},       # word_filters[guild_id] = {"words": [...], "domains": [...]}
+            "warn_ttl_days": {},      # warn_ttl_days[guild_id] = 경고 만료 일수 (0 = 만료 없음, 없으면 WARN_TTL_DAYS)
+            "auto_idle": {},          # auto_idle[guild_id] = 조용한 채널 정책 (없으면 AUTO_IDLE_POLICY)
+            "raid": {},               # raid[guild_id] = {"action", "joins"} (없는 키는 RAID_ACTION/RAID_JOINS)
+            "automod": {},            # automod[guild_id] = {"enabled", "rate", "dup"} (없는 키는 AUTOMOD_* 기본값)
+            "warnings": {},           # warnings[guild_id][user_id] = [ ... ] (시간순)
+            "warnings_expired": {},   # warnings_expired[guild_id][user_id] = 보관 파일로 옮긴(만료) 경고 수
         }
 
     with open(DATA_FILE, "r", encoding="utf-8") as f:
         data = json.load(f)
 
     data.setdefault("log_channel_id", {})
-    data.setdefault("auto_channel_id", {})
-    data.setdefault("auto_message", {})
+    data.setdefault("word_filters", {})
+    data.setdefault("warn_ttl_days", {})
+    data.setdefault("auto_idle", {})
+    data.setdefault("raid", {})
+    data.setdefault("automod", {})
     data.setdefault("warnings", {})
+    data.setdefault("warnings_expired", {})
+    return _migrate_legacy_auto(data)
+
+
+def _migrate_legacy_auto(data: dict) -> dict:
+    # 예전 포맷(auto_channel_id/auto_message, 길드당 1개) → auto_jobs[guild_id]["1"]
+    jobs = data.setdefault("auto_jobs", {})
+    chans = data.pop("auto_channel_id", None) or {}
+    msgs = data.pop("auto_message", None) or {}
+    for gid, ch_id in chans.items():
+        jobs.setdefault(gid, {}).setdefault("1", {
+            "channel_id": int(ch_id),
+            "message": msgs.get(gid, AUTO_DEFAULT_MESSAGE),
+            "interval": AUTO_DEFAULT_INTERVAL_MINUTES,
+        })
     return data
 
 
+def _snapshot(obj):
+    # 루프 스레드에서 dict/list 구조만 복사 → 워커 스레드가 직렬화하는 동안 DATA가 바뀌어도 안전
+    if isinstance(obj, dict):
+        return {k: _snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_snapshot(v) for v in obj]
+    return obj
+
+
+def _write_json_atomic(path: str, data: dict) -> int:
+    # 임시파일에 다 쓰고 fsync 후 rename → 중간에 죽어도 기존 파일은 멀쩡함
+    payload = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(payload)
+
+
+def _append_lines_durable(path: str, lines: list[str]) -> None:
+    # 보관용 추가 쓰기: fsync까지 끝나야 원본을 지움
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(line + "\n" for line in lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_archive_lines(path: str):
+    # 보관 파일 한 줄씩 (마지막 줄이 쓰다 끊긴 경우는 건너뜀)
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+# =========================
+# 저장소 백엔드 (json / sqlite)
+# =========================
+_WARNING_SECTIONS = ("warnings", "warnings_expired")  # 경고 데이터 (길드 설정 아님)
+
+
+def _warn_ts(entry: dict) -> str:
+    return entry.get("ts", "")
+
+
+class JsonStorage:
+    # 기존 방식: DATA 전체(경고 포함)를 sbot_data.json 하나에 저장
+    def load(self) -> dict:
+        return load_data()
+
+    async def persist(self, snap: dict) -> int:
+        return await asyncio.to_thread(_write_json_atomic, DATA_FILE, snap)
+
+    def persist_sync(self, snap: dict) -> int:
+        return _write_json_atomic(DATA_FILE, snap)
+
+    async def add_warning(self, guild_id: int, user_id: int, entry: dict) -> int:
+        items = DATA["warnings"].setdefault(_gid(guild_id), {}).setdefault(_uid(user_id), [])
+        items.append(entry)
+        save_data(DATA)
+        return len(items)
+
+    async def add_warnings(self, guild_id: int, entries: list[tuple[int, dict]]) -> None:
+        # 여러 명 한꺼번에 (레이드 대응) → 저장 표시도 한 번
+        users = DATA["warnings"].setdefault(_gid(guild_id), {})
+        for user_id, entry in entries:
+            users.setdefault(_uid(user_id), []).append(entry)
+        save_data(DATA)
+
+    async def get_warnings(self, guild_id: int, user_id: int, limit: int, offset: int = 0) -> tuple[int, list[dict]]:
+        # 최신에서 offset개 건너뛴 limit개 (시간순으로 반환)
+        items = DATA.get("warnings", {}).get(_gid(guild_id), {}).get(_uid(user_id), [])
+        end = max(0, len(items) - offset)
+        return len(items), items[max(0, end - limit):end]
+
+    async def iter_warnings(self, guild_id: int, batch: int):
+        # 길드 전체 경고를 batch개씩 (user_id, entry) 목록으로 (내보내기용)
+        users = DATA.get("warnings", {}).get(_gid(guild_id), {})
+        rows: list[tuple[int, dict]] = []
+        for uid_str in list(users):
+            for w in list(users.get(uid_str, ())):
+                rows.append((int(uid_str), w))
+                if len(rows) >= batch:
+                    yield rows
+                    rows = []
+        # 만료돼서 보관 파일로 옮긴 경고 (파일 읽기는 워커 스레드에서 batch개씩)
+        archive = _read_archive_lines(WARN_ARCHIVE_FILE)
+        while True:
+            found, more = await asyncio.to_thread(self._archive_batch, archive, guild_id, batch - len(rows))
+            rows.extend(found)
+            if len(rows) >= batch:
+                yield rows
+                rows = []
+            if not more:
+                break
+        if rows:
+            yield rows
+
+    @staticmethod
+    def _archive_batch(archive, guild_id: int, limit: int) -> tuple[list[tuple[int, dict]], bool]:
+        found: list[tuple[int, dict]] = []
+        for rec in archive:
+            if rec.get("guild_id") != guild_id:
+                continue
+            found.append((rec.get("user_id", 0), {"by": rec.get("by", ""), "reason": rec.get("reason", ""),
+                                                  "ts": rec.get("ts", ""), "archived": True}))
+            if len(found) >= limit:
+                return found, True
+        return found, False
+
+    async def warning_times(self, guild_id: int, user_id: int, since: str) -> list[str]:
+        items = DATA.get("warnings", {}).get(_gid(guild_id), {}).get(_uid(user_id), [])
+        return [_warn_ts(w) for w in items[bisect.bisect_left(items, since, key=_warn_ts):]]
+
+    async def expired_count(self, guild_id: int, user_id: int) -> int:
+        return DATA.get("warnings_expired", {}).get(_gid(guild_id), {}).get(_uid(user_id), 0)
+
+    async def warning_guilds(self) -> list[int]:
+        return [int(g) for g in DATA.get("warnings", {}) if g.isdigit()]
+
+    async def compact_warnings(self, cutoffs: dict[int, str]) -> int:
+        # 목록은 시간순 → 만료된 앞부분을 보관 파일에 먼저 덧붙이고(fsync) 나서 잘라냄
+        #   개수는 warnings_expired 에 더함 (/warnings 표시용), 내용은 /exportwarnings 가 보관 파일에서 읽음
+        archived_at = discord.utils.utcnow().isoformat()
+        lines: list[str] = []
+        counts: dict[tuple[str, str], int] = {}
+        scanned = 0
+        for gid_str, users in list(DATA.get("warnings", {}).items()):
+            cutoff = cutoffs.get(int(gid_str)) if gid_str.isdigit() else None
+            if cutoff is None:
+                continue
+            for uid_str, items in list(users.items()):
+                n = bisect.bisect_left(items, cutoff, key=_warn_ts)
+                if n:
+                    counts[(gid_str, uid_str)] = n
+                    lines.extend(
+                        json.dumps({"guild_id": int(gid_str), "user_id": int(uid_str), "by": w.get("by", ""),
+                                    "reason": w.get("reason", ""), "ts": w.get("ts", ""), "archived_at": archived_at},
+                                   ensure_ascii=False)
+                        for w in items[:n]
+                    )
+                scanned += 1
+                if scanned % 1000 == 0:
+                    await asyncio.sleep(0)  # 유저가 많아도 루프를 오래 막지 않게
+        if not lines:
+            return 0
+        await asyncio.to_thread(_append_lines_durable, WARN_ARCHIVE_FILE, lines)
+
+        # 쓰는 동안 /clearwarnings 등으로 바뀌었을 수 있음 → 지금 목록 기준으로 보관한 개수까지만 자름
+        expired = DATA.setdefault("warnings_expired", {})
+        warnings = DATA.get("warnings", {})
+        removed = 0
+        for (gid_str, uid_str), archived in counts.items():
+            users = warnings.get(gid_str, {})
+            items = users.get(uid_str)
+            if not items:
+                continue
+            n = min(archived, bisect.bisect_left(items, cutoffs[int(gid_str)], key=_warn_ts))
+            del items[:n]
+            summary = expired.setdefault(gid_str, {})
+            summary[uid_str] = summary.get(uid_str, 0) + n
+            removed += n
+            if not items:
+                users.pop(uid_str, None)
+                if not users:
+                    warnings.pop(gid_str, None)
+        if removed:
+            save_data(DATA)
+        return removed
+
+    async def clear_warnings(self, guild_id: int, user_id: int) -> bool:
+        if DATA.get("warnings", {}).get(_gid(guild_id), {}).get(_uid(user_id)) is None:
+            return False
+        DATA["warnings"][_gid(guild_id)].pop(_uid(user_id), None)
+        DATA.get("warnings_expired", {}).get(_gid(guild_id), {}).pop(_uid(user_id), None)
+        save_data(DATA)
+        return True
+
+    async def claim_job(self, guild_id: int, slot: str, due: float) -> bool:
+        return True  # 프로세스 하나라 항상 내 것
+
+
+class SqliteStorage:
+    # 길드 설정: guild_config(section, guild_id) → JSON 값 (DATA의 설정 dict 그대로 왕복)
+    #   바뀐 키만 upsert, 지운 키는 'null' 묘비 + rev 증가 → 여러 프로세스가 서로 변경을 안 덮어쓰고
+    #   rev > 마지막으로 본 rev 만 읽어서 다른 프로세스 변경을 따라감
+    # 경고: warnings 테이블 + (guild_id, user_id, ts) 인덱스 → 메모리에 안 올림
+    #   만료된 경고는 warnings_archive 로 옮김 (지우지 않음)
+    # job_runs: (길드, 슬롯, 실행 시각) 선점 → 같은 자동메시지가 두 프로세스에서 나가지 않음
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key   TEXT PRIMARY KEY,
+        value TEXT
+    );
+    CREATE TABLE IF NOT EXISTS guild_config (
+        section  TEXT NOT NULL,
+        guild_id TEXT NOT NULL,
+        value    TEXT NOT NULL,
+        PRIMARY KEY (section, guild_id)
+    );
+    CREATE TABLE IF NOT EXISTS warnings (
+        id       INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        user_id  INTEGER NOT NULL,
+        by_id    TEXT NOT NULL DEFAULT '',
+        reason   TEXT NOT NULL DEFAULT '',
+        ts       TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_warnings_guild_user_ts ON warnings (guild_id, user_id, ts);
+    CREATE TABLE IF NOT EXISTS warnings_archive (
+        id          INTEGER PRIMARY KEY,
+        guild_id    INTEGER NOT NULL,
+        user_id     INTEGER NOT NULL,
+        by_id       TEXT NOT NULL DEFAULT '',
+        reason      TEXT NOT NULL DEFAULT '',
+        ts          TEXT NOT NULL,
+        archived_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_warnings_archive_guild_user_ts ON warnings_archive (guild_id, user_id, ts);
+    CREATE TABLE IF NOT EXISTS warnings_expired (
+        guild_id INTEGER NOT NULL,
+        user_id  INTEGER NOT NULL,
+        count    INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, user_id)
+    );
+    CREATE TABLE IF NOT EXISTS job_runs (
+        guild_id INTEGER NOT NULL,
+        slot     TEXT NOT NULL,
+        due      INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, slot, due)
+    );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # 커넥션은 전용 스레드 1개에서만 씀 → 쿼리는 직렬화되고 이벤트 루프는 안 막힘
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn: sqlite3.Connection | None = None
+        self._written: dict[tuple[str, str], str] = {}  # DB에 있는 설정 값(JSON 문자열) — 변경분 계산용
+        self._polled: dict[tuple[str, str], str] = {}   # 다른 프로세스 변경 중 아직 DATA 반영 확인(ack) 전인 것
+        self._seen_rev = 0
+        self._claims = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            cols = [row[1] for row in conn.execute("PRAGMA table_info(guild_config)")]
+            if "rev" not in cols:
+                conn.execute("ALTER TABLE guild_config ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_guild_config_rev ON guild_config (rev)")
+            self._conn = conn
+        return self._conn
+
+    def _call_sync(self, fn, *args):
+        return self._pool.submit(fn, *args).result()
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._pool, partial(fn, *args))
+
+    # ---- 시작 / 마이그레이션 ----
+    def load(self) -> dict:
+        return self._call_sync(self._load)
+
+    def _load(self) -> dict:
+        db = self._db()
+        migrated = db.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if not migrated and os.path.exists(DATA_FILE):
+            self._migrate_from_json(DATA_FILE)
+
+        data = {"log_channel_id": {}, "auto_jobs": {}, "word_filters": {}, "warn_ttl_days": {}}
+        for section, gid, value, rev in db.execute("SELECT section, guild_id, value, rev FROM guild_config"):
+            self._seen_rev = max(self._seen_rev, rev)
+            if value == "null":
+                continue
+            self._written[(section, gid)] = value
+            data.setdefault(section, {})[gid] = json.loads(value)
+        data["warnings"] = {}  # 경고는 DB에서 바로 조회
+        return _migrate_legacy_auto(data)
+
+    def _migrate_from_json(self, path: str) -> None:
+        # 1회성: 기존 sbot_data.json → SQLite (원본 파일은 그대로 둠)
+        with open(path, "r", encoding="utf-8") as f:
+            old = json.load(f)
+
+        db = self._db()
+        with db:
+            for section, mapping in old.items():
+                if section in _WARNING_SECTIONS or not isinstance(mapping, dict):
+                    continue
+                db.executemany(
+                    "INSERT OR REPLACE INTO guild_config (section, guild_id, value) VALUES (?, ?, ?)",
+                    [(section, gid, json.dumps(v, ensure_ascii=False)) for gid, v in mapping.items()],
+                )
+            for gid, users in old.get("warnings", {}).items():
+                for uid, items in users.items():
+                    db.executemany(
+                        "INSERT INTO warnings (guild_id, user_id, by_id, reason, ts) VALUES (?, ?, ?, ?, ?)",
+                        [(int(gid), int(uid), str(w.get("by", "")), w.get("reason", ""), w.get("ts", "")) for w in items],
+                    )
+            for gid, users in old.get("warnings_expired", {}).items():
+                db.executemany(
+                    "INSERT OR REPLACE INTO warnings_expired (guild_id, user_id, count) VALUES (?, ?, ?)",
+                    [(int(gid), int(uid), int(n)) for uid, n in users.items()],
+                )
+            db.executemany(
+                "INSERT INTO warnings_archive (guild_id, user_id, by_id, reason, ts, archived_at) VALUES (?, ?, ?, ?, ?, ?)",
+                ((r.get("guild_id", 0), r.get("user_id", 0), str(r.get("by", "")), r.get("reason", ""), r.get("ts", ""),
+                  r.get("archived_at", "")) for r in _read_archive_lines(WARN_ARCHIVE_FILE)),
+            )
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (path,))
+        print(f"[sqlite] migrated {path} → {self.path}")
+
+    # ---- 설정 저장 (WriteBehind가 호출) ----
+    def _write_config(self, snap: dict) -> int:
+        current = {
+            (section, gid): json.dumps(v, ensure_ascii=False)
+            for section, mapping in snap.items()
+            if section not in _WARNING_SECTIONS and isinstance(mapping, dict)
+            for gid, v in mapping.items()
+        }
+        changed = [(key, value) for key, value in current.items() if self._written.get(key) != value]
+        removed = [(key, "null") for key in self._written if key not in current]
+        if not changed and not removed:
+            return 0
+
+        db = self._db()
+        with db:
+            # 쓰기 잠금부터 잡고 rev 를 읽음 → 두 프로세스가 같은 rev 를 못 받고 rev 순서 = 커밋 순서
+            #   (같은 rev 로 늦게 커밋되면 이미 그 rev 까지 본 워커가 _poll_config 에서 영영 못 봄)
+            db.execute("BEGIN IMMEDIATE")
+            rev = db.execute("SELECT COALESCE(MAX(rev), 0) + 1 FROM guild_config").fetchone()[0]
+            db.executemany(
+                "INSERT OR REPLACE INTO guild_config (section, guild_id, value, rev) VALUES (?, ?, ?, ?)",
+                [(section, gid, value, rev) for (section, gid), value in changed + removed],
+            )
+        self._written = current
+        return sum(len(value) for _, value in changed)
+
+    def _poll_config(self) -> list[tuple[str, str, object]]:
+        # 마지막으로 본 rev 이후 바뀐 설정 (다른 프로세스가 쓴 것 포함)
+        # _written 은 여기서 안 바꿈: DATA에 반영되기 전에 찍힌 스냅샷(옛 값)을 _write_config 가
+        #   내 변경으로 보고 새 rev 로 되돌려 쓰지 않게, 반영한 뒤 ack_config 에서 바꿈
+        rows = self._db().execute(
+            "SELECT section, guild_id, value, rev FROM guild_config WHERE rev > ? ORDER BY rev", (self._seen_rev,)
+        ).fetchall()
+        out = []
+        for section, gid, value, rev in rows:
+            self._seen_rev = max(self._seen_rev, rev)
+            if self._written.get((section, gid), "null") == value:
+                continue  # 내가 쓴 것
+            self._polled[(section, gid)] = value
+            out.append((section, gid, json.loads(value)))
+        return out
+
+    def _ack_config(self) -> None:
+        for key, value in self._polled.items():
+            if value == "null":
+                self._written.pop(key, None)
+            else:
+                self._written[key] = value
+        self._polled = {}
+
+    async def poll_config(self) -> list[tuple[str, str, object]]:
+        return await self._call(self._poll_config)
+
+    def ack_config(self) -> None:
+        # poll_config 결과를 DATA에 반영한 직후 await 없이 부를 것
+        #   → 전용 스레드 큐(FIFO)에서 그 뒤에 찍힌 스냅샷의 _write_config 보다 먼저 실행됨
+        self._pool.submit(self._ack_config)
+
+    def _claim_job(self, guild_id: int, slot: str, due: float) -> bool:
+        db = self._db()
+        with db:
+            cur = db.execute("INSERT OR IGNORE INTO job_runs (guild_id, slot, due) VALUES (?, ?, ?)", (guild_id, slot, int(due)))
+            self._claims += 1
+            if self._claims % 1000 == 0:
+                db.execute("DELETE FROM job_runs WHERE due < ?", (int(time.time()) - 24 * 3600,))
+        return cur.rowcount > 0
+
+    async def claim_job(self, guild_id: int, slot: str, due: float) -> bool:
+        return await self._call(self._claim_job, guild_id, slot, due)
+
+    async def persist(self, snap: dict) -> int:
+        return await self._call(self._write_config, snap)
+
+    def persist_sync(self, snap: dict) -> int:
+        return self._call_sync(self._write_config, snap)
+
+    # ---- 경고 ----
+    def _add_warning(self, guild_id: int, user_id: int, entry: dict) -> int:
+        db = self._db()
+        with db:
+            db.execute(
+                "INSERT INTO warnings (guild_id, user_id, by_id, reason, ts) VALUES (?, ?, ?, ?, ?)",
+                (guild_id, user_id, entry.get("by", ""), entry.get("reason", ""), entry.get("ts", "")),
+            )
+        return db.execute(
+            "SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        ).fetchone()[0]
+
+    def _add_warnings(self, guild_id: int, entries: list[tuple[int, dict]]) -> None:
+        db = self._db()
+        with db:  # 트랜잭션 하나
+            db.executemany(
+                "INSERT INTO warnings (guild_id, user_id, by_id, reason, ts) VALUES (?, ?, ?, ?, ?)",
+                [(guild_id, uid, e.get("by", ""), e.get("reason", ""), e.get("ts", "")) for uid, e in entries],
+            )
+
+    def _get_warnings(self, guild_id: int, user_id: int, limit: int, offset: int) -> tuple[int, list[dict]]:
+        db = self._db()
+        total = db.execute(
+            "SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        ).fetchone()[0]
+        rows = db.execute(
+            "SELECT by_id, reason, ts FROM warnings WHERE guild_id = ? AND user_id = ? ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+            (guild_id, user_id, limit, offset),
+        ).fetchall()
+        return total, [{"by": b, "reason": r, "ts": ts} for b, r, ts in reversed(rows)]
+
+    def _warnings_after(self, guild_id: int, after: tuple, limit: int, table: str = "warnings") -> list[tuple]:
+        # (user_id, ts, id) 키셋 페이지 → 인덱스 순서대로 읽어서 OFFSET 없이 이어감 (table: warnings | warnings_archive)
+        return self._db().execute(
+            f"SELECT user_id, ts, id, by_id, reason FROM {table} WHERE guild_id = ? AND (user_id, ts, id) > (?, ?, ?) "
+            "ORDER BY user_id, ts, id LIMIT ?",
+            (guild_id, *after, limit),
+        ).fetchall()
+
+    def _clear_warnings(self, guild_id: int, user_id: int) -> bool:
+        db = self._db()
+        with db:
+            cur = db.execute("DELETE FROM warnings WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+            db.execute("DELETE FROM warnings_expired WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+        return cur.rowcount > 0
+
+    def _warning_times(self, guild_id: int, user_id: int, since: str) -> list[str]:
+        rows = self._db().execute(
+            "SELECT ts FROM warnings WHERE guild_id = ? AND user_id = ? AND ts >= ? ORDER BY ts",
+            (guild_id, user_id, since),
+        ).fetchall()
+        return [ts for (ts,) in rows]
+
+    def _expired_count(self, guild_id: int, user_id: int) -> int:
+        row = self._db().execute(
+            "SELECT count FROM warnings_expired WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _warning_guilds(self) -> list[int]:
+        return [g for (g,) in self._db().execute("SELECT DISTINCT guild_id FROM warnings")]
+
+    def _compact_warnings(self, cutoffs: dict[int, str]) -> int:
+        # 길드별로 만료 행을 warnings_archive 로 옮기고 개수 요약 (길드 하나당 트랜잭션 하나)
+        db = self._db()
+        removed = 0
+        archived_at = discord.utils.utcnow().isoformat()
+        for guild_id, cutoff in cutoffs.items():
+            with db:
+                db.execute(
+                    """
+                    INSERT INTO warnings_archive (guild_id, user_id, by_id, reason, ts, archived_at)
+                    SELECT guild_id, user_id, by_id, reason, ts, ? FROM warnings WHERE guild_id = ? AND ts < ?
+                    """,
+                    (archived_at, guild_id, cutoff),
+                )
+                db.execute(
+                    """
+                    INSERT INTO warnings_expired (guild_id, user_id, count)
+                    SELECT guild_id, user_id, COUNT(*) FROM warnings WHERE guild_id = ? AND ts < ? GROUP BY user_id
+                    ON CONFLICT (guild_id, user_id) DO UPDATE SET count = count + excluded.count
+                    """,
+                    (guild_id, cutoff),
+                )
+                removed += db.execute("DELETE FROM warnings WHERE guild_id = ? AND ts < ?", (guild_id, cutoff)).rowcount
+        return removed
+
+    async def add_warning(self, guild_id: int, user_id: int, entry: dict) -> int:
+        return await self._call(self._add_warning, guild_id, user_id, entry)
+
+    async def add_warnings(self, guild_id: int, entries: list[tuple[int, dict]]) -> None:
+        await self._call(self._add_warnings, guild_id, entries)
+
+    async def get_warnings(self, guild_id: int, user_id: int, limit: int, offset: int = 0) -> tuple[int, list[dict]]:
+        return await self._call(self._get_warnings, guild_id, user_id, limit, offset)
+
+    async def iter_warnings(self, guild_id: int, batch: int):
+        # 활성 경고 다음에 보관(만료)된 경고
+        for table, archived in (("warnings", False), ("warnings_archive", True)):
+            after = (-1, "", -1)
+            while True:
+                rows = await self._call(self._warnings_after, guild_id, after, batch, table)
+                if not rows:
+                    break
+                after = rows[-1][:3]
+                yield [(uid, {"by": b, "reason": r, "ts": ts, "archived": archived}) for uid, ts, _, b, r in rows]
+
+    async def clear_warnings(self, guild_id: int, user_id: int) -> bool:
+        return await self._call(self._clear_warnings, guild_id, user_id)
+
+    async def warning_times(self, guild_id: int, user_id: int, since: str) -> list[str]:
+        return await self._call(self._warning_times, guild_id, user_id, since)
+
+    async def expired_count(self, guild_id: int, user_id: int) -> int:
+        return await self._call(self._expired_count, guild_id, user_id)
+
+    async def warning_guilds(self) -> list[int]:
+        return await self._call(self._warning_guilds)
+
+    async def compact_warnings(self, cutoffs: dict[int, str]) -> int:
+        return await self._call(self._compact_warnings, cutoffs)
+
+
+def _make_storage():
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteStorage(SQLITE_FILE)
+    if STORAGE_BACKEND != "json":
+        print(f"[storage] unknown STORAGE_BACKEND={STORAGE_BACKEND!r}, using json")
+    return JsonStorage()
+
+
+class WriteBehind:
+    def __init__(self, delay: float, persist, persist_sync, name: str = "save_data"):
+        self.delay = delay
+        self.name = name
+        self._persist = persist            # async (snap) -> int
+        self._persist_sync = persist_sync  # (snap) -> int
+        self.last_bytes = 0
+        self.dirty = False
+        self._data: dict | None = None
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+
+    def mark(self, data: dict) -> None:
+        self._data = data
+        self.dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 루프 밖(시작 전/종료 후)에서는 그냥 바로 씀
+            return self.flush_sync()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.delay)
+        await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self.dirty or self._data is None:
+                return
+            self.dirty = False
+            snap = _snapshot(self._data)
+            started = time.perf_counter()
+            try:
+                self.last_bytes = await self._persist(snap)
+                SAVE_SECONDS.observe(time.perf_counter() - started, self.name)
+            except Exception as e:
+                print(f"[{self.name}] failed: {e}")
+                self.dirty = True
+
+        if self.dirty:
+            # 실패했으면 다음 창에서 다시 시도
+            self.mark(self._data)
+
+    def flush_sync(self) -> None:
+        if not self.dirty or self._data is None:
+            return
+        self.dirty = False
+        try:
+            self._persist_sync(_snapshot(self._data))
+        except Exception as e:
+            print(f"[{self.name}] failed: {e}")
+            self.dirty = True
+
+
+STORE = _make_storage()
+_saver = WriteBehind(SAVE_DELAY_SECONDS, STORE.persist, STORE.persist_sync)
+atexit.register(_saver.flush_sync)
+
+
 def save_data(data: dict) -> None:
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    _saver.mark(data)
 
 
-DATA = load_data()
+DATA = STORE.load()
 
 
 def _gid(guild_id: int) -> str:
@@ -72,14 +952,557 @@ def _uid(user_id: int) -> str:
     return str(user_id)
 
 
+# =========================
+# 길드 설정 인덱스
+# =========================
+# DATA는 저장 포맷(문자열 키 dict) 그대로 두고, 실행 중에는 int 길드ID → __slots__ 객체로 읽음
+# - 로그/자동메시지처럼 자주 도는 경로는 int() 변환이나 dict 생성 없이 속성만 읽음
+# - 해석한 채널 객체도 캐시 (채널 삭제/길드 재생성/설정 변경 때 비움)
+# - 쓰기는 CONFIG를 거쳐 DATA 해당 길드 항목만 다시 씀 → 디스크 포맷은 그대로
+class AutoJob:
+    # last_activity / last_sent: 그 채널에 사람이 마지막으로 말한 시각 / 마지막 자동메시지 시각 (monotonic, 저장 안 함)
+    # idle_gap / idle_ticks: backoff 정책에서 지금 몇 회차마다 보내는지 / 그 뒤로 건너뛴 회차
+    __slots__ = ("channel_id", "message", "interval", "period", "channel", "last_activity", "last_sent", "idle_gap",
+                 "idle_ticks")
+
+    def __init__(self, channel_id: int, message: str, interval: int):
+        self.channel_id = channel_id
+        self.message = message
+        self.interval = interval
+        self.period = max(1, interval) * 60
+        self.channel = None
+        self.last_activity: float | None = None
+        self.last_sent: float | None = None   # None = 시작/설정 후 아직 안 보냄 → 활동을 모르니 일단 보냄
+        self.idle_gap = 1
+        self.idle_ticks = 0
+
+    @classmethod
+    def from_data(cls, raw: dict) -> "AutoJob":
+        return cls(int(raw["channel_id"]), raw.get("message"), int(raw.get("interval", AUTO_DEFAULT_INTERVAL_MINUTES)))
+
+    def to_data(self) -> dict:
+        return {"channel_id": self.channel_id, "message": self.message, "interval": self.interval}
+
+
+class GuildConfig:
+    __slots__ = ("guild_id", "log_channel_id", "auto_jobs", "log_channel", "words", "domains", "keyword_filter",
+                 "warn_ttl_days", "auto_idle", "raid_action", "raid_joins", "automod_on", "automod_rate", "automod_dup")
+
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.log_channel_id: int | None = None
+        self.auto_jobs: dict[str, AutoJob] = {}   # slot("1"~) → AutoJob
+        self.log_channel = None
+        self.words: list[str] = []                # 금지어 / 금지 도메인 (저장 포맷 그대로)
+        self.domains: list[str] = []
+        self.keyword_filter = None                # 컴파일된 KeywordFilter (목록 바뀌면 None → 다음 메시지 때 다시 만듦)
+        self.warn_ttl_days: int | None = None     # None = WARN_TTL_DAYS
+        self.auto_idle: str | None = None         # None = AUTO_IDLE_POLICY
+        self.raid_action: str | None = None       # None = RAID_ACTION
+        self.raid_joins: int | None = None        # None = RAID_JOINS
+        self.automod_on: bool | None = None       # None = AUTOMOD_ENABLED
+        self.automod_rate: int | None = None      # None = AUTOMOD_RATE
+        self.automod_dup: int | None = None       # None = AUTOMOD_DUP_COUNT
+
+    def is_empty(self) -> bool:
+        return (self.log_channel_id is None and not self.auto_jobs and not self.words and not self.domains
+                and self.warn_ttl_days is None and self.auto_idle is None
+                and self.raid_action is None and self.raid_joins is None
+                and self.automod_on is None and self.automod_rate is None and self.automod_dup is None)
+
+    def forget_channels(self, channel_id: int | None = None) -> None:
+        if channel_id is None or self.log_channel_id == channel_id:
+            self.log_channel = None
+        for job in self.auto_jobs.values():
+            if channel_id is None or job.channel_id == channel_id:
+                job.channel = None
+
+
+def _cached_channel(guild: discord.Guild, cached, channel_id: int):
+    # 길드가 재생성(장애 후 GUILD_CREATE)되면 채널 객체도 새로 만들어지므로 guild 동일성으로 확인
+    if cached is not None and cached.guild is guild:
+        return cached
+    ch = guild.get_channel(channel_id)
+    return ch if ch and is_text_channel(ch) else None
+
+
+class ConfigIndex:
+    SECTIONS = ("log_channel_id", "auto_jobs", "word_filters", "warn_ttl_days", "auto_idle", "raid", "automod")
+
+    def __init__(self):
+        self._guilds: dict[int, GuildConfig] = {}
+
+    def __len__(self) -> int:
+        return len(self._guilds)
+
+    def get(self, guild_id: int) -> GuildConfig | None:
+        return self._guilds.get(guild_id)
+
+    def guild_ids(self) -> list[int]:
+        return list(self._guilds)
+
+    # ---- DATA → 인덱스 ----
+    def load(self, data: dict) -> None:
+        self._guilds.clear()
+        gids = set()
+        for section in self.SECTIONS:
+            gids.update(data.get(section, {}))
+        for gid_str in gids:
+            self.reload(gid_str, data)
+
+    def reload(self, gid_str: str, data: dict | None = None) -> GuildConfig | None:
+        # 저장 포맷에서 한 길드만 다시 읽음 (시작 시 / 다른 프로세스 변경 반영 시)
+        data = DATA if data is None else data
+        try:
+            guild_id = int(gid_str)
+            cfg = GuildConfig(guild_id)
+            ch_id = data.get("log_channel_id", {}).get(gid_str)
+            cfg.log_channel_id = int(ch_id) if ch_id else None
+            for slot, raw in data.get("auto_jobs", {}).get(gid_str, {}).items():
+                cfg.auto_jobs[slot] = AutoJob.from_data(raw)
+            filters = data.get("word_filters", {}).get(gid_str, {})
+            cfg.words = list(filters.get("words", []))
+            cfg.domains = list(filters.get("domains", []))
+            ttl = data.get("warn_ttl_days", {}).get(gid_str)
+            cfg.warn_ttl_days = int(ttl) if ttl is not None else None
+            idle = data.get("auto_idle", {}).get(gid_str)
+            cfg.auto_idle = idle if idle in AUTO_IDLE_POLICIES else None
+            raid = data.get("raid", {}).get(gid_str, {})
+            cfg.raid_action = raid.get("action") if raid.get("action") in RAID_POLICIES else None
+            cfg.raid_joins = int(raid["joins"]) if raid.get("joins") is not None else None
+            automod = data.get("automod", {}).get(gid_str, {})
+            cfg.automod_on = bool(automod["enabled"]) if automod.get("enabled") is not None else None
+            cfg.automod_rate = int(automod["rate"]) if automod.get("rate") is not None else None
+            cfg.automod_dup = int(automod["dup"]) if automod.get("dup") is not None else None
+        except (TypeError, ValueError, KeyError) as e:
+            print(f"[config] bad entry guild={gid_str}: {e}")
+            return None
+        if cfg.is_empty():
+            self._guilds.pop(guild_id, None)
+            return None
+        self._guilds[guild_id] = cfg
+        return cfg
+
+    # ---- 인덱스 → DATA (저장) ----
+    def _commit(self, cfg: GuildConfig) -> None:
+        gid_str = _gid(cfg.guild_id)
+        logs = DATA.setdefault("log_channel_id", {})
+        jobs = DATA.setdefault("auto_jobs", {})
+        filters = DATA.setdefault("word_filters", {})
+        ttls = DATA.setdefault("warn_ttl_days", {})
+        idles = DATA.setdefault("auto_idle", {})
+        raids = DATA.setdefault("raid", {})
+        automods = DATA.setdefault("automod", {})
+        if cfg.log_channel_id:
+            logs[gid_str] = cfg.log_channel_id
+        else:
+            logs.pop(gid_str, None)
+        if cfg.auto_jobs:
+            jobs[gid_str] = {slot: job.to_data() for slot, job in cfg.auto_jobs.items()}
+        else:
+            jobs.pop(gid_str, None)
+        if cfg.words or cfg.domains:
+            filters[gid_str] = {"words": list(cfg.words), "domains": list(cfg.domains)}
+        else:
+            filters.pop(gid_str, None)
+        if cfg.warn_ttl_days is not None:
+            ttls[gid_str] = cfg.warn_ttl_days
+        else:
+            ttls.pop(gid_str, None)
+        if cfg.auto_idle is not None:
+            idles[gid_str] = cfg.auto_idle
+        else:
+            idles.pop(gid_str, None)
+        raid = {k: v for k, v in (("action", cfg.raid_action), ("joins", cfg.raid_joins)) if v is not None}
+        if raid:
+            raids[gid_str] = raid
+        else:
+            raids.pop(gid_str, None)
+        automod = {k: v for k, v in (("enabled", cfg.automod_on), ("rate", cfg.automod_rate), ("dup", cfg.automod_dup))
+                   if v is not None}
+        if automod:
+            automods[gid_str] = automod
+        else:
+            automods.pop(gid_str, None)
+        if cfg.is_empty():
+            self._guilds.pop(cfg.guild_id, None)
+        save_data(DATA)
+
+    def _edit(self, guild_id: int) -> GuildConfig:
+        cfg = self._guilds.get(guild_id)
+        if cfg is None:
+            cfg = self._guilds[guild_id] = GuildConfig(guild_id)
+        return cfg
+
+    def set_log_channel(self, guild_id: int, channel: discord.TextChannel) -> None:
+        cfg = self._edit(guild_id)
+        cfg.log_channel_id = channel.id
+        cfg.log_channel = channel
+        self._commit(cfg)
+
+    def set_auto_job(self, guild_id: int, slot: str, job: AutoJob, idle: str | None = None) -> None:
+        cfg = self._edit(guild_id)
+        old = cfg.auto_jobs.get(slot)
+        if old is not None and old.channel_id == job.channel_id:
+            job.last_activity, job.last_sent = old.last_activity, old.last_sent  # 같은 채널이면 활동 기록 유지
+        cfg.auto_jobs[slot] = job
+        if idle is not None:
+            cfg.auto_idle = idle
+        self._commit(cfg)
+
+    def del_auto_jobs(self, guild_id: int, slot: str | None) -> int:
+        cfg = self._guilds.get(guild_id)
+        if cfg is None:
+            return 0
+        if slot is None:
+            removed = len(cfg.auto_jobs)
+            cfg.auto_jobs.clear()
+        else:
+            removed = 1 if cfg.auto_jobs.pop(slot, None) else 0
+        self._commit(cfg)
+        return removed
+
+    def edit_filter(self, guild_id: int, kind: str, pattern: str, add: bool) -> bool:
+        # kind: "words" | "domains". 바뀌었으면 True (컴파일 캐시는 버림)
+        cfg = self._edit(guild_id)
+        items = getattr(cfg, kind)
+        if add == (pattern in items):
+            if cfg.is_empty():
+                self._guilds.pop(guild_id, None)
+            return False
+        if add:
+            items.append(pattern)
+        else:
+            items.remove(pattern)
+        cfg.keyword_filter = None
+        self._commit(cfg)
+        return True
+
+    def set_warn_ttl(self, guild_id: int, days: int) -> None:
+        cfg = self._edit(guild_id)
+        cfg.warn_ttl_days = days
+        self._commit(cfg)
+
+    def set_automod(self, guild_id: int, enabled: bool, rate: int | None, dup: int | None) -> None:
+        cfg = self._edit(guild_id)
+        cfg.automod_on = enabled
+        if rate is not None:
+            cfg.automod_rate = rate
+        if dup is not None:
+            cfg.automod_dup = dup
+        self._commit(cfg)
+
+    def set_raid(self, guild_id: int, action: str, joins: int | None) -> None:
+        cfg = self._edit(guild_id)
+        cfg.raid_action = action
+        if joins is not None:
+            cfg.raid_joins = joins
+        self._commit(cfg)
+
+    def keyword_filter(self, guild_id: int):
+        cfg = self._guilds.get(guild_id)
+        if cfg is None or not (cfg.words or cfg.domains):
+            return None
+        if cfg.keyword_filter is None:
+            cfg.keyword_filter = KeywordFilter(cfg.words, cfg.domains)
+        return cfg.keyword_filter
+
+    # ---- 채널 해석 (캐시) ----
+    def log_channel(self, guild: discord.Guild):
+        cfg = self._guilds.get(guild.id)
+        if cfg is None or cfg.log_channel_id is None:
+            return None
+        ch = cfg.log_channel = _cached_channel(guild, cfg.log_channel, cfg.log_channel_id)
+        return ch
+
+    def auto_channel(self, guild: discord.Guild, job: AutoJob):
+        ch = job.channel = _cached_channel(guild, job.channel, job.channel_id)
+        return ch
+
+    def forget_channel(self, guild_id: int, channel_id: int | None = None) -> None:
+        cfg = self._guilds.get(guild_id)
+        if cfg is not None:
+            cfg.forget_channels(channel_id)
+
+
+CONFIG = ConfigIndex()
+CONFIG.load(DATA)
+
+
+# =========================
+# 웜 스타트 스냅샷
+# =========================
+# 설정/명령어 sync 해시는 이미 저장소(DATA)에 있고 다시 읽는 비용도 작음 → 여기엔 저장소에 없는 것만
+def _token_tag() -> str:
+    return hashlib.sha256((TOKEN or "").encode()).hexdigest()[:16]  # 다른 봇 토큰의 스냅샷은 안 씀
+
+
+def read_warm_start(path: str, consume: bool = True) -> dict | None:
+    # 정상 종료 때만 생김. 읽고 지움 → 비정상 종료 후 재시작은 콜드 스타트
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snap = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[warm] ignored {path}: {e}")
+        snap = None
+    if consume:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    if not isinstance(snap, dict) or snap.get("v") != 1 or snap.get("token") != _token_tag():
+        return None
+    if time.time() - snap.get("saved_at", 0) > WARM_START_MAX_AGE:
+        return None
+    return snap
+
+
+WARM_START = read_warm_start(WARM_START_FILE)
+if WARM_START:
+    print(f"[warm] snapshot from {time.time() - WARM_START['saved_at']:.0f}s ago")
+
+
 # =========================
 # 디스코드 기본 세팅
 # =========================
 intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
-client = discord.Client(intents=intents)
-tree = app_commands.CommandTree(client)
+if LOW_MEMORY:
+    # 안 쓰는 이벤트는 아예 안 받음 (voice_states는 캐시도 차지함)
+    intents.typing = False
+    intents.voice_states = False
+    intents.invites = False
+    intents.webhooks = False
+    intents.integrations = False
+    intents.guild_scheduled_events = False
+
+
+def _make_http_trace() -> aiohttp.TraceConfig:
+    # discord.py가 쓰는 aiohttp 세션에 붙여서 REST 호출/429를 셈
+    trace = aiohttp.TraceConfig()
+
+    async def on_request_end(session, ctx, params):
+        status = params.response.status
+        REST_REQUESTS.inc(params.method, str(status))
+        if status == 429:
+            RATE_LIMIT_HITS.inc("global" if params.response.headers.get("X-RateLimit-Global") else "route")
+
+    async def on_request_exception(session, ctx, params):
+        REST_REQUESTS.inc(params.method, "error")
+
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+    return trace
+
+
+class InstrumentedTree(app_commands.CommandTree):
+    # 모든 명령어 공통: 수신 시각을 찍어두고 safe_reply / 완료 / 에러 때 지연 기록
+    # + AUTO_DEFER_SECONDS 타이머: 그때까지 응답을 시작 안 했으면 자동 defer (핸들러 끝나면 해제)
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["t0"] = time.perf_counter()
+        if AUTO_DEFER_SECONDS > 0:
+            interaction.extras["auto_defer"] = asyncio.get_running_loop().call_later(
+                AUTO_DEFER_SECONDS, _auto_defer, interaction)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError, /) -> None:
+        _disarm_auto_defer(interaction)
+        await super().on_error(interaction, error)
+
+
+def _disarm_auto_defer(interaction: discord.Interaction) -> None:
+    timer = interaction.extras.pop("auto_defer", None)
+    if timer is not None:
+        timer.cancel()
+
+
+def _auto_defer(interaction: discord.Interaction) -> None:
+    interaction.extras.pop("auto_defer", None)
+    if "responding" in interaction.extras or interaction.response.is_done():
+        return
+    AUTO_DEFERS.inc(interaction.command.name if interaction.command else "unknown")
+    interaction.extras["responding"] = asyncio.ensure_future(_defer(interaction))
+
+
+async def _defer(interaction: discord.Interaction) -> None:
+    try:
+        await outbound(PRIO_INTERACTION, interaction.response.defer, ephemeral=True, thinking=True)
+        _observe_command(interaction, COMMAND_REPLY_SECONDS)
+    except discord.HTTPException as e:
+        print(f"[auto_defer] failed: {e}")
+
+
+async def claim_response(interaction: discord.Interaction) -> bool:
+    # 첫 응답(response.*)을 내가 보내야 하면 True, 이미 응답(자동 defer 포함)했으면 False → followup으로
+    # 자동 defer와 핸들러가 동시에 첫 응답을 보내면 40060이라 여기서 한쪽만 고름
+    pending = interaction.extras.get("responding")
+    if pending is None and not interaction.response.is_done():
+        interaction.extras["responding"] = True
+        _disarm_auto_defer(interaction)
+        return True
+    if isinstance(pending, asyncio.Future):
+        await pending
+    return False
+
+
+def _observe_command(interaction: discord.Interaction, hist: Histogram, *labels) -> None:
+    t0 = interaction.extras.get("t0")
+    if t0 is None:
+        return
+    name = interaction.command.name if interaction.command else "unknown"
+    hist.observe(time.perf_counter() - t0, name, *labels)
+
+
+def client_options() -> dict:
+    opts = {
+        "intents": intents,
+        "http_trace": _make_http_trace(),
+        "max_messages": MESSAGE_CACHE_SIZE or None,
+    }
+    if LOW_MEMORY:
+        opts["chunk_guilds_at_startup"] = False
+        opts["member_cache_flags"] = discord.MemberCacheFlags.none()
+    if WARM_START:
+        opts["guild_ready_timeout"] = WARM_GUILD_READY_TIMEOUT
+        opts["chunk_guilds_at_startup"] = False  # 준비 완료 후 BACKGROUND_CHUNKER가 채움
+    return opts
+
+
+def _startup_shard_count() -> int | None:
+    # auto: 직전 실행의 샤드 수를 쓰면 GET /gateway/bot 생략 (cluster 워커는 슈퍼바이저가 넘겨줌)
+    if SHARD_COUNT or SHARD_MODE != "auto" or not WARM_START or WARM_START.get("shard_mode") != "auto":
+        return SHARD_COUNT
+    return WARM_START.get("shard_count") or None
+
+
+if SHARD_MODE in ("auto", "cluster"):
+    # cluster 워커: 슈퍼바이저가 넘겨준 shard_ids/shard_count만 연결
+    client = discord.AutoShardedClient(shard_count=_startup_shard_count(), shard_ids=SHARD_IDS, **client_options())
+else:
+    client = discord.Client(**client_options())
+tree = InstrumentedTree(client)
+
+
+# =========================
+# 나가는 REST 요청 우선순위 큐
+# =========================
+# discord.py HTTP 클라이언트 앞에서 순서만 정함 (레이트리밋 대기/재시도는 discord.py가 그대로 함)
+# - 자리가 나면 높은 클래스부터 꺼냄, 로그/예약 메시지는 합쳐서 concurrency - OUTBOUND_RESERVED 자리까지만
+#   (429로 자리를 쥔 채 자고 있어도 응답/처벌은 항상 남은 자리로 나감)
+# - 같은 버킷(채널/길드)은 OUTBOUND_PER_BUCKET개까지만 → 429로 자고 있는 버킷이 자리를 다 먹지 않음
+# - 요청은 호출한 태스크에서 그대로 실행 (큐는 순서표만 나눠줌) → 예외/취소도 호출한 쪽으로
+PRIO_INTERACTION, PRIO_MODERATION, PRIO_LOG, PRIO_SCHEDULED = range(4)
+PRIO_NAMES = ("interaction", "moderation", "log", "scheduled")
+
+
+class OutboundDispatcher:
+    def __init__(self, concurrency: int, limits: tuple[int, ...], low_limit: int, per_bucket: int):
+        self.concurrency = concurrency
+        self.limits = limits                                  # 클래스별 동시 실행 상한
+        self.low_limit = low_limit                            # 로그+예약 메시지 합계 상한
+        self.low_running = 0
+        self.per_bucket = per_bucket
+        self.inflight = 0
+        self._queues = [deque() for _ in PRIO_NAMES]          # 클래스별 deque[(넣은 시각, bucket, 순서표 future)]
+        self._running = [0] * len(PRIO_NAMES)
+        self._buckets: dict[tuple, int] = {}                  # bucket → 실행 중 수
+        self._parked: dict[tuple, deque] = {}                 # 버킷이 꽉 차서 기다리는 것 (bucket → deque[(prio, item)])
+        # 통계: 클래스별 [건수, 대기 합(초), 최대 대기(초)]
+        self.waited = [[0, 0.0, 0.0] for _ in PRIO_NAMES]
+
+    def depth(self) -> int:
+        return sum(len(q) for q in self._queues) + sum(len(q) for q in self._parked.values())
+
+    async def submit(self, prio: int, factory, bucket: tuple | None = None):
+        ticket = asyncio.get_running_loop().create_future()
+        self._queues[prio].append((time.monotonic(), bucket, ticket))
+        self._pump()
+        try:
+            await ticket
+        except asyncio.CancelledError:
+            if ticket.done() and not ticket.cancelled():
+                self._release(prio, bucket)  # 자리를 받은 직후 취소됨
+            raise
+
+        try:
+            res = await factory()
+        except Exception:
+            OUTBOUND_REQUESTS.inc(PRIO_NAMES[prio], "error")
+            raise
+        finally:
+            self._release(prio, bucket)
+        OUTBOUND_REQUESTS.inc(PRIO_NAMES[prio], "ok")
+        return res
+
+    def _pump(self) -> None:
+        for prio, q in enumerate(self._queues):
+            while (q and self.inflight < self.concurrency and self._running[prio] < self.limits[prio]
+                   and (prio < PRIO_LOG or self.low_running < self.low_limit)):
+                item = q.popleft()
+                if item[2].cancelled():
+                    continue
+                bucket = item[1]
+                if bucket is not None and self._buckets.get(bucket, 0) >= self.per_bucket:
+                    self._parked.setdefault(bucket, deque()).append((prio, item))
+                    continue
+                self._start(prio, item)
+
+    def _start(self, prio: int, item: tuple) -> None:
+        enqueued, bucket, ticket = item
+        waited = time.monotonic() - enqueued
+        stat = self.waited[prio]
+        stat[0] += 1
+        stat[1] += waited
+        stat[2] = max(stat[2], waited)
+        OUTBOUND_QUEUE_SECONDS.observe(waited, PRIO_NAMES[prio])
+
+        self.inflight += 1
+        self._running[prio] += 1
+        if prio >= PRIO_LOG:
+            self.low_running += 1
+        if bucket is not None:
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        ticket.set_result(None)
+
+    def _release(self, prio: int, bucket: tuple | None) -> None:
+        self.inflight -= 1
+        self._running[prio] -= 1
+        if prio >= PRIO_LOG:
+            self.low_running -= 1
+        if bucket is not None:
+            left = self._buckets[bucket] - 1
+            if left:
+                self._buckets[bucket] = left
+            else:
+                del self._buckets[bucket]
+            parked = self._parked.get(bucket)
+            if parked:
+                # 그 버킷에서 기다리던 것 하나를 원래 클래스 맨 앞으로 돌려놓음
+                p, item = parked.popleft()
+                if not parked:
+                    del self._parked[bucket]
+                self._queues[p].appendleft(item)
+        self._pump()
+
+
+OUTBOUND = OutboundDispatcher(
+    OUTBOUND_CONCURRENCY,
+    (
+        OUTBOUND_CONCURRENCY,
+        OUTBOUND_CONCURRENCY,
+        max(1, OUTBOUND_CONCURRENCY - OUTBOUND_RESERVED),
+        max(1, min(AUTO_SEND_CONCURRENCY, OUTBOUND_CONCURRENCY - OUTBOUND_RESERVED)),
+    ),
+    max(1, OUTBOUND_CONCURRENCY - OUTBOUND_RESERVED),
+    OUTBOUND_PER_BUCKET,
+)
+
+
+def outbound(prio: int, fn, *args, bucket: tuple | None = None, **kwargs):
+    return OUTBOUND.submit(prio, partial(fn, *args, **kwargs), bucket)
 
 
 # =========================
@@ -87,9 +1510,11 @@ tree = app_commands.CommandTree(client)
 # =========================
 async def safe_reply(interaction: discord.Interaction, content: str, *, ephemeral: bool = True):
     try:
-        if interaction.response.is_done():
-            return await interaction.followup.send(content, ephemeral=ephemeral)
-        return await interaction.response.send_message(content, ephemeral=ephemeral)
+        if not await claim_response(interaction):
+            return await outbound(PRIO_INTERACTION, interaction.followup.send, content, ephemeral=ephemeral)
+        res = await outbound(PRIO_INTERACTION, interaction.response.send_message, content, ephemeral=ephemeral)
+        _observe_command(interaction, COMMAND_REPLY_SECONDS)
+        return res
     except discord.errors.HTTPException as e:
         print(f"[safe_reply] failed: {e}")
 
@@ -101,6 +1526,13 @@ def get_guild_by_id(guild_id: int) -> discord.Guild | None:
     return client.get_guild(guild_id)
 
 
+def owns_guild(guild_id: int) -> bool:
+    # cluster 워커는 자기 샤드 범위의 길드만 담당 (Discord 샤드 공식: (guild_id >> 22) % shard_count)
+    if not IS_CLUSTER_WORKER or SHARD_IDS is None or SHARD_COUNT is None:
+        return True
+    return (guild_id >> 22) % SHARD_COUNT in SHARD_IDS
+
+
 def is_text_channel(ch) -> bool:
     return isinstance(ch, discord.TextChannel)
 
@@ -109,65 +1541,461 @@ def ensure_channel_belongs_to_guild(ch: discord.TextChannel, guild_id: int) -> b
     return ch.guild and ch.guild.id == guild_id
 
 
+class BackgroundChunker:
+    # 웜 스타트는 멤버 청킹을 안 기다리고 준비 완료 → 준비 후 길드를 하나씩 청킹
+    # (그 사이에도 명령어/메시지 이벤트는 멤버 정보를 같이 받음). 나중에 들어오는 길드도 여기로
+    # 요청은 CHUNK_CONCURRENCY개까지 겹쳐 보냄 (하나씩이면 청크 사이 왕복만큼 놂, 전송 속도 제한은 discord.py가 지킴)
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self._queue: deque[int] = deque()
+        self._workers: set[asyncio.Task] = set()
+        self._started = 0.0
+        self.chunked = 0
+
+    def cancel(self) -> None:
+        self._queue.clear()
+        for task in list(self._workers):
+            task.cancel()
+
+    def add(self, guild: discord.Guild) -> None:
+        if guild.chunked:
+            return
+        self._queue.append(guild.id)
+        if not self._workers:
+            self._started = time.monotonic()
+        if len(self._workers) < self.concurrency:
+            task = asyncio.get_running_loop().create_task(self._run())
+            self._workers.add(task)
+            task.add_done_callback(self._workers.discard)
+
+    async def _run(self) -> None:
+        while self._queue:
+            guild = get_guild_by_id(self._queue.popleft())
+            if guild is None or guild.chunked:
+                continue
+            try:
+                await guild.chunk()
+                self.chunked += 1
+            except Exception as e:
+                print(f"[chunk] guild={guild.id} failed: {e}")
+        if len(self._workers) == 1:
+            print(f"[chunk] background chunking done: {self.chunked} guilds ({time.monotonic() - self._started:.1f}s)")
+
+
+BACKGROUND_CHUNKER = BackgroundChunker(CHUNK_CONCURRENCY)
+DEFER_CHUNKING = bool(WARM_START) and intents.members and not LOW_MEMORY
+
+
 # =========================
 # 로그 채널(공개 메시지, 길드별)
 # =========================
+def _pack_lines(lines: list[str], limit: int = DISCORD_MESSAGE_LIMIT) -> list[str]:
+    # 줄 단위로 2000자 안에 최대한 채워서 메시지 여러 개로 나눔
+    chunks: list[str] = []
+    buf: list[str] = []
+    size = 0
+    for line in lines:
+        if len(line) > limit:
+            line = line[: limit - 1] + "…"
+        extra = len(line) + (1 if buf else 0)
+        if buf and size + extra > limit:
+            chunks.append("\n".join(buf))
+            buf, size = [], 0
+            extra = len(line)
+        buf.append(line)
+        size += extra
+    if buf:
+        chunks.append("\n".join(buf))
+    return chunks
+
+
+class LogBatcher:
+    def __init__(self, window: float, max_queue: int):
+        self.window = window
+        self.max_queue = max_queue
+        self._queues: dict[int, deque] = {}          # guild_id → deque[(enqueue_monotonic, text)]
+        self._dropped: dict[int, int] = {}           # guild_id → 이번 창에서 버린 줄 수
+        self._tasks: dict[int, asyncio.Task] = {}
+        # 통계 (/metrics 등에서 읽음)
+        self.lines_in = 0
+        self.lines_sent = 0
+        self.lines_dropped = 0
+        self.messages_sent = 0
+        self.send_failures = 0
+        self.last_flush_latency = 0.0   # 가장 오래 기다린 줄 기준, 큐 진입 → 전송 완료(초)
+        self.max_flush_latency = 0.0
+
+    def depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def busy(self) -> bool:
+        return bool(self._tasks)
+
+    def drain(self) -> None:
+        # 종료 시: 이후로는 창을 안 기다리고 바로 보냄 (자고 있던 것도 이번 창 끝나면 보냄)
+        self.window = 0.0
+
+    def push(self, guild: discord.Guild, text: str) -> None:
+        q = self._queues.setdefault(guild.id, deque())
+        self.lines_in += 1
+        if len(q) >= self.max_queue:
+            # 백프레셔: 새 줄은 버리고 개수만 세서 다음 전송 때 요약 한 줄로 남김
+            self._dropped[guild.id] = self._dropped.get(guild.id, 0) + 1
+            self.lines_dropped += 1
+        else:
+            q.append((time.monotonic(), text))
+
+        task = self._tasks.get(guild.id)
+        if task is None or task.done():
+            self._tasks[guild.id] = asyncio.get_running_loop().create_task(self._run(guild))
+
+    async def _run(self, guild: discord.Guild) -> None:
+        try:
+            while self._queues.get(guild.id) or self._dropped.get(guild.id):
+                await asyncio.sleep(self.window)
+                await self._flush_guild(guild)
+        finally:
+            self._tasks.pop(guild.id, None)
+
+    async def _flush_guild(self, guild: discord.Guild) -> None:
+        q = self._queues.pop(guild.id, None) or deque()
+        dropped = self._dropped.pop(guild.id, 0)
+        if not q and not dropped:
+            return
+
+        oldest = q[0][0] if q else time.monotonic()
+        lines = [text for _, text in q]
+        if dropped:
+            lines.append(f"… 로그 {dropped}건 생략 (너무 많음)")
+
+        ch = CONFIG.log_channel(guild)
+        if ch is None:
+            return
+
+        for chunk in _pack_lines(lines):
+            try:
+                await outbound(PRIO_LOG, ch.send, chunk, bucket=("channel", ch.id))  # ✅ 모두가 보는 로그
+                self.messages_sent += 1
+            except Exception as e:
+                self.send_failures += 1
+                print(f"[log_action] failed: {e}")
+        self.lines_sent += len(q)
+
+        latency = time.monotonic() - oldest
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+
+
+LOG_BATCHER = LogBatcher(LOG_BATCH_SECONDS, LOG_QUEUE_MAX)
+
+
 async def log_action(guild: discord.Guild, text: str):
     if not guild:
         return
-    gid = _gid(guild.id)
-    ch_id = DATA.get("log_channel_id", {}).get(gid)
-    if not ch_id:
+    cfg = CONFIG.get(guild.id)
+    if cfg is None or cfg.log_channel_id is None:
         return
+    LOG_BATCHER.push(guild, text)
 
-    ch = guild.get_channel(int(ch_id))
-    if ch and is_text_channel(ch):
+
+# =========================
+# 자동 메시지 스케줄러 + 10초 후 삭제 (길드별, 여러 개)
+# =========================
+def get_auto_jobs(guild_id: int) -> dict[str, AutoJob]:
+    cfg = CONFIG.get(guild_id)
+    return cfg.auto_jobs if cfg is not None else {}
+
+
+def auto_idle_policy(guild_id: int) -> str:
+    cfg = CONFIG.get(guild_id)
+    return cfg.auto_idle if cfg is not None and cfg.auto_idle is not None else AUTO_IDLE_POLICY
+
+
+class AutoScheduler:
+    # (다음 실행 시각, seq, guild_id, slot, version) 최소 힙
+    # - 길드/슬롯마다 주기 안에서 고정된 위치(offset)에 배치 → 전송이 한 순간에 몰리지 않음
+    # - 설정이 바뀌면 version만 올리고 옛 항목은 꺼낼 때 버림 → 틱 비용은 O(실행할 잡 수)
+    def __init__(self):
+        self._heap: list[tuple[float, int, int, str, int]] = []
+        self._versions: dict[tuple[int, str], int] = {}
+        self._slots: dict[int, set[str]] = {}   # guild_id → _versions 에 있는 슬롯 (길드 하나 다시 잡을 때 전체를 안 훑게)
+        self._seq = 0
+        self._inflight: set[asyncio.Task] = set()
+        # 통계
+        self.sent = 0
+        self.skipped = 0
+        self.failed = 0
+        self.last_tick_seconds = 0.0
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    @staticmethod
+    def _offset(guild_id: int, slot: str, period: float) -> float:
+        return zlib.crc32(f"{guild_id}:{slot}".encode()) % max(1, int(period))
+
+    def _drop(self, guild_id: int, slot: str) -> None:
+        self._versions.pop((guild_id, slot), None)
+        slots = self._slots.get(guild_id)
+        if slots is not None:
+            slots.discard(slot)
+            if not slots:
+                del self._slots[guild_id]
+
+    def _push(self, due: float, guild_id: int, slot: str) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, guild_id, slot, self._versions[(guild_id, slot)]))
+
+    def _first_due(self, guild_id: int, slot: str, period: float, now: float) -> float:
+        # 주기 경계 기준 고정 위치 → 재시작해도 같은 길드는 비슷한 시각에 나감
+        offset = self._offset(guild_id, slot, period)
+        due = now - (now % period) + offset
+        return due if due > now else due + period
+
+    def schedule_guild(self, guild_id: int, now: float | None = None, positions: dict | None = None) -> None:
+        now = time.time() if now is None else now
+        jobs = get_auto_jobs(guild_id) if owns_guild(guild_id) else {}
+        for slot in [s for s in self._slots.get(guild_id, ()) if s not in jobs]:
+            self._drop(guild_id, slot)
+        for slot, job in jobs.items():
+            key = (guild_id, slot)
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._slots.setdefault(guild_id, set()).add(slot)
+            due = self._first_due(guild_id, slot, job.period, now)
+            saved = positions.get(key) if positions else None
+            if saved is not None and saved[1] == job.period and now - job.period < saved[0] < due:
+                due = saved[0]  # 재시작하는 동안 지나간 회차 → 첫 틱에 보냄 (배포마다 한 번씩 빠지지 않게)
+            self._push(due, guild_id, slot)
+
+    def rebuild(self, positions: dict | None = None) -> None:
+        self._heap.clear()
+        self._versions.clear()
+        self._slots.clear()
+        now = time.time()
+        for guild_id in CONFIG.guild_ids():
+            self.schedule_guild(guild_id, now, positions)
+
+    def positions(self) -> list[list]:
+        # 웜 스타트 스냅샷용: 살아있는 항목의 [guild_id, slot, 다음 실행 시각, 주기]
+        out = []
+        for due, _, guild_id, slot, version in self._heap:
+            job = get_auto_jobs(guild_id).get(slot) if self._versions.get((guild_id, slot)) == version else None
+            if job is not None:
+                out.append([guild_id, slot, due, job.period])
+        return out
+
+    def busy(self) -> bool:
+        return bool(self._inflight)
+
+    def run_due(self, now: float) -> int:
+        started = time.perf_counter()
+        count = 0
+        while self._heap and self._heap[0][0] <= now:
+            due, _, guild_id, slot, version = heapq.heappop(self._heap)
+            if self._versions.get((guild_id, slot)) != version:
+                continue  # 해제/변경된 옛 항목
+
+            job = get_auto_jobs(guild_id).get(slot)
+            if not job:
+                self._drop(guild_id, slot)
+                continue
+
+            nxt = due + job.period
+            if nxt <= now:
+                # 오래 밀렸으면(슬립/재접속) 밀린 횟수만큼 몰아서 보내지 않고 다음 자리로
+                nxt = self._first_due(guild_id, slot, job.period, now)
+            self._push(nxt, guild_id, slot)
+
+            policy = auto_idle_policy(guild_id)
+            if self._skip_idle(job, policy):
+                self.skipped += 1
+                AUTO_MESSAGES.inc(policy, "skipped")
+                continue
+            job.last_sent = time.monotonic()
+            task = asyncio.get_running_loop().create_task(self._send(guild_id, slot, job, due, policy))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+            count += 1
+        self.last_tick_seconds = time.perf_counter() - started
+        return count
+
+    @staticmethod
+    def _skip_idle(job: AutoJob, policy: str) -> bool:
+        # 마지막 자동메시지 뒤로 사람이 말했으면 활동 있음 (보낸 적 없으면 모르니 보냄)
+        if job.last_sent is None or (job.last_activity is not None and job.last_activity > job.last_sent):
+            job.idle_gap, job.idle_ticks = 1, 0
+            return False
+        if policy == "skip":
+            return True
+        if policy == "backoff":
+            job.idle_ticks += 1
+            if job.idle_ticks < job.idle_gap:
+                return True
+            job.idle_gap, job.idle_ticks = min(job.idle_gap * 2, AUTO_BACKOFF_MAX), 0
+        return False
+
+    async def _send(self, guild_id: int, slot: str, job: AutoJob, due: float, policy: str) -> None:
+        guild = get_guild_by_id(guild_id)
+        if not guild:
+            return
+        if IS_CLUSTER_WORKER and not await STORE.claim_job(guild_id, slot, due):
+            return  # 다른 프로세스가 이미 보냄(재시작 겹침 등)
+        ch = CONFIG.auto_channel(guild, job)
+        if ch is None:
+            return
+
+        # 동시 전송 수는 OUTBOUND의 scheduled 클래스 상한(AUTO_SEND_CONCURRENCY)으로 제한
         try:
-            await ch.send(text)  # ✅ 모두가 보는 로그
+            sent = await outbound(PRIO_SCHEDULED, ch.send, job.message or AUTO_DEFAULT_MESSAGE, bucket=("channel", ch.id))
+            self.sent += 1
+            AUTO_MESSAGES.inc(policy, "sent")
+            DELETE_QUEUE.add(ch.id, sent.id, time.time() + AUTO_DELETE_SECONDS)
         except Exception as e:
-            print(f"[log_action] failed: {e}")
+            self.failed += 1
+            AUTO_MESSAGES.inc(policy, "failed")
+            print(f"[auto_message] send failed guild={guild_id} slot={slot}: {e}")
 
 
 # =========================
-# 10분마다 자동 메시지 + 10초 후 삭제 (길드별)
+# 삭제 예약 큐 (자동메시지 10초 후 삭제)
 # =========================
-@tasks.loop(minutes=10)
-async def auto_message_task():
-    auto_map = DATA.get("auto_channel_id", {})
-    msg_map = DATA.get("auto_message", {})
+def _load_delete_queue(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            items = json.load(f)
+        return [[float(d), int(c), int(m), int(a)] for d, c, m, a in items]
+    except Exception as e:
+        print(f"[delete_queue] load failed: {e}")
+        return []
+
+
+class DeleteQueue:
+    # [삭제 시각, channel_id, message_id, 시도 횟수] 최소 힙
+    # 만기된 것들을 채널별로 묶어서 100개씩 일괄삭제(14일 이내 & 2개 이상), 나머지는 하나씩
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, path: str):
+        self.path = path
+        self._heap: list[list] = _load_delete_queue(path)
+        heapq.heapify(self._heap)
+        self._saver = WriteBehind(
+            SAVE_DELAY_SECONDS,
+            partial(asyncio.to_thread, _write_json_atomic, path),
+            partial(_write_json_atomic, path),
+            name="delete_queue",
+        )
+        # 통계
+        self.deleted = 0
+        self.bulk_calls = 0
+        self.single_calls = 0
+        self.failed = 0
+        self.running = False  # run_due 도는 중 (꺼낸 항목이 힙 밖에 있음 → 이때는 취소하면 안 됨)
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+    def overdue(self, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        return sum(1 for item in self._heap if item[0] <= now)
+
+    def add(self, channel_id: int, message_id: int, due: float) -> None:
+        heapq.heappush(self._heap, [due, channel_id, message_id, 0])
+        self._saver.mark(self._heap)
+
+    async def run_due(self, now: float) -> None:
+        if not self._heap or self._heap[0][0] > now:
+            return
 
-    if not auto_map:
-        return
+        by_channel: dict[int, list[list]] = {}
+        while self._heap and self._heap[0][0] <= now:
+            item = heapq.heappop(self._heap)
+            by_channel.setdefault(item[1], []).append(item)
 
-    for gid_str, ch_id in list(auto_map.items()):
+        self.running = True
         try:
-            guild_id = int(gid_str)
-            channel_id = int(ch_id)
-        except Exception:
-            continue
+            await asyncio.gather(*(self._delete_channel(ch_id, items) for ch_id, items in by_channel.items()))
+        finally:
+            self.running = False
+        self._saver.mark(self._heap)
+
+    async def _delete_channel(self, channel_id: int, items: list[list]) -> None:
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        recent = [it for it in items if discord.utils.snowflake_time(it[2]) > cutoff]
+        old = [it for it in items if discord.utils.snowflake_time(it[2]) <= cutoff]
+
+        for i in range(0, len(recent), 100):
+            batch = recent[i:i + 100]
+            if len(batch) == 1:
+                old.append(batch[0])
+                continue
+            try:
+                self.bulk_calls += 1
+                await outbound(PRIO_SCHEDULED, client.http.delete_messages, channel_id, [it[2] for it in batch],
+                               bucket=("channel", channel_id))
+                self.deleted += len(batch)
+            except discord.NotFound:
+                # 하나라도 이미 지워졌으면 전체가 실패 → 하나씩 다시
+                old.extend(batch)
+            except Exception as e:
+                self._retry(batch, e)
+
+        for it in old:
+            try:
+                self.single_calls += 1
+                await outbound(PRIO_SCHEDULED, client.http.delete_message, channel_id, it[2], bucket=("channel", channel_id))
+                self.deleted += 1
+            except discord.NotFound:
+                pass  # 이미 지워짐
+            except Exception as e:
+                self._retry([it], e)
+
+    def _retry(self, items: list[list], error: Exception) -> None:
+        if isinstance(error, discord.Forbidden):
+            self.failed += len(items)
+            print(f"[delete_queue] forbidden channel={items[0][1]}: {error}")
+            return
+        for it in items:
+            it[3] += 1
+            if it[3] >= self.MAX_ATTEMPTS:
+                self.failed += 1
+                continue
+            it[0] = time.time() + 30 * it[3]
+            heapq.heappush(self._heap, it)
+        print(f"[delete_queue] failed channel={items[0][1]} n={len(items)}: {error}")
 
-        guild = get_guild_by_id(guild_id)
-        if not guild:
-            continue
 
-        ch = guild.get_channel(channel_id)
-        if not (ch and is_text_channel(ch)):
-            continue
+DELETE_QUEUE = DeleteQueue(AUTO_DELETE_FILE)
+atexit.register(DELETE_QUEUE._saver.flush_sync)
 
-        msg = msg_map.get(gid_str, "10분마다 자동 메시지")
-        try:
-            sent = await ch.send(msg)
-            try:
-                await sent.delete(delay=AUTO_DELETE_SECONDS)
-            except Exception:
-                pass
-        except Exception as e:
-            print(f"[auto_message] send failed guild={guild_id}: {e}")
+
+@tasks.loop(seconds=AUTO_DELETE_TICK_SECONDS)
+async def auto_delete_task():
+    await DELETE_QUEUE.run_due(time.time())
+
+
+@auto_delete_task.before_loop
+async def before_auto_delete_task():
+    await client.wait_until_ready()
+
+
+AUTO_SCHEDULER = AutoScheduler()
+
+
+@tasks.loop(seconds=AUTO_TICK_SECONDS)
+async def auto_message_task():
+    if AUTO_SCHEDULER.run_due(time.time()):
+        AUTO_TICK_SECONDS_HIST.observe(AUTO_SCHEDULER.last_tick_seconds)
 
 
 @auto_message_task.before_loop
 async def before_auto_message_task():
     await client.wait_until_ready()
+    positions = None
+    if WARM_START and WARM_START.get("scheduler"):
+        positions = {(gid, slot): (due, period) for gid, slot, due, period in WARM_START.pop("scheduler")}
+    AUTO_SCHEDULER.rebuild(positions)
 
 
 # =========================
@@ -177,9 +2005,238 @@ async def _handle_root(request):
     return web.Response(text="ok")
 
 
+async def _handle_metrics(request):
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+
+_loop_lag_last = 0.0
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+def _describe_callback(cb) -> str:
+    # Task 한 스텝이면 코루틴 이름으로 (콜백 객체 자체는 매번 다름)
+    owner = getattr(cb, "__self__", None)
+    if isinstance(owner, asyncio.Future) and hasattr(owner, "get_coro"):
+        coro = owner.get_coro()
+        return f"task {getattr(coro, '__qualname__', coro)}"
+    return getattr(cb, "__qualname__", None) or repr(cb)
+
+
+class LoopWatchdog:
+    # 루프가 막혀 있으면 루프 안에서는 아무것도 못 함 → 별도 스레드가 "다음에 깨어나야 할 시각"을 보고
+    # threshold 넘게 늦으면 그 순간 루프 스레드의 스택(sys._current_frames)과 현재 Task를 잡아둠
+    # 기록/출력은 루프가 다시 돌 때(woke) 루프 스레드에서 함
+    POLL_SECONDS = 0.05
+
+    def __init__(self, threshold: float, keep: int = 20):
+        self.threshold = threshold
+        self.stalls: deque[dict] = deque(maxlen=keep)
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.thread_id: int | None = None
+        self._expected: float | None = None   # loop.time() 기준 깨어날 예정 시각 (None = 지금은 안 봄)
+        self._captured: dict | None = None
+        self._stop = threading.Event()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop, self.thread_id = loop, threading.get_ident()
+        self._stop.clear()
+        threading.Thread(target=self._run, name="loop-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def expect(self, at: float) -> None:
+        self._expected = at
+
+    def woke(self, lag: float) -> None:
+        expected, self._expected = self._expected, None
+        captured, self._captured = self._captured, None
+        if lag < self.threshold:
+            return
+        LOOP_STALLS.inc()
+        if captured is None or captured["expected"] != expected:
+            # 폴링 사이에 끝난 짧은 멈춤 → 스택 없이 길이만
+            captured = {"at": discord.utils.utcnow().isoformat(timespec="seconds"), "task": None, "stack": []}
+        captured.pop("expected", None)
+        captured["lag"] = round(lag, 3)
+        self.stalls.append(captured)
+        where = captured["stack"][-1].strip().splitlines()[0] if captured["stack"] else "(스택 못 잡음)"
+        print(f"[watchdog] event loop stalled {lag * 1000:.0f}ms task={captured['task']} at {where}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.POLL_SECONDS):
+            expected = self._expected
+            if expected is None or self._captured is not None:
+                continue
+            if time.monotonic() - expected < self.threshold:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self.loop)
+            coro = task.get_coro() if task is not None else None
+            self._captured = {
+                "at": discord.utils.utcnow().isoformat(timespec="seconds"),
+                "task": getattr(coro, "__qualname__", None) if coro is not None else None,
+                "stack": traceback.format_stack(frame, limit=20),
+                "expected": expected,
+            }
+
+
+WATCHDOG = LoopWatchdog(LOOP_STALL_SECONDS)
+
+
+async def loop_lag_monitor(interval: float = 0.5):
+    # sleep이 예정보다 늦게 깬 만큼 = 루프가 막혀 있던 시간 (막힌 동안의 스택은 WATCHDOG 스레드가 잡음)
+    global _loop_lag_last
+    loop = asyncio.get_running_loop()
+    WATCHDOG.start(loop)
+    try:
+        while True:
+            start = loop.time()
+            WATCHDOG.expect(start + interval)
+            await asyncio.sleep(interval)
+            _loop_lag_last = max(0.0, loop.time() - start - interval)
+            LOOP_LAG_SECONDS.observe(_loop_lag_last)
+            WATCHDOG.woke(_loop_lag_last)
+    finally:
+        WATCHDOG.stop()
+
+
+class LoopProfiler:
+    # /debug/profile 용. 평소엔 아무것도 안 함 (요청 들어온 N초 동안만)
+    # 1) 샘플러 스레드가 PROFILE_SAMPLE_SECONDS마다 루프 스레드 스택을 찍음 (selector.select 안이면 idle)
+    # 2) asyncio Handle._run을 잠깐 감싸서 콜백(Task 스텝 포함)별 실행 시간 집계
+    def __init__(self):
+        self.running = False
+
+    async def run(self, seconds: float) -> dict:
+        self.running = True
+        loop_thread = threading.get_ident()
+        stacks: dict[tuple, int] = {}
+        callbacks: dict[str, list] = {}   # 이름 → [횟수, 합계, 최대]
+        stop = threading.Event()
+
+        def sample():
+            while not stop.wait(PROFILE_SAMPLE_SECONDS):
+                frame = sys._current_frames().get(loop_thread)
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                key = tuple(reversed(codes))
+                stacks[key] = stacks.get(key, 0) + 1
+
+        orig_run = asyncio.events.Handle._run
+
+        def timed_run(handle):
+            t0 = time.perf_counter()
+            try:
+                return orig_run(handle)
+            finally:
+                dt = time.perf_counter() - t0
+                name = _describe_callback(handle._callback)
+                st = callbacks.get(name)
+                if st is None:
+                    callbacks[name] = [1, dt, dt]
+                else:
+                    st[0] += 1
+                    st[1] += dt
+                    if dt > st[2]:
+                        st[2] = dt
+
+        sampler = threading.Thread(target=sample, name="loop-profiler", daemon=True)
+        asyncio.events.Handle._run = timed_run
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            asyncio.events.Handle._run = orig_run
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+            self.running = False
+        return {"seconds": seconds, "stacks": stacks, "callbacks": callbacks}
+
+
+def _is_idle(stack: tuple) -> bool:
+    return bool(stack) and stack[-1].co_name == "select" and stack[-1].co_filename.endswith("selectors.py")
+
+
+def render_profile(result: dict, stalls, top: int = 25) -> str:
+    stacks, callbacks = result["stacks"], result["callbacks"]
+    total = sum(stacks.values())
+    busy = {k: n for k, n in stacks.items() if k and not _is_idle(k)}
+    busy_n = sum(busy.values())
+    self_t: dict[str, int] = {}
+    cum_t: dict[str, int] = {}
+    for stack, n in busy.items():
+        leaf = _frame_label(stack[-1])
+        self_t[leaf] = self_t.get(leaf, 0) + n
+        for label in {_frame_label(c) for c in stack}:
+            cum_t[label] = cum_t.get(label, 0) + n
+
+    out = [f"profile {result['seconds']:.1f}s  samples={total}  busy={busy_n / max(total, 1):.1%}  "
+           f"interval={PROFILE_SAMPLE_SECONDS * 1000:.0f}ms (이벤트 루프 스레드만)"]
+    for title, table in (("top functions (self)", self_t), ("top functions (cumulative)", cum_t)):
+        out += ["", f"{title}  — busy 샘플 대비 %"]
+        for label, n in sorted(table.items(), key=lambda kv: -kv[1])[:top]:
+            out.append(f"  {n / max(busy_n, 1):6.1%} {n:6d}  {label}")
+    out += ["", "slow callbacks (합계 순)", f"  {'calls':>7} {'total_ms':>9} {'max_ms':>8}  callback"]
+    for name, (n, tot, mx) in sorted(callbacks.items(), key=lambda kv: -kv[1][1])[:top]:
+        out.append(f"  {n:7d} {tot * 1000:9.1f} {mx * 1000:8.2f}  {name}")
+    out += ["", f"recent stalls (> {LOOP_STALL_SECONDS}s)"]
+    for st in reversed(stalls):
+        out.append(f"  {st['at']}  {st['lag'] * 1000:.0f}ms  task={st['task']}")
+        out += ["    " + line for frame in st["stack"][-6:] for line in frame.rstrip().splitlines()]
+    return "\n".join(out) + "\n"
+
+
+def render_collapsed(result: dict) -> str:
+    # flamegraph.pl / speedscope 용 "a;b;c 개수"
+    lines = [";".join(_frame_label(c) for c in stack) + f" {n}" for stack, n in result["stacks"].items() if stack]
+    return "\n".join(lines) + "\n"
+
+
+PROFILER = LoopProfiler()
+
+
+def _bearer_authorized(request, token: str) -> bool:
+    given = request.headers.get("Authorization", "").encode()
+    return hmac.compare_digest(given, f"Bearer {token}".encode())
+
+
+async def _handle_profile(request):
+    # cluster면 웹서버가 있는 0번 워커 프로세스만 프로파일함
+    if not _bearer_authorized(request, DEBUG_TOKEN):
+        return web.Response(status=401, text="unauthorized")
+    try:
+        seconds = float(request.query.get("seconds", "10"))
+    except ValueError:
+        return web.Response(status=400, text="seconds must be a number")
+    seconds = min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+    if PROFILER.running:
+        return web.Response(status=409, text="profile already running")
+
+    result = await PROFILER.run(seconds)
+    if request.query.get("format") == "collapsed":
+        text = await asyncio.to_thread(render_collapsed, result)
+    else:
+        text = await asyncio.to_thread(render_profile, result, list(WATCHDOG.stalls))
+    return web.Response(text=text, content_type="text/plain", charset="utf-8")
+
+
 async def start_web_server():
-    app = web.Application()
+    app = web.Application(client_max_size=BULK_CONFIG_MAX_BYTES)
     app.router.add_get("/", _handle_root)
+    app.router.add_get("/metrics", _handle_metrics)
+    if DEBUG_TOKEN:
+        app.router.add_get("/debug/profile", _handle_profile)
+    if ADMIN_TOKEN:
+        app.router.add_post("/admin/config", _handle_admin_config)
 
     runner = web.AppRunner(app)
     await runner.setup()
@@ -193,18 +2250,149 @@ async def start_web_server():
 # =========================
 # 준비 완료
 # =========================
+def command_tree_hash(guild: discord.abc.Snowflake | None = None) -> str:
+    # sync 때 보내는 payload 그대로 해시 (봇 application_id 포함 → 토큰 바뀌면 다시 sync)
+    payload = [cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda c: (c.get("type", 1), c["name"]))
+    raw = json.dumps([client.application_id, payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def sync_commands_if_changed(guild: discord.abc.Snowflake | None = None) -> str:
+    # 저장해둔 해시와 같으면 sync 생략 → 재접속/재배포마다 글로벌 REST 호출 안 함
+    scope = "global" if guild is None else str(guild.id)
+    started = time.perf_counter()
+    digest = command_tree_hash(guild)
+    hashes = DATA.setdefault("command_sync", {})
+
+    if hashes.get(scope) == digest and not FORCE_COMMAND_SYNC:
+        result = "skipped"
+    else:
+        try:
+            await tree.sync(guild=guild)
+            hashes[scope] = digest
+            save_data(DATA)
+            result = "synced"
+        except Exception as e:
+            print(f"[sync] failed scope={scope}: {e}")
+            result = "failed"
+
+    elapsed = time.perf_counter() - started
+    COMMAND_SYNC.inc(scope, result)
+    COMMAND_SYNC_SECONDS.observe(elapsed, scope, result)
+    print(f"[sync] scope={scope} {result} ({elapsed * 1000:.0f}ms)")
+    return result
+
+
+_commands_synced = False
+
+
 @client.event
 async def on_ready():
-    try:
-        await tree.sync()
-    except Exception as e:
-        print(f"[sync] failed: {e}")
+    global _commands_synced
+    if not STARTUP_SECONDS.value:
+        STARTUP_SECONDS.set(time.monotonic() - BOOT_STARTED)
+        print(f"[startup] ready in {STARTUP_SECONDS.value:.2f}s ({'warm' if WARM_START else 'cold'})")
+    if DEFER_CHUNKING:
+        for guild in client.guilds:
+            BACKGROUND_CHUNKER.add(guild)
+    if IS_PRIMARY and not _commands_synced:  # on_ready는 재접속마다 다시 옴 → 프로세스당 한 번만 확인
+        _commands_synced = True
+        if DEV_GUILD_IDS:
+            for gid in DEV_GUILD_IDS:
+                dev_guild = discord.Object(id=gid)
+                tree.copy_global_to(guild=dev_guild)
+                await sync_commands_if_changed(dev_guild)
+        else:
+            await sync_commands_if_changed()
 
     await client.change_presence(activity=discord.Game("대박박하는 중"))
     print(f"Logged in as {client.user}")
 
     if not auto_message_task.is_running():
         auto_message_task.start()
+    if not auto_delete_task.is_running():
+        auto_delete_task.start()
+    if not warn_compact_task.is_running():
+        warn_compact_task.start()
+    if IS_CLUSTER_WORKER and not config_poll_task.is_running():
+        config_poll_task.start()
+
+
+def apply_config_changes(changes: list[tuple[str, str, object]]) -> None:
+    # 다른 프로세스가 저장한 설정을 DATA에 반영 (None = 삭제)
+    for section, gid, value in changes:
+        if value is None:
+            DATA.get(section, {}).pop(gid, None)
+        else:
+            DATA.setdefault(section, {})[gid] = value
+        if section in ConfigIndex.SECTIONS:
+            CONFIG.reload(gid)
+        if section == "warn_ttl_days" and gid.isdigit():
+            ACTIVE_WARNINGS.forget_guild(int(gid))
+        if section == "auto_jobs" and gid.isdigit():
+            AUTO_SCHEDULER.schedule_guild(int(gid))
+
+
+@tasks.loop(seconds=CONFIG_POLL_SECONDS)
+async def config_poll_task():
+    try:
+        apply_config_changes(await STORE.poll_config())
+        STORE.ack_config()
+    except Exception as e:
+        print(f"[config_poll] failed: {e}")
+
+
+@client.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    CONFIG.forget_channel(channel.guild.id, channel.id)
+
+
+@client.event
+async def on_guild_remove(guild: discord.Guild):
+    CONFIG.forget_channel(guild.id)
+
+
+@client.event
+async def on_guild_join(guild: discord.Guild):
+    if DEFER_CHUNKING and client.is_ready():  # 청킹을 껐으니 discord.py가 새 길드도 청킹 안 함
+        BACKGROUND_CHUNKER.add(guild)
+
+
+@client.event
+async def on_guild_available(guild: discord.Guild):
+    if DEFER_CHUNKING and client.is_ready():  # 장애 후 다시 들어온 길드
+        BACKGROUND_CHUNKER.add(guild)
+
+
+@client.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    _disarm_auto_defer(interaction)
+    _observe_command(interaction, COMMAND_DURATION_SECONDS, "ok")
+
+
+# =========================
+# 자동메시지 설정 헬퍼
+# =========================
+def set_auto_job(guild_id: int, channel_id: int, message: str, interval: int, slot: int, idle: str | None = None) -> None:
+    CONFIG.set_auto_job(guild_id, str(slot), AutoJob(channel_id, message, interval), idle)
+    AUTO_SCHEDULER.schedule_guild(guild_id)
+
+
+def idle_note(guild_id: int) -> str:
+    policy = auto_idle_policy(guild_id)
+    if policy == "skip":
+        return "조용한 채널(마지막 자동메시지 뒤로 대화 없음)은 건너뜀"
+    if policy == "backoff":
+        return f"조용한 채널은 주기를 2배씩 늘림(최대 {AUTO_BACKOFF_MAX}배)"
+    return "채널이 조용해도 항상 보냄"
+
+
+def del_auto_job(guild_id: int, slot: int | None) -> int:
+    # slot 생략하면 그 길드 자동메시지 전부 해제. 지운 개수 반환
+    removed = CONFIG.del_auto_jobs(guild_id, None if slot is None else str(slot))
+    AUTO_SCHEDULER.schedule_guild(guild_id)
+    return removed
 
 
 # =========================================================
@@ -220,17 +2408,22 @@ async def setlog(interaction: discord.Interaction, channel: discord.TextChannel)
     if not ensure_channel_belongs_to_guild(channel, gid):
         return await safe_reply(interaction, "그 채널이 현재 서버 채널이 아님.", ephemeral=True)
 
-    DATA.setdefault("log_channel_id", {})
-    DATA["log_channel_id"][_gid(gid)] = channel.id
-    save_data(DATA)
+    CONFIG.set_log_channel(gid, channel)
 
     await safe_reply(interaction, f"로그 채널 설정 완료: {channel.mention}", ephemeral=True)
     await log_action(interaction.guild, f"📝 로그 채널 설정: {channel.mention} (관리자: {interaction.user.mention})")
 
 
-@tree.command(name="setauto", description="(현재 서버) 10분 자동메시지 설정(채널 선택, 10초 후 삭제)")
+@tree.command(name="setauto", description="(현재 서버) 자동메시지 설정(채널 선택, 주기/슬롯/조용한 채널 정책 지정, 10초 후 삭제)")
 @app_commands.checks.has_permissions(manage_guild=True)
-async def setauto(interaction: discord.Interaction, channel: discord.TextChannel, message: str = "10분마다 자동 메시지"):
+async def setauto(
+    interaction: discord.Interaction,
+    channel: discord.TextChannel,
+    message: str = AUTO_DEFAULT_MESSAGE,
+    interval: app_commands.Range[int, 1, 1440] = AUTO_DEFAULT_INTERVAL_MINUTES,
+    slot: app_commands.Range[int, 1, AUTO_MAX_SLOTS] = 1,
+    idle: Literal["always", "skip", "backoff"] | None = None,
+):
     if not interaction.guild:
         return await safe_reply(interaction, "서버에서만 가능.", ephemeral=True)
 
@@ -238,169 +2431,699 @@ async def setauto(interaction: discord.Interaction, channel: discord.TextChannel
     if not ensure_channel_belongs_to_guild(channel, gid):
         return await safe_reply(interaction, "그 채널이 현재 서버 채널이 아님.", ephemeral=True)
 
-    gid_str = _gid(gid)
-    DATA.setdefault("auto_channel_id", {})
-    DATA.setdefault("auto_message", {})
-    DATA["auto_channel_id"][gid_str] = channel.id
-    DATA["auto_message"][gid_str] = message
-    save_data(DATA)
+    set_auto_job(gid, channel.id, message, interval, slot, idle)
 
     await safe_reply(
         interaction,
-        f"자동메시지 설정 완료: {channel.mention}\n문구: {message}\n(10분마다 나가고 10초 뒤 삭제됨)",
+        f"자동메시지 설정 완료 (슬롯 {slot}): {channel.mention}\n문구: {message}\n({interval}분마다 나가고 {AUTO_DELETE_SECONDS}초 뒤 삭제됨, {idle_note(gid)})",
         ephemeral=True,
     )
-    await log_action(interaction.guild, f"⏱️ 자동메시지 설정: {channel.mention} (관리자: {interaction.user.mention})")
+    await log_action(interaction.guild, f"⏱️ 자동메시지 설정 (슬롯 {slot}, {interval}분): {channel.mention} (관리자: {interaction.user.mention})")
 
 
-@tree.command(name="delauto", description="(현재 서버) 자동메시지 해제")
+@tree.command(name="delauto", description="(현재 서버) 자동메시지 해제(슬롯 생략 시 전부)")
 @app_commands.checks.has_permissions(manage_guild=True)
-async def delauto(interaction: discord.Interaction):
+async def delauto(interaction: discord.Interaction, slot: app_commands.Range[int, 1, AUTO_MAX_SLOTS] | None = None):
     if not interaction.guild:
         return await safe_reply(interaction, "서버에서만 가능.", ephemeral=True)
 
-    gid = interaction.guild.id
-    gid_str = _gid(gid)
-
-    DATA.setdefault("auto_channel_id", {})
-    DATA.setdefault("auto_message", {})
-    DATA["auto_channel_id"].pop(gid_str, None)
-    DATA["auto_message"].pop(gid_str, None)
-    save_data(DATA)
+    removed = del_auto_job(interaction.guild.id, slot)
+    where = "전부" if slot is None else f"슬롯 {slot}"
 
-    await safe_reply(interaction, "이 서버 자동메시지 해제 완료.", ephemeral=True)
-    await log_action(interaction.guild, f"🗑️ 자동메시지 해제 (관리자: {interaction.user.mention})")
+    await safe_reply(interaction, f"이 서버 자동메시지 해제 완료 ({where}, {removed}개).", ephemeral=True)
+    await log_action(interaction.guild, f"🗑️ 자동메시지 해제 ({where}) (관리자: {interaction.user.mention})")
 
 
 # =========================================================
 # 2) 설정 - 길드ID 지정용(다른 서버도 바로 설정)
 # =========================================================
-@tree.command(name="setlog_g", description="(길드ID 지정) 로그 채널 설정")
-@app_commands.checks.has_permissions(manage_guild=True)
-async def setlog_g(interaction: discord.Interaction, guild_id: str, channel: discord.TextChannel):
-    if not guild_id.isdigit():
-        return await safe_reply(interaction, "guild_id는 숫자만.", ephemeral=True)
-
-    gid = int(guild_id)
+# cluster면 다른 워커 샤드 길드는 캐시에 없음 → 채널은 REST로 확인하고 로그 알림은 채널 ID로 바로 보냄
+# (채널 옵션도 캐시 해석을 안 거치게 AppCommandChannel 로 받음)
+async def resolve_config_target(gid: int, ch_id: int | None, fetch_channel) -> tuple[discord.Guild | None, object]:
+    # (캐시 길드 또는 None, 채널) — 봇이 없는 길드/그 길드 텍스트 채널이 아니면 ValueError
     guild = get_guild_by_id(gid)
-    if not guild:
-        return await safe_reply(interaction, "그 길드ID를 봇이 못 찾음(봇이 그 서버에 있어야 함).", ephemeral=True)
+    if guild is None and owns_guild(gid):
+        raise ValueError("봇이 그 길드에 없음")
+    if ch_id is None:
+        return guild, None
+    ch = guild.get_channel(ch_id) if guild is not None else await fetch_channel(ch_id)
+    if not (ch and is_text_channel(ch) and ensure_channel_belongs_to_guild(ch, gid)):
+        raise ValueError("그 길드의 텍스트 채널이 아님")
+    return guild, ch
 
-    if not ensure_channel_belongs_to_guild(channel, gid):
-        return await safe_reply(interaction, "그 채널이 입력한 길드ID의 채널이 아님.", ephemeral=True)
-
-    DATA.setdefault("log_channel_id", {})
-    DATA["log_channel_id"][_gid(gid)] = channel.id
-    save_data(DATA)
 
-    await safe_reply(interaction, f"로그 채널 설정 완료: **{guild.name}** / {channel.mention}", ephemeral=True)
-    await log_action(guild, f"📝 로그 채널 설정: {channel.mention} (관리자: {interaction.user.mention})")
+async def _config_target_or_reply(interaction: discord.Interaction, guild_id: str, channel: app_commands.AppCommandChannel | None):
+    if not guild_id.isdigit():
+        await safe_reply(interaction, "guild_id는 숫자만.", ephemeral=True)
+        return None
+    gid = int(guild_id)
+    try:
+        guild, ch = await resolve_config_target(gid, channel.id if channel else None, _bulk_channel_fetcher())
+    except ValueError as e:
+        await safe_reply(interaction, f"설정 못 함: {e}.", ephemeral=True)
+        return None
+    except discord.HTTPException as e:
+        await safe_reply(interaction, f"채널 확인 실패: {e}", ephemeral=True)
+        return None
+    return gid, (guild.name if guild else f"길드 {gid}"), ch
 
 
-@tree.command(name="setauto_g", description="(길드ID 지정) 10분 자동메시지 설정(10초 후 삭제)")
+@tree.command(name="setlog_g", description="(길드ID 지정) 로그 채널 설정")
 @app_commands.checks.has_permissions(manage_guild=True)
-async def setauto_g(interaction: discord.Interaction, guild_id: str, channel: discord.TextChannel, message: str = "10분마다 자동 메시지"):
-    if not guild_id.isdigit():
-        return await safe_reply(interaction, "guild_id는 숫자만.", ephemeral=True)
+async def setlog_g(interaction: discord.Interaction, guild_id: str, channel: app_commands.AppCommandChannel):
+    target = await _config_target_or_reply(interaction, guild_id, channel)
+    if target is None:
+        return
+    gid, name, ch = target
 
-    gid = int(guild_id)
-    guild = get_guild_by_id(gid)
-    if not guild:
-        return await safe_reply(interaction, "그 길드ID를 봇이 못 찾음(봇이 그 서버에 있어야 함).", ephemeral=True)
+    CONFIG.set_log_channel(gid, ch)
 
-    if not ensure_channel_belongs_to_guild(channel, gid):
-        return await safe_reply(interaction, "그 채널이 입력한 길드ID의 채널이 아님.", ephemeral=True)
+    await safe_reply(interaction, f"로그 채널 설정 완료: **{name}** / {ch.mention}", ephemeral=True)
+    await _send_config_notices({gid: [f"📝 로그 채널 설정: {ch.mention} (관리자: {interaction.user.mention})"]})
+
+
+@tree.command(name="setauto_g", description="(길드ID 지정) 자동메시지 설정(주기/슬롯/조용한 채널 정책 지정, 10초 후 삭제)")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def setauto_g(
+    interaction: discord.Interaction,
+    guild_id: str,
+    channel: app_commands.AppCommandChannel,
+    message: str = AUTO_DEFAULT_MESSAGE,
+    interval: app_commands.Range[int, 1, 1440] = AUTO_DEFAULT_INTERVAL_MINUTES,
+    slot: app_commands.Range[int, 1, AUTO_MAX_SLOTS] = 1,
+    idle: Literal["always", "skip", "backoff"] | None = None,
+):
+    target = await _config_target_or_reply(interaction, guild_id, channel)
+    if target is None:
+        return
+    gid, name, ch = target
 
-    gid_str = _gid(gid)
-    DATA.setdefault("auto_channel_id", {})
-    DATA.setdefault("auto_message", {})
-    DATA["auto_channel_id"][gid_str] = channel.id
-    DATA["auto_message"][gid_str] = message
-    save_data(DATA)
+    set_auto_job(gid, ch.id, message, interval, slot, idle)
 
     await safe_reply(
         interaction,
-        f"자동메시지 설정 완료: **{guild.name}** / {channel.mention}\n문구: {message}\n(10분마다 나가고 10초 뒤 삭제됨)",
+        f"자동메시지 설정 완료 (슬롯 {slot}): **{name}** / {ch.mention}\n문구: {message}\n({interval}분마다 나가고 {AUTO_DELETE_SECONDS}초 뒤 삭제됨, {idle_note(gid)})",
         ephemeral=True,
     )
-    await log_action(guild, f"⏱️ 자동메시지 설정: {channel.mention} (관리자: {interaction.user.mention})")
+    await _send_config_notices({gid: [f"⏱️ 자동메시지 설정 (슬롯 {slot}, {interval}분): {ch.mention} (관리자: {interaction.user.mention})"]})
 
 
-@tree.command(name="delauto_g", description="(길드ID 지정) 자동메시지 해제")
+@tree.command(name="delauto_g", description="(길드ID 지정) 자동메시지 해제(슬롯 생략 시 전부)")
 @app_commands.checks.has_permissions(manage_guild=True)
-async def delauto_g(interaction: discord.Interaction, guild_id: str):
-    if not guild_id.isdigit():
-        return await safe_reply(interaction, "guild_id는 숫자만.", ephemeral=True)
+async def delauto_g(interaction: discord.Interaction, guild_id: str, slot: app_commands.Range[int, 1, AUTO_MAX_SLOTS] | None = None):
+    target = await _config_target_or_reply(interaction, guild_id, None)
+    if target is None:
+        return
+    gid, name, _ = target
 
-    gid = int(guild_id)
-    guild = get_guild_by_id(gid)
-    if not guild:
-        return await safe_reply(interaction, "그 길드ID를 봇이 못 찾음(봇이 그 서버에 있어야 함).", ephemeral=True)
+    removed = del_auto_job(gid, slot)
+    where = "전부" if slot is None else f"슬롯 {slot}"
+
+    await safe_reply(interaction, f"자동메시지 해제 완료: **{name}** ({where}, {removed}개)", ephemeral=True)
+    await _send_config_notices({gid: [f"🗑️ 자동메시지 해제 ({where}) (관리자: {interaction.user.mention})"]})
+
+
+# =========================================================
+# 2-1) 설정 - 여러 길드 한 번에 (/bulkconfig 파일, POST /admin/config)
+# =========================================================
+# 행 형식 (JSON 배열, {"changes": [...]}, 또는 한 줄에 하나씩 JSONL):
+#   {"op": "setlog",  "guild_id": "...", "channel_id": "..."}
+#   {"op": "setauto", "guild_id": "...", "channel_id": "...", "message": "...", "interval": 60, "slot": 1, "idle": "skip"}
+#   {"op": "delauto", "guild_id": "...", "slot": 1}     (slot 생략 = 전부)
+# - 모든 행을 동시에 검사 (cluster면 다른 워커 샤드 길드는 채널을 REST로 확인, 같은 채널은 한 번만)
+# - 기본은 하나라도 틀리면 아무것도 안 바꿈 (partial이면 맞는 행만 적용)
+# - 적용은 메모리에서 한꺼번에 → 저장은 한 번 (SQLite면 한 트랜잭션 = rev 하나, 다른 워커는 폴링으로 받음)
+# - 로그 알림은 길드별로 모아서 보냄
+BULK_OPS = ("setlog", "setauto", "delauto")
+
+
+def load_bulk_payload(text: str) -> list:
+    try:
+        raw = json.loads(text)
+    except json.JSONDecodeError:
+        raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(raw, dict):
+        raw = raw.get("changes")
+    if not isinstance(raw, list):
+        raise ValueError("changes 목록이 없음")
+    if len(raw) > BULK_CONFIG_MAX_ROWS:
+        raise ValueError(f"행은 {BULK_CONFIG_MAX_ROWS}개까지")
+    return raw
+
+
+def _bulk_int(row: dict, key: str, lo: int | None = None, hi: int | None = None, default: int | None = None) -> int | None:
+    value = row.get(key, default)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not (isinstance(value, int) or (isinstance(value, str) and value.isdigit())):
+        raise ValueError(f"{key}는 숫자만")
+    value = int(value)
+    if lo is not None and not lo <= value <= hi:
+        raise ValueError(f"{key}는 {lo}~{hi}")
+    return value
+
+
+def _bulk_channel_fetcher():
+    # 캐시에 없는 길드(다른 워커 샤드)의 채널 확인. 같은 채널은 한 번만, 동시에 BULK_CONFIG_CONCURRENCY개까지
+    sem = asyncio.Semaphore(BULK_CONFIG_CONCURRENCY)
+    pending: dict[int, asyncio.Future] = {}
+
+    async def fetch_one(channel_id: int):
+        async with sem:
+            try:
+                return await client.fetch_channel(channel_id)
+            except (discord.NotFound, discord.Forbidden):
+                return None
+
+    async def fetch(channel_id: int):
+        fut = pending.get(channel_id)
+        if fut is None:
+            fut = pending[channel_id] = asyncio.ensure_future(fetch_one(channel_id))
+        return await fut
+
+    return fetch
 
-    gid_str = _gid(gid)
-    DATA.setdefault("auto_channel_id", {})
-    DATA.setdefault("auto_message", {})
-    DATA["auto_channel_id"].pop(gid_str, None)
-    DATA["auto_message"].pop(gid_str, None)
-    save_data(DATA)
 
-    await safe_reply(interaction, f"자동메시지 해제 완료: **{guild.name}**", ephemeral=True)
-    await log_action(guild, f"🗑️ 자동메시지 해제 (관리자: {interaction.user.mention})")
+async def _check_bulk_row(index: int, row, fetch_channel) -> tuple[dict, dict | None]:
+    result = {"row": index, "op": None, "guild_id": None, "ok": False}
+    try:
+        if not isinstance(row, dict):
+            raise ValueError("행은 객체여야 함")
+        op = result["op"] = row.get("op")
+        if op not in BULK_OPS:
+            raise ValueError(f"op는 {'/'.join(BULK_OPS)} 중 하나")
+        gid = _bulk_int(row, "guild_id")
+        if gid is None:
+            raise ValueError("guild_id 없음")
+        result["guild_id"] = str(gid)
+
+        change = {"op": op, "guild_id": gid}
+        ch_id = None
+        if op in ("setlog", "setauto"):
+            ch_id = _bulk_int(row, "channel_id")
+            if ch_id is None:
+                raise ValueError("channel_id 없음")
+        _, change["channel"] = await resolve_config_target(gid, ch_id, fetch_channel)
+        if op == "setauto":
+            message = row.get("message", AUTO_DEFAULT_MESSAGE)
+            if not isinstance(message, str) or not 0 < len(message) <= DISCORD_MESSAGE_LIMIT:
+                raise ValueError(f"message는 1~{DISCORD_MESSAGE_LIMIT}자 문자열")
+            change["message"] = message
+            change["interval"] = _bulk_int(row, "interval", 1, 1440, AUTO_DEFAULT_INTERVAL_MINUTES)
+            change["slot"] = _bulk_int(row, "slot", 1, AUTO_MAX_SLOTS, 1)
+            change["idle"] = row.get("idle")
+            if change["idle"] is not None and change["idle"] not in AUTO_IDLE_POLICIES:
+                raise ValueError(f"idle은 {'/'.join(AUTO_IDLE_POLICIES)} 중 하나")
+        elif op == "delauto":
+            change["slot"] = _bulk_int(row, "slot", 1, AUTO_MAX_SLOTS)
+    except ValueError as e:
+        result["error"] = str(e)
+        return result, None
+    except discord.HTTPException as e:
+        result["error"] = f"채널 확인 실패: {e}"
+        return result, None
+    result["ok"] = True
+    return result, change
+
+
+def _apply_bulk_change(change: dict, result: dict) -> str:
+    # 적용하고 로그 알림 문구 반환 (저장은 표시만, 스케줄은 길드별로 한 번 → 둘 다 호출한 쪽에서)
+    gid, op = change["guild_id"], change["op"]
+    if op == "setlog":
+        CONFIG.set_log_channel(gid, change["channel"])
+        return f"📝 로그 채널 설정: {change['channel'].mention}"
+    if op == "setauto":
+        CONFIG.set_auto_job(gid, str(change["slot"]), AutoJob(change["channel"].id, change["message"], change["interval"]),
+                            change["idle"])
+        return f"⏱️ 자동메시지 설정 (슬롯 {change['slot']}, {change['interval']}분): {change['channel'].mention}"
+    result["removed"] = CONFIG.del_auto_jobs(gid, None if change["slot"] is None else str(change["slot"]))
+    where = "전부" if change["slot"] is None else f"슬롯 {change['slot']}"
+    return f"🗑️ 자동메시지 해제 ({where})"
+
+
+async def _send_config_notices(notices: dict[int, list[str]]) -> None:
+    # 이 프로세스 길드는 LOG_BATCHER로 (창 안에서 한 메시지로 묶임),
+    # 다른 워커 샤드 길드는 캐시가 없으니 채널 ID로 바로 보냄 (길드별로 줄을 모아 2000자 단위)
+    sends = []
+    for gid, lines in notices.items():
+        guild = get_guild_by_id(gid)
+        if guild is not None:
+            for line in lines:
+                await log_action(guild, line)
+            continue
+        cfg = CONFIG.get(gid)
+        if cfg is None or cfg.log_channel_id is None:
+            continue
+        ch = client.get_partial_messageable(cfg.log_channel_id, guild_id=gid)
+        for chunk in _pack_lines(lines):
+            sends.append(outbound(PRIO_LOG, ch.send, chunk, bucket=("channel", ch.id)))
+    for res in await asyncio.gather(*sends, return_exceptions=True):
+        if isinstance(res, Exception):
+            LOG_BATCHER.send_failures += 1
+            print(f"[bulkconfig] log notice failed: {res}")
+
+
+async def apply_bulk_config(rows: list, actor: str, *, dry_run: bool = False, allow_partial: bool = False) -> dict:
+    started = time.monotonic()
+    fetch_channel = _bulk_channel_fetcher()
+    checked = await asyncio.gather(*(_check_bulk_row(i, row, fetch_channel) for i, row in enumerate(rows)))
+    failed = sum(1 for result, _ in checked if not result["ok"])
+    apply = not dry_run and (allow_partial or not failed)
+
+    notices: dict[int, list[str]] = {}
+    if apply:
+        for result, change in checked:
+            if change is None:
+                continue
+            notice = _apply_bulk_change(change, result)
+            result["applied"] = True
+            notices.setdefault(change["guild_id"], []).append(f"{notice} (관리자: {actor}, 일괄 설정)")
+        for gid in {change["guild_id"] for _, change in checked if change is not None and change["op"] != "setlog"}:
+            AUTO_SCHEDULER.schedule_guild(gid)
+        await _saver.flush()
+        await _send_config_notices(notices)
+
+    guilds: dict[str, dict] = {}
+    for result, _ in checked:
+        state = "applied" if result.get("applied") else ("ok" if result["ok"] else "failed")
+        BULK_CONFIG_ROWS.inc(result["op"] if result["op"] in BULK_OPS else "invalid", state)
+        if result["guild_id"] is not None:
+            summary = guilds.setdefault(result["guild_id"], {"applied": 0, "ok": 0, "failed": 0})
+            summary[state] += 1
+
+    return {
+        "applied": apply,
+        "dry_run": dry_run,
+        "partial": allow_partial,
+        "persisted": apply and not _saver.dirty,
+        "rows": len(checked),
+        "failed": failed,
+        "seconds": round(time.monotonic() - started, 3),
+        "guilds": guilds,
+        "results": [result for result, _ in checked],
+    }
+
+
+def _bulk_summary(report: dict, limit: int = 10) -> str:
+    if report["applied"]:
+        head = "일괄 설정 적용"
+    elif report["dry_run"]:
+        head = "일괄 설정 검사만 (dry run)"
+    else:
+        head = "일괄 설정 거부 (틀린 행이 있어 아무것도 안 바꿈, partial로 맞는 행만 적용 가능)"
+    lines = [f"{head}: 행 {report['rows']}개 (오류 {report['failed']}), 길드 {len(report['guilds'])}개, {report['seconds']}s"]
+    errors = [r for r in report["results"] if not r["ok"]]
+    for r in errors[:limit]:
+        lines.append(f"- {r['row'] + 1}행 guild={r['guild_id']} {r['op']}: {r['error']}")
+    if len(errors) > limit:
+        lines.append(f"- … 외 {len(errors) - limit}개 (첨부한 보고서 참고)")
+    return "\n".join(lines)
+
+
+async def _handle_admin_config(request):
+    # 쿼리: ?dry_run=1&partial=1. 본문은 /bulkconfig 파일과 같은 형식
+    if not _bearer_authorized(request, ADMIN_TOKEN):
+        return web.Response(status=401, text="unauthorized")
+    try:
+        rows = load_bulk_payload(await request.text())
+    except ValueError as e:
+        return web.Response(status=400, text=f"bad payload: {e}")
+    dry_run, allow_partial = (request.query.get(key, "0").lower() in ("1", "true", "yes") for key in ("dry_run", "partial"))
+    report = await apply_bulk_config(rows, "HTTP API", dry_run=dry_run, allow_partial=allow_partial)
+    status = 422 if report["failed"] and not report["applied"] else 200
+    return web.json_response(report, status=status, dumps=partial(json.dumps, ensure_ascii=False))
+
+
+@tree.command(name="bulkconfig", description="(봇 소유자) 여러 길드 설정 일괄 적용(JSON/JSONL 파일)")
+async def bulkconfig(interaction: discord.Interaction, file: discord.Attachment, dry_run: bool = False, partial: bool = False):
+    if not await client.is_owner(interaction.user):
+        return await safe_reply(interaction, "봇 소유자만 가능.", ephemeral=True)
+    if file.size > BULK_CONFIG_MAX_BYTES:
+        return await safe_reply(interaction, f"파일은 {BULK_CONFIG_MAX_BYTES // 1024}KB까지.", ephemeral=True)
+
+    if await claim_response(interaction):
+        await outbound(PRIO_INTERACTION, interaction.response.defer, ephemeral=True, thinking=True)
+    try:
+        rows = load_bulk_payload((await file.read()).decode("utf-8-sig"))
+    except ValueError as e:
+        return await safe_reply(interaction, f"파일 형식 오류: {e}", ephemeral=True)
+
+    report = await apply_bulk_config(rows, interaction.user.mention, dry_run=dry_run, allow_partial=partial)
+    body = json.dumps(report, ensure_ascii=False, indent=1).encode("utf-8")
+    await outbound(
+        PRIO_INTERACTION, interaction.followup.send, _bulk_summary(report),
+        file=discord.File(io.BytesIO(body), filename="bulkconfig-report.json"), ephemeral=True,
+    )
 
 
 # =========================================================
 # 3) 관리: 메시지 삭제 /clear
 # =========================================================
-@tree.command(name="clear", description="현재 채널 메시지 여러 개 삭제")
+CLEAR_MAX = 10000
+CLEAR_SCAN_LIMIT = int(os.getenv("CLEAR_SCAN_LIMIT", "50000"))  # 필터 걸었을 때 최대 확인 개수
+CLEAR_PROGRESS_SECONDS = 2.0
+CLEAR_SINGLE_DELETE_DELAY = 1.0  # 14일 지난 메시지는 일괄삭제 불가 → 하나씩 천천히
+
+
+class PurgeJob:
+    # 채널 기록을 100개씩 받아오면서(history가 알아서 페이지 넘김) 조건에 맞는 것만 삭제
+    # - 14일 이내: 100개 모이면 일괄삭제를 백그라운드로 보내고 그동안 다음 페이지를 읽음
+    # - 14일 지난 것: 하나씩 + 딜레이
+    # 들고 있는 메시지는 최대 100개(+삭제 중 100개)라 몇 개를 훑든 메모리 일정
+    def __init__(self, channel: discord.TextChannel, count: int, *, author=None, contains: str | None = None, after=None):
+        self.channel = channel
+        self.count = count
+        self.author_id = author.id if author else None
+        self.contains = contains.lower() if contains else None
+        self.after = after
+        self.scanned = 0
+        self.queued = 0
+        self.deleted = 0
+        self.cancelled = False
+
+    def _match(self, msg: discord.Message) -> bool:
+        if self.author_id is not None and msg.author.id != self.author_id:
+            return False
+        if self.contains is not None and self.contains not in msg.content.lower():
+            return False
+        return True
+
+    async def _bulk(self, batch: list[discord.Message]) -> None:
+        try:
+            await outbound(PRIO_MODERATION, self.channel.delete_messages, batch, bucket=("channel", self.channel.id))
+            self.deleted += len(batch)
+        except discord.NotFound:
+            # 중간에 누가 먼저 지운 게 있으면 일괄삭제 전체가 실패 → 하나씩
+            for msg in batch:
+                await self._single(msg)
+
+    async def _single(self, msg: discord.Message) -> None:
+        try:
+            await outbound(PRIO_MODERATION, msg.delete, bucket=("channel", self.channel.id))
+            self.deleted += 1
+        except discord.NotFound:
+            pass
+
+    async def run(self, on_progress) -> None:
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+        batch: list[discord.Message] = []
+        pending: asyncio.Task | None = None
+        last_report = time.monotonic()
+
+        async def send_batch():
+            nonlocal batch, pending
+            if pending:
+                await pending
+            pending = asyncio.create_task(self._bulk(batch)) if batch else None
+            batch = []
+
+        try:
+            async for msg in self.channel.history(limit=CLEAR_SCAN_LIMIT, after=self.after, oldest_first=False):
+                if self.cancelled or self.queued >= self.count:
+                    break
+                self.scanned += 1
+                if not self._match(msg):
+                    continue
+
+                self.queued += 1
+                if msg.created_at > cutoff:
+                    batch.append(msg)
+                    if len(batch) >= 100:
+                        await send_batch()
+                else:
+                    # 최신 → 오래된 순이라 여기부터는 전부 14일 지난 메시지
+                    await send_batch()
+                    if pending:
+                        await pending
+                        pending = None
+                    await self._single(msg)
+                    await asyncio.sleep(CLEAR_SINGLE_DELETE_DELAY)
+
+                if time.monotonic() - last_report >= CLEAR_PROGRESS_SECONDS:
+                    last_report = time.monotonic()
+                    await on_progress(self)
+
+            if not self.cancelled:
+                await send_batch()
+            if pending:
+                await pending
+        finally:
+            if pending and not pending.done():
+                pending.cancel()
+
+
+class PurgeCancelView(discord.ui.View):
+    def __init__(self, job: PurgeJob):
+        super().__init__(timeout=None)
+        self.job = job
+
+    @discord.ui.button(label="취소", style=discord.ButtonStyle.danger)
+    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.job.cancelled = True
+        button.disabled = True
+        await interaction.response.edit_message(content="취소 중…", view=self)
+
+
+ACTIVE_PURGES: dict[int, PurgeJob] = {}  # channel_id → 진행 중인 삭제
+
+
+@tree.command(name="clear", description="현재 채널 메시지 여러 개 삭제(작성자/문구/최근 N분 필터, 취소 가능)")
 @app_commands.checks.has_permissions(manage_messages=True)
-async def clear(interaction: discord.Interaction, count: app_commands.Range[int, 1, 100]):
+async def clear(
+    interaction: discord.Interaction,
+    count: app_commands.Range[int, 1, CLEAR_MAX],
+    author: discord.User | None = None,
+    contains: str | None = None,
+    minutes: app_commands.Range[int, 1, 60 * 24 * 365] | None = None,
+):
     channel = interaction.channel
     if not isinstance(channel, discord.TextChannel):
         return await safe_reply(interaction, "텍스트 채널에서만 가능.", ephemeral=True)
+    if channel.id in ACTIVE_PURGES:
+        return await safe_reply(interaction, "이 채널은 이미 삭제 중이야.", ephemeral=True)
+
+    after = discord.utils.utcnow() - timedelta(minutes=minutes) if minutes else None
+    job = PurgeJob(channel, count, author=author, contains=contains, after=after)
+    view = PurgeCancelView(job)
+    ACTIVE_PURGES[channel.id] = job
+    progress = None
+
+    async def report(content: str, v=None):
+        # 진행 메시지 수정은 실패해도(레이트리밋/토큰 만료) 삭제 작업에는 영향 없게
+        if progress is None:
+            return
+        try:
+            await outbound(PRIO_INTERACTION, progress.edit, content=content, view=v)
+        except discord.HTTPException:
+            pass
+
+    async def on_progress(j: PurgeJob):
+        await report(f"삭제 중… {j.deleted}/{j.count}개 삭제 (확인 {j.scanned}개)", view)
 
-    await interaction.response.defer(ephemeral=True)
     try:
-        deleted = await channel.purge(limit=count)
-        await interaction.followup.send(f"{len(deleted)}개 삭제했어.", ephemeral=True)
-        await log_action(interaction.guild, f"🧹 메시지 삭제: {len(deleted)}개 (채널: {channel.mention}, 실행: {interaction.user.mention})")
+        # defer/followup 이 실패해도 ACTIVE_PURGES 에 채널이 남아 영영 잠기지 않도록 try 안에서
+        if await claim_response(interaction):
+            await outbound(PRIO_INTERACTION, interaction.response.defer, ephemeral=True)
+        progress = await outbound(PRIO_INTERACTION, interaction.followup.send, f"삭제 시작… (최대 {count}개)",
+                                  ephemeral=True, view=view, wait=True)
+        await job.run(on_progress)
+        note = " (취소됨)" if job.cancelled else ""
+        await report(f"{job.deleted}개 삭제했어.{note} (확인 {job.scanned}개)")
+        await log_action(interaction.guild, f"🧹 메시지 삭제: {job.deleted}개{note} (채널: {channel.mention}, 실행: {interaction.user.mention})")
     except discord.Forbidden:
-        await interaction.followup.send("권한 부족(봇에 '메시지 관리' 권한 필요).", ephemeral=True)
+        await report("권한 부족(봇에 '메시지 관리' 권한 필요).")
     except Exception as e:
-        await interaction.followup.send(f"실패: {e}", ephemeral=True)
+        print(f"[clear] failed: {e}")
+        await report(f"실패: {e} ({job.deleted}개는 삭제됨)")
+    finally:
+        ACTIVE_PURGES.pop(channel.id, None)
+        view.stop()
 
 
 # =========================================================
 # 4) 관리: 경고 시스템 (+ 누적 자동 처벌)
 # =========================================================
+def warn_ttl_seconds(guild_id: int) -> float | None:
+    cfg = CONFIG.get(guild_id)
+    days = cfg.warn_ttl_days if cfg is not None and cfg.warn_ttl_days is not None else WARN_TTL_DAYS
+    return days * 86400.0 if days > 0 else None
+
+
+def _ts_epoch(ts: str) -> float:
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class ActiveWarnings:
+    # (guild_id, user_id) → 만료 시각(epoch) 오름차순 목록
+    # 활성 경고 수 = 목록 길이 (앞에서 만료된 것만 떼어냄 → 분할 상환 O(1))
+    # 처음 필요할 때 저장소에서 만료 안 된 것만 읽어 채우고, 이후엔 경고 추가 때 같이 갱신
+    def __init__(self):
+        self._expiry: dict[tuple[int, int], list[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def known(self, key: tuple[int, int]) -> bool:
+        return key in self._expiry
+
+    def seed(self, key: tuple[int, int], timestamps: list[str], ttl: float | None) -> None:
+        self._expiry[key] = sorted(_ts_epoch(ts) + ttl if ttl else float("inf") for ts in timestamps)
+
+    def add(self, key: tuple[int, int], ts: float, ttl: float | None) -> None:
+        items = self._expiry.get(key)
+        if items is not None:
+            bisect.insort(items, ts + ttl if ttl else float("inf"))
+
+    def discard(self, key: tuple[int, int], ts: float, ttl: float | None) -> None:
+        # add 한 것 하나만 되돌림 (저장 실패) → 다른 진행 중인 경고는 그대로 둠
+        items = self._expiry.get(key)
+        if items:
+            expiry = ts + ttl if ttl else float("inf")
+            i = bisect.bisect_left(items, expiry)
+            if i < len(items) and items[i] == expiry:
+                del items[i]
+
+    def count(self, key: tuple[int, int], now: float) -> int:
+        items = self._expiry.get(key)
+        if not items:
+            return 0
+        n = bisect.bisect_right(items, now)
+        if n:
+            del items[:n]
+        return len(items)
+
+    def forget(self, key: tuple[int, int]) -> None:
+        self._expiry.pop(key, None)
+
+    def forget_guild(self, guild_id: int) -> None:
+        # 만료 기간이 바뀌면 다시 읽어야 함
+        for key in [k for k in self._expiry if k[0] == guild_id]:
+            del self._expiry[key]
+
+    def sweep(self, now: float) -> None:
+        for key in list(self._expiry):
+            if not self.count(key, now):
+                del self._expiry[key]
+
+
+ACTIVE_WARNINGS = ActiveWarnings()
+
+
+_WARNING_SEEDS: dict[tuple[int, int], asyncio.Task] = {}  # (guild_id, user_id) → 진행 중인 캐시 채우기
+
+
+async def _seed_active_warnings(key: tuple[int, int]) -> None:
+    guild_id, user_id = key
+    ttl = warn_ttl_seconds(guild_id)
+    since = (discord.utils.utcnow() - timedelta(seconds=ttl)).isoformat() if ttl else ""
+    timestamps = await STORE.warning_times(guild_id, user_id, since)
+    if not ACTIVE_WARNINGS.known(key):
+        ACTIVE_WARNINGS.seed(key, timestamps, ttl)
+
+
+async def active_warning_count(guild_id: int, user_id: int) -> int:
+    # 캐시가 비었을 때 저장소 읽기는 키당 하나만 돌리고 동시에 부른 쪽은 그걸 같이 기다림
+    #   각자 읽어서 seed 하면 늦게 끝난 쪽이 그 사이 reserve_warning 된 경고를 덮어써서 숫자가 겹침
+    key = (guild_id, user_id)
+    while not ACTIVE_WARNINGS.known(key):
+        task = _WARNING_SEEDS.get(key)
+        if task is None:
+            task = _WARNING_SEEDS[key] = asyncio.create_task(_seed_active_warnings(key))
+            task.add_done_callback(lambda _t: _WARNING_SEEDS.pop(key, None))
+        await asyncio.shield(task)  # 기다리던 쪽이 취소돼도 읽기는 끝까지
+    return ACTIVE_WARNINGS.count(key, time.time())
+
+
+async def record_warning(guild_id: int, user_id: int, entry: dict) -> int:
+    # 캐시 채우기 → 반영 → 저장 순서 (/warn 과 같은 순서라야 진행 중인 seed 와 안 엇갈림)
+    await active_warning_count(guild_id, user_id)
+    total = reserve_warning(guild_id, user_id, entry)
+    try:
+        await STORE.add_warning(guild_id, user_id, entry)
+    except Exception:
+        ACTIVE_WARNINGS.discard((guild_id, user_id), _ts_epoch(entry["ts"]), warn_ttl_seconds(guild_id))
+        raise
+    return total
+
+
+def reserve_warning(guild_id: int, user_id: int, entry: dict) -> int:
+    # 활성 경고 캐시에만 먼저 반영하고 누적 수 반환 (저장은 호출한 쪽에서 응답과 같이 돌림)
+    # 먼저 active_warning_count로 캐시를 채워둬야 함 (seed 는 키당 한 번이라 동시 /warn 도 각자 +1 씩 쌓임)
+    key = (guild_id, user_id)
+    ACTIVE_WARNINGS.add(key, _ts_epoch(entry["ts"]), warn_ttl_seconds(guild_id))
+    return ACTIVE_WARNINGS.count(key, time.time())
+
+
+async def record_warnings(guild_id: int, entries: list[tuple[int, dict]]) -> None:
+    await STORE.add_warnings(guild_id, entries)
+    ttl = warn_ttl_seconds(guild_id)
+    for user_id, entry in entries:
+        ACTIVE_WARNINGS.add((guild_id, user_id), _ts_epoch(entry["ts"]), ttl)
+
+
+@tasks.loop(hours=WARN_COMPACT_HOURS)
+async def warn_compact_task():
+    try:
+        if IS_PRIMARY:  # 저장소 정리는 한 프로세스만
+            now = discord.utils.utcnow()
+            cutoffs = {}
+            for guild_id in await STORE.warning_guilds():
+                ttl = warn_ttl_seconds(guild_id)
+                if ttl:
+                    cutoffs[guild_id] = (now - timedelta(seconds=ttl)).isoformat()
+            removed = await STORE.compact_warnings(cutoffs) if cutoffs else 0
+            if removed:
+                print(f"[warn_compact] expired {removed} warnings in {len(cutoffs)} guilds")
+        ACTIVE_WARNINGS.sweep(time.time())
+    except Exception as e:
+        print(f"[warn_compact] failed: {e}")
+
+
 @tree.command(name="warn", description="유저 경고 1회 추가(3회부터 자동 처벌)")
 @app_commands.checks.has_permissions(moderate_members=True)
 async def warn(interaction: discord.Interaction, member: discord.Member, reason: str | None = None):
     if member == interaction.user:
         return await safe_reply(interaction, "자기 자신은 안 돼.", ephemeral=True)
 
-    gid = _gid(interaction.guild.id)
-    uid = _uid(member.id)
-
-    DATA.setdefault("warnings", {})
-    DATA["warnings"].setdefault(gid, {})
-    DATA["warnings"][gid].setdefault(uid, [])
-
-    DATA["warnings"][gid][uid].append(
-        {"by": str(interaction.user.id), "reason": reason or "", "ts": discord.utils.utcnow().isoformat()}
+    # 누적 수는 메모리(활성 경고 캐시)에서 바로 → 응답 한 번 왕복이 저장을 기다리지 않음 (응답 ‖ 저장)
+    # 처벌은 저장된 경고 기준이고 응답 뒤에 보냄: 같이 보내면 처벌 요청이 outbound 자리를 먼저 차지해서
+    # 다른 /warn 응답이 늦어짐 (bench_load: sqlite p50 85ms → 120ms)
+    guild = interaction.guild
+    entry = {"by": str(interaction.user.id), "reason": reason or "", "ts": discord.utils.utcnow().isoformat()}
+    await active_warning_count(guild.id, member.id)
+    total = reserve_warning(guild.id, member.id, entry)
+    await log_action(guild, f"⚠️ 경고: {member.mention} (누적 {total}회) (실행: {interaction.user.mention}) 사유: {reason or '없음'}")
+
+    _, saved = await asyncio.gather(
+        safe_reply(interaction, f"{member.mention} 경고 추가됨. (누적 {total}{_ttl_note(guild.id)})", ephemeral=True),
+        STORE.add_warning(guild.id, member.id, entry),
+        return_exceptions=True,
     )
-    save_data(DATA)
+    if isinstance(saved, Exception):
+        # 이 경고만 캐시에서 뺌 (통째로 비우면 다른 /warn 이 저장 중인 경고를 다시 읽을 때 놓칠 수 있음)
+        ACTIVE_WARNINGS.discard((guild.id, member.id), _ts_epoch(entry["ts"]), warn_ttl_seconds(guild.id))
+        await log_action(guild, f"❌ 경고 저장 실패: {member.mention} (처벌 안 함)")
+        raise saved  # → 에러 핸들러가 followup으로 알림
+    await escalate_warning(member, total, reason)
 
-    total = len(DATA["warnings"][gid][uid])
 
-    await safe_reply(interaction, f"{member.mention} 경고 추가됨. (누적 {total})", ephemeral=True)
-    await log_action(interaction.guild, f"⚠️ 경고: {member.mention} (누적 {total}회) (실행: {interaction.user.mention}) 사유: {reason or '없음'}")
+def _ttl_note(guild_id: int) -> str:
+    ttl = warn_ttl_seconds(guild_id)
+    return f", 최근 {ttl / 86400:.0f}일" if ttl else ""
 
+
+async def escalate_warning(member: discord.Member, total: int, reason: str | None) -> None:
+    # 만료 안 된 경고 수에 따라 타임아웃/강퇴 (/warn, automod 공통)
     if total >= WARN_KICK_AT:
         try:
-            await member.kick(reason=f"Warn reached {total}. {reason or ''}".strip())
-            await log_action(interaction.guild, f"👢 자동 강퇴: {member.mention} (경고 {total}회 도달)")
+            await outbound(PRIO_MODERATION, member.kick, reason=f"Warn reached {total}. {reason or ''}".strip(),
+                           bucket=("guild", member.guild.id))
+            await log_action(member.guild, f"👢 자동 강퇴: {member.mention} (경고 {total}회 도달)")
         except discord.Forbidden:
-            await log_action(interaction.guild, f"❌ 자동 강퇴 실패(권한): {member.mention} (경고 {total}회)")
+            await log_action(member.guild, f"❌ 자동 강퇴 실패(권한): {member.mention} (경고 {total}회)")
         return
 
     minutes = WARN_TIMEOUT_MINUTES.get(total)
@@ -410,49 +3133,731 @@ async def warn(interaction: discord.Interaction, member: discord.Member, reason:
         if current_until and current_until > until:
             return
         try:
-            await member.timeout(until, reason=f"Warn reached {total}. {reason or ''}".strip())
-            await log_action(interaction.guild, f"🔇 자동 타임아웃: {member.mention} {minutes}분 (경고 {total}회)")
+            await outbound(PRIO_MODERATION, member.timeout, until, reason=f"Warn reached {total}. {reason or ''}".strip(),
+                           bucket=("guild", member.guild.id))
+            await log_action(member.guild, f"🔇 자동 타임아웃: {member.mention} {minutes}분 (경고 {total}회)")
         except discord.Forbidden:
-            await log_action(interaction.guild, f"❌ 자동 타임아웃 실패(권한): {member.mention} (경고 {total}회)")
+            await log_action(member.guild, f"❌ 자동 타임아웃 실패(권한): {member.mention} (경고 {total}회)")
+
+
+WARNINGS_PAGE_SIZE = 10
+
+
+class WarningsPager(discord.ui.View):
+    # 페이지 0 = 최신 WARNINGS_PAGE_SIZE개, 버튼 누를 때마다 그 페이지만 저장소에서 읽음
+    def __init__(self, owner_id: int, guild_id: int, member: discord.Member):
+        super().__init__(timeout=300)
+        self.owner_id = owner_id
+        self.guild_id = guild_id
+        self.member = member
+        self.page = 0
+        self.total = 0
+
+    async def render(self) -> str:
+        gid, uid = self.guild_id, self.member.id
+        total, items = await STORE.get_warnings(gid, uid, WARNINGS_PAGE_SIZE, self.page * WARNINGS_PAGE_SIZE)
+        pages = max(1, -(-total // WARNINGS_PAGE_SIZE))
+        if self.page >= pages:  # 보는 사이 경고가 지워짐 → 마지막 페이지로
+            self.page = pages - 1
+            total, items = await STORE.get_warnings(gid, uid, WARNINGS_PAGE_SIZE, self.page * WARNINGS_PAGE_SIZE)
+        expired = await STORE.expired_count(gid, uid)
+        self.total = total
+        self.newer.disabled = self.page == 0
+        self.older.disabled = self.page >= pages - 1
+
+        if not items:
+            note = f" (만료되어 보관된 경고 {expired}개, /exportwarnings 로 볼 수 있음)" if expired else ""
+            return f"{self.member.mention} 경고 없음.{note}"
+        active = await active_warning_count(gid, uid)
+
+        lines = []
+        start_index = expired + total - self.page * WARNINGS_PAGE_SIZE - len(items) + 1
+        for i, w in enumerate(items, start=start_index):
+            r = w.get("reason", "")
+            ts = w.get("ts", "")
+            lines.append(f"{i}. {ts} | 사유: {r if r else '(없음)'}")
+
+        return (f"**{self.member.mention} 경고 누적: {active}{_ttl_note(gid)}** (전체 {expired + total}) "
+                f"— {self.page + 1}/{pages} 페이지\n" + "\n".join(lines))
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.owner_id:
+            await safe_reply(interaction, "명령어 쓴 사람만 넘길 수 있어.", ephemeral=True)
+            return False
+        return True
+
+    async def _show(self, interaction: discord.Interaction, delta: int) -> None:
+        self.page = max(0, self.page + delta)
+        content = await self.render()
+        await outbound(PRIO_INTERACTION, interaction.response.edit_message, content=content, view=self)
+
+    @discord.ui.button(label="◀ 최근", style=discord.ButtonStyle.secondary)
+    async def newer(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, -1)
+
+    @discord.ui.button(label="이전 ▶", style=discord.ButtonStyle.secondary)
+    async def older(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, 1)
 
 
 @tree.command(name="warnings", description="유저 경고 내역/누적 확인")
 @app_commands.checks.has_permissions(moderate_members=True)
 async def warnings(interaction: discord.Interaction, member: discord.Member):
-    gid = _gid(interaction.guild.id)
-    uid = _uid(member.id)
-    items = DATA.get("warnings", {}).get(gid, {}).get(uid, [])
-
-    if not items:
-        return await safe_reply(interaction, f"{member.mention} 경고 없음.", ephemeral=True)
-
-    lines = []
-    start_index = max(1, len(items) - 9)
-    for i, w in enumerate(items[-10:], start=start_index):
-        r = w.get("reason", "")
-        ts = w.get("ts", "")
-        lines.append(f"{i}. {ts} | 사유: {r if r else '(없음)'}")
-
-    msg = f"**{member.mention} 경고 누적: {len(items)}**\n" + "\n".join(lines)
-    await safe_reply(interaction, msg, ephemeral=True)
+    pager = WarningsPager(interaction.user.id, interaction.guild.id, member)
+    content = await pager.render()
+    if pager.total <= WARNINGS_PAGE_SIZE:
+        return await safe_reply(interaction, content, ephemeral=True)
+    if not await claim_response(interaction):
+        return await outbound(PRIO_INTERACTION, interaction.followup.send, content, view=pager, ephemeral=True)
+    await outbound(PRIO_INTERACTION, interaction.response.send_message, content, view=pager, ephemeral=True)
+    _observe_command(interaction, COMMAND_REPLY_SECONDS)
 
 
 @tree.command(name="clearwarnings", description="유저 경고 전부 삭제")
 @app_commands.checks.has_permissions(moderate_members=True)
 async def clearwarnings(interaction: discord.Interaction, member: discord.Member):
-    gid = _gid(interaction.guild.id)
-    uid = _uid(member.id)
-
-    if DATA.get("warnings", {}).get(gid, {}).get(uid) is None:
+    if not await STORE.clear_warnings(interaction.guild.id, member.id):
         return await safe_reply(interaction, "삭제할 경고가 없어.", ephemeral=True)
-
-    DATA["warnings"][gid].pop(uid, None)
-    save_data(DATA)
+    ACTIVE_WARNINGS.forget((interaction.guild.id, member.id))
 
     await safe_reply(interaction, f"{member.mention} 경고 삭제 완료.", ephemeral=True)
     await log_action(interaction.guild, f"🧽 경고 삭제: {member.mention} (실행: {interaction.user.mention})")
 
 
+@tree.command(name="warnexpiry", description="(현재 서버) 경고 만료 기간(일) 설정, 0 = 만료 없음")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def warnexpiry(interaction: discord.Interaction, days: app_commands.Range[int, 0, 3650]):
+    if not interaction.guild:
+        return await safe_reply(interaction, "서버에서만 가능.", ephemeral=True)
+
+    CONFIG.set_warn_ttl(interaction.guild.id, days)
+    ACTIVE_WARNINGS.forget_guild(interaction.guild.id)
+
+    what = f"{days}일 지난 경고는 누적 처벌에서 빠짐" if days else "경고 만료 없음"
+    await safe_reply(interaction, f"경고 만료 설정: {what}", ephemeral=True)
+    await log_action(interaction.guild, f"⏳ 경고 만료 설정: {what} (관리자: {interaction.user.mention})")
+
+
+# 경고 내보내기: 저장소에서 EXPORT_BATCH개씩 읽어 → 워커 스레드에서 CSV/JSONL 인코딩 + gzip
+# → SpooledTemporaryFile (작으면 메모리, 크면 디스크). 전체를 메모리에 만들지 않음
+# 첨부 한도에 가까워지면 새 .gz 파트로 나눔 (파트마다 따로 풀 수 있음)
+EXPORT_BATCH = 2000
+EXPORT_SPOOL_BYTES = 4 * 1024 * 1024
+EXPORT_PART_MARGIN = 512 * 1024        # gzip 내부 버퍼만큼 여유
+EXPORT_FILES_PER_MESSAGE = 10          # Discord 메시지당 첨부 수 상한
+ACTIVE_EXPORTS: set[int] = set()
+
+
+class _GzipParts:
+    def __init__(self, basename: str, fmt: str, part_limit: int):
+        self.basename = basename
+        self.fmt = fmt
+        self.part_limit = part_limit
+        self.header = b"user_id,ts,by,reason,archived\r\n" if fmt == "csv" else b""
+        self.parts: list = []
+        self.rows = 0
+        self._open()
+
+    def _open(self) -> None:
+        self._raw = SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+        self._gz = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6)
+        if self.header:
+            self._gz.write(self.header)
+
+    def _close_part(self) -> None:
+        self._gz.close()  # fileobj(_raw)는 안 닫힘
+        self._raw.seek(0)
+        self.parts.append(self._raw)
+
+    def write_rows(self, rows: list[tuple[int, dict]]) -> None:
+        # 워커 스레드에서 실행. 쓰기 전에 넘겨서 마지막 파트가 헤더만 남지 않게
+        if self._raw.tell() >= self.part_limit - EXPORT_PART_MARGIN:
+            self._close_part()
+            self._open()
+        buf = io.StringIO()
+        if self.fmt == "csv":
+            w = csv.writer(buf)
+            for uid, e in rows:
+                w.writerow((uid, e.get("ts", ""), e.get("by", ""), e.get("reason", ""), int(bool(e.get("archived")))))
+        else:
+            for uid, e in rows:
+                buf.write(json.dumps({"user_id": uid, "ts": e.get("ts", ""), "by": e.get("by", ""),
+                                      "reason": e.get("reason", ""), "archived": bool(e.get("archived"))},
+                                     ensure_ascii=False))
+                buf.write("\n")
+        self._gz.write(buf.getvalue().encode("utf-8"))
+        self.rows += len(rows)
+
+    def finish(self) -> list[discord.File]:
+        self._close_part()
+        n = len(self.parts)
+        return [
+            discord.File(fp, filename=f"{self.basename}{'' if n == 1 else f'.part{i + 1}'}.{self.fmt}.gz")
+            for i, fp in enumerate(self.parts)
+        ]
+
+    def discard(self) -> None:
+        for fp in self.parts + [self._raw]:
+            fp.close()
+
+
+@tree.command(name="exportwarnings", description="(현재 서버) 경고 기록 전체를 압축 파일로 내보내기")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def exportwarnings(interaction: discord.Interaction, format: Literal["csv", "jsonl"] = "csv"):
+    guild = interaction.guild
+    if not guild:
+        return await safe_reply(interaction, "서버에서만 가능.", ephemeral=True)
+    if guild.id in ACTIVE_EXPORTS:
+        return await safe_reply(interaction, "이 서버는 이미 내보내는 중이야.", ephemeral=True)
+
+    ACTIVE_EXPORTS.add(guild.id)
+    out = _GzipParts(f"warnings-{guild.id}-{discord.utils.utcnow():%Y%m%d-%H%M%S}", format, guild.filesize_limit)
+    try:
+        if await claim_response(interaction):
+            await outbound(PRIO_INTERACTION, interaction.response.defer, ephemeral=True, thinking=True)
+        async for rows in STORE.iter_warnings(guild.id, EXPORT_BATCH):
+            await asyncio.to_thread(out.write_rows, rows)
+        if not out.rows:
+            out.discard()
+            return await safe_reply(interaction, "내보낼 경고가 없어.", ephemeral=True)
+
+        files = await asyncio.to_thread(out.finish)
+        for i in range(0, len(files), EXPORT_FILES_PER_MESSAGE):
+            chunk = files[i:i + EXPORT_FILES_PER_MESSAGE]
+            content = f"경고 {out.rows}개 내보내기 ({format}, gzip)" if i == 0 else None
+            await outbound(PRIO_INTERACTION, interaction.followup.send, content, files=chunk, ephemeral=True)
+        await log_action(guild, f"📤 경고 내보내기: {out.rows}개 ({format}) (실행: {interaction.user.mention})")
+    except Exception:
+        out.discard()
+        raise
+    finally:
+        ACTIVE_EXPORTS.discard(guild.id)
+        for fp in out.parts:
+            fp.close()
+
+
+# =========================================================
+# 5) 자동 관리(automod): on_message 도배/멘션 폭탄
+# =========================================================
+class _SpamState:
+    __slots__ = ("tokens", "last", "hashes", "times", "pos", "warned_at")
+
+    def __init__(self, now: float, rate: float):
+        self.tokens = rate
+        self.last = now
+        self.hashes = [0] * AUTOMOD_DUP_WINDOW   # 최근 메시지 내용 해시 (링 버퍼)
+        self.times = [0.0] * AUTOMOD_DUP_WINDOW
+        self.pos = 0
+        self.warned_at = 0.0
+
+
+class AutoModEngine:
+    # (guild_id, user_id) → _SpamState, OrderedDict로 LRU + TTL (크기 상한 넘으면 오래된 것부터 버림)
+    # 메시지 하나당: dict 조회 1번 + 토큰 버킷 계산 + 고정 길이(AUTOMOD_DUP_WINDOW) 링 버퍼 확인
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        self._state: OrderedDict[tuple[int, int], _SpamState] = OrderedDict()
+        self.checked = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def _get(self, key: tuple[int, int], now: float, rate: float = AUTOMOD_RATE) -> _SpamState:
+        state = self._state.get(key)
+        if state is None or now - state.last > self.ttl:
+            state = self._state[key] = _SpamState(now, rate)
+        self._state.move_to_end(key)
+        # 앞쪽(가장 오래 안 쓴 것)부터 만료/상한 정리 → 호출당 상수 시간(분할 상환)
+        while self._state:
+            oldest = next(iter(self._state.values()))
+            if len(self._state) <= self.size and now - oldest.last <= self.ttl:
+                break
+            self._state.popitem(last=False)
+        return state
+
+    def check(self, guild_id: int, user_id: int, content: str, mentions: int, now: float,
+              rate: float = AUTOMOD_RATE, dup: int = AUTOMOD_DUP_COUNT) -> str | None:
+        self.checked += 1
+        if mentions >= AUTOMOD_MENTION_LIMIT:
+            return self._hit("mentions")
+
+        state = self._get((guild_id, user_id), now, rate)
+
+        # 메시지 속도: 토큰 버킷 (AUTOMOD_RATE_SECONDS 동안 rate개)
+        tokens = min(rate, state.tokens + (now - state.last) * (rate / AUTOMOD_RATE_SECONDS))
+        state.last = now
+        if tokens < 1.0:
+            state.tokens = tokens
+            return self._hit("rate")
+        state.tokens = tokens - 1.0
+
+        # 같은 내용 반복: 최근 N개 해시 중 시간 안에 같은 게 몇 개인지
+        if content:
+            h = hash(content.lower())
+            since = now - AUTOMOD_DUP_SECONDS
+            hashes, times = state.hashes, state.times
+            same = 1
+            for i in range(AUTOMOD_DUP_WINDOW):
+                if hashes[i] == h and times[i] >= since:
+                    same += 1
+            hashes[state.pos] = h
+            times[state.pos] = now
+            state.pos = (state.pos + 1) % AUTOMOD_DUP_WINDOW
+            if same >= dup:
+                return self._hit("duplicate")
+        return None
+
+    def _hit(self, rule: str) -> str:
+        self.hits += 1
+        AUTOMOD_HITS.inc(rule)
+        return rule
+
+    def should_warn(self, guild_id: int, user_id: int, now: float) -> bool:
+        # 도배 중엔 메시지마다 경고가 쌓이지 않게 쿨다운 (그 사이 메시지는 삭제만)
+        state = self._get((guild_id, user_id), now)
+        if now - state.warned_at < AUTOMOD_WARN_COOLDOWN:
+            return False
+        state.warned_at = now
+        return True
+
+
+AUTOMOD = AutoModEngine(AUTOMOD_STATE_SIZE, AUTOMOD_STATE_TTL)
+AUTOMOD_REASONS = {"mentions": "멘션 폭탄", "rate": "메시지 도배(속도)", "duplicate": "같은 내용 반복",
+                   "word": "금지어", "domain": "금지 링크"}
+
+
+def automod_policy(guild_id: int) -> tuple[float, int] | None:
+    # (속도 기준, 반복 기준), 꺼져 있으면 None — 길드가 /automod 로 안 정한 값은 AUTOMOD_* 기본값
+    cfg = CONFIG.get(guild_id)
+    if cfg is None:
+        return (AUTOMOD_RATE, AUTOMOD_DUP_COUNT) if AUTOMOD_ENABLED else None
+    if not (cfg.automod_on if cfg.automod_on is not None else AUTOMOD_ENABLED):
+        return None
+    return (cfg.automod_rate if cfg.automod_rate is not None else AUTOMOD_RATE,
+            cfg.automod_dup if cfg.automod_dup is not None else AUTOMOD_DUP_COUNT)
+
+
+def automod_check(message: discord.Message) -> str | None:
+    # 빠른 경로: 봇/DM/꺼진 길드 거르고 엔진 검사만 (권한 확인 같은 비싼 건 걸렸을 때만)
+    if message.guild is None or message.author.bot:
+        return None
+    policy = automod_policy(message.guild.id)
+    if policy is None:
+        return None
+    mentions = len(message.mentions) + len(message.role_mentions)
+    return AUTOMOD.check(message.guild.id, message.author.id, message.content, mentions, time.monotonic(), *policy)
+
+
+class KeywordFilter:
+    # 길드 금지어 → Aho–Corasick 오토마톤 (목록이 바뀔 때만 다시 만듦)
+    # 메시지 검사는 글자 수에 비례, 패턴 개수와는 무관
+    # 금지 도메인은 메시지 속 호스트를 뽑아서 자기/상위 도메인을 set으로 확인 (sub.example.com → example.com)
+    __slots__ = ("_goto", "_fail", "_out", "_domains")
+    _HOST_RE = re.compile(r"(?:https?://)?((?:[a-z0-9-]+\.)+[a-z]{2,})", re.IGNORECASE)
+
+    def __init__(self, words: list[str], domains: list[str]):
+        goto: list[dict[str, int]] = [{}]
+        out: list[str | None] = [None]
+        for word in words:
+            word = word.lower()
+            if not word:
+                continue
+            s = 0
+            for ch in word:
+                nxt = goto[s].get(ch)
+                if nxt is None:
+                    nxt = goto[s][ch] = len(goto)
+                    goto.append({})
+                    out.append(None)
+                s = nxt
+            out[s] = out[s] or word
+
+        # 실패 링크 (BFS), 출력은 실패 링크 쪽 것도 물려받음 → 검사할 때 체인을 안 따라가도 됨
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            for ch, nxt in goto[s].items():
+                f = fail[s]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                out[nxt] = out[nxt] or out[fail[nxt]]
+                queue.append(nxt)
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._domains = frozenset(d.lower().strip(".") for d in domains if d)
+
+    def match_word(self, text: str) -> str | None:
+        if len(self._goto) == 1:
+            return None
+        goto, fail, out = self._goto, self._fail, self._out
+        s = 0
+        for ch in text:
+            nxt = goto[s].get(ch)
+            while nxt is None and s:
+                s = fail[s]
+                nxt = goto[s].get(ch)
+            s = nxt or 0
+            if out[s]:
+                return out[s]
+        return None
+
+    def match_domain(self, text: str) -> str | None:
+        if not self._domains or "." not in text:
+            return None
+        for m in self._HOST_RE.finditer(text):
+            host = m.group(1)
+            while True:
+                if host in self._domains:
+                    return host
+                dot = host.find(".")
+                if dot < 0:
+                    break
+                host = host[dot + 1:]
+        return None
+
+    def check(self, content: str) -> tuple[str, str] | None:
+        text = content.lower()
+        word = self.match_word(text)
+        if word is not None:
+            return "word", word
+        domain = self.match_domain(text)
+        if domain is not None:
+            return "domain", domain
+        return None
+
+
+def filter_check(message: discord.Message) -> tuple[str, str] | None:
+    if message.guild is None or message.author.bot or not message.content:
+        return None
+    f = CONFIG.keyword_filter(message.guild.id)
+    return f.check(message.content) if f is not None else None
+
+
+@client.event
+async def on_message(message: discord.Message):
+    note_channel_activity(message)
+    rule = automod_check(message)
+    detail = None
+    if rule is None:
+        hit = filter_check(message)
+        if hit is None:
+            return
+        rule, detail = hit
+
+    member = message.author
+    if not isinstance(member, discord.Member):
+        return  # 웹훅/시스템 메시지 (길드 메시지는 멤버 캐시를 꺼도 payload의 member로 Member가 옴)
+    perms = message.channel.permissions_for(member)
+    if perms.manage_messages or perms.moderate_members:
+        return  # 관리자는 제외
+
+    try:
+        await outbound(PRIO_MODERATION, message.delete, bucket=("channel", message.channel.id))
+    except discord.NotFound:
+        pass
+    except discord.HTTPException as e:
+        print(f"[automod] delete failed: {e}")
+
+    if not AUTOMOD.should_warn(message.guild.id, member.id, time.monotonic()):
+        return
+    label = AUTOMOD_REASONS[rule] + (f" ({detail})" if detail else "")
+    reason = f"automod: {label}"
+    total = await record_warning(
+        message.guild.id,
+        member.id,
+        {"by": str(client.user.id if client.user else 0), "reason": reason, "ts": discord.utils.utcnow().isoformat()},
+    )
+    await log_action(message.guild, f"🤖 자동 경고: {member.mention} (누적 {total}회) 사유: {label} (채널: {message.channel.mention})")
+    await escalate_warning(member, total, reason)
+
+
+def note_channel_activity(message: discord.Message) -> None:
+    # 자동메시지 채널에 사람이 말한 시각 → 잡 객체에 기록 (채널당 O(1), 설정 지우면 같이 사라짐)
+    if message.guild is None or message.author.bot:
+        return
+    cfg = CONFIG.get(message.guild.id)
+    if cfg is None or not cfg.auto_jobs:
+        return
+    ch_id = message.channel.id
+    for job in cfg.auto_jobs.values():
+        if job.channel_id == ch_id:
+            job.last_activity = time.monotonic()
+
+
+FILTER_KINDS = {"word": "words", "domain": "domains"}
+FILTER_LABELS = {"word": "금지어", "domain": "금지 도메인"}
+
+
+def _normalize_filter(kind: str, pattern: str) -> str:
+    pattern = pattern.strip().lower()
+    if kind == "domain":
+        # https://www.example.com/path → example.com 형태로
+        pattern = pattern.split("://", 1)[-1].split("/", 1)[0].strip(".")
+        if pattern.startswith("www."):
+            pattern = pattern[4:]
+    return pattern
+
+
+@tree.command(name="filteradd", description="(현재 서버) 금지어/금지 도메인 추가 (걸리면 삭제 + 경고)")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def filteradd(interaction: discord.Interaction, kind: Literal["word", "domain"], pattern: app_commands.Range[str, 1, 100]):
+    if not interaction.guild:
+        return await safe_reply(interaction, "서버에서만 가능.", ephemeral=True)
+
+    pattern = _normalize_filter(kind, pattern)
+    cfg = CONFIG.get(interaction.guild.id)
+    if cfg is not None and len(cfg.words) + len(cfg.domains) >= FILTER_MAX_PATTERNS:
+        return await safe_reply(interaction, f"필터는 서버당 {FILTER_MAX_PATTERNS}개까지.", ephemeral=True)
+    if not pattern or not CONFIG.edit_filter(interaction.guild.id, FILTER_KINDS[kind], pattern, add=True):
+        return await safe_reply(interaction, "이미 있거나 빈 값이야.", ephemeral=True)
+
+    await safe_reply(interaction, f"{FILTER_LABELS[kind]} 추가: `{pattern}`", ephemeral=True)
+    await log_action(interaction.guild, f"🚫 {FILTER_LABELS[kind]} 추가 (관리자: {interaction.user.mention})")
+
+
+@tree.command(name="filterdel", description="(현재 서버) 금지어/금지 도메인 삭제")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def filterdel(interaction: discord.Interaction, kind: Literal["word", "domain"], pattern: app_commands.Range[str, 1, 100]):
+    if not interaction.guild:
+        return await safe_reply(interaction, "서버에서만 가능.", ephemeral=True)
+
+    pattern = _normalize_filter(kind, pattern)
+    if not CONFIG.edit_filter(interaction.guild.id, FILTER_KINDS[kind], pattern, add=False):
+        return await safe_reply(interaction, "그런 항목 없음.", ephemeral=True)
+
+    await safe_reply(interaction, f"{FILTER_LABELS[kind]} 삭제: `{pattern}`", ephemeral=True)
+    await log_action(interaction.guild, f"♻️ {FILTER_LABELS[kind]} 삭제 (관리자: {interaction.user.mention})")
+
+
+@tree.command(name="filters", description="(현재 서버) 금지어/금지 도메인 목록")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def filters(interaction: discord.Interaction):
+    if not interaction.guild:
+        return await safe_reply(interaction, "서버에서만 가능.", ephemeral=True)
+
+    cfg = CONFIG.get(interaction.guild.id)
+    words = cfg.words if cfg else []
+    domains = cfg.domains if cfg else []
+    if not words and not domains:
+        return await safe_reply(interaction, "설정된 필터 없음.", ephemeral=True)
+
+    msg = (f"**금지어 {len(words)}개**: " + (", ".join(f"`{w}`" for w in words) or "-")
+           + f"\n**금지 도메인 {len(domains)}개**: " + (", ".join(f"`{d}`" for d in domains) or "-"))
+    if len(msg) > DISCORD_MESSAGE_LIMIT:
+        msg = msg[:DISCORD_MESSAGE_LIMIT - 1] + "…"
+    await safe_reply(interaction, msg, ephemeral=True)
+
+
+@tree.command(name="automod", description="(현재 서버) 도배/멘션 폭탄 자동 관리 켜기/끄기 (걸리면 삭제 + 경고)")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def automod(
+    interaction: discord.Interaction,
+    enabled: bool,
+    rate: app_commands.Range[int, 2, 60] | None = None,
+    dup: app_commands.Range[int, 2, AUTOMOD_DUP_WINDOW] | None = None,
+):
+    if not interaction.guild:
+        return await safe_reply(interaction, "서버에서만 가능.", ephemeral=True)
+
+    CONFIG.set_automod(interaction.guild.id, enabled, rate, dup)
+    policy = automod_policy(interaction.guild.id)
+
+    if policy is None:
+        what = "꺼짐 (금지어/금지 도메인 필터는 그대로)"
+    else:
+        what = (f"켜짐: {AUTOMOD_RATE_SECONDS:.0f}초에 {policy[0]:.0f}개 넘게 보내거나 "
+                f"같은 내용 {policy[1]}번 반복하거나 멘션 {AUTOMOD_MENTION_LIMIT}개 이상이면 삭제 + 경고")
+    await safe_reply(interaction, f"자동 관리 {what}", ephemeral=True)
+    await log_action(interaction.guild, f"🤖 자동 관리 {what} (관리자: {interaction.user.mention})")
+
+
+# =========================================================
+# 6) 레이드 방어: on_member_join
+# =========================================================
+_NAME_KEY_RE = re.compile(r"[\W\d_]+")
+
+
+class _Join:
+    __slots__ = ("at", "member", "young", "name_key")
+
+    def __init__(self, at: float, member: discord.Member, young: bool, name_key: str):
+        self.at = at
+        self.member = member
+        self.young = young
+        self.name_key = name_key
+
+
+def raid_policy(guild_id: int) -> tuple[str, int]:
+    # (대응, 입장 기준) — 길드가 /raidguard 로 안 정한 값은 RAID_ACTION / RAID_JOINS
+    cfg = CONFIG.get(guild_id)
+    if cfg is None:
+        return RAID_ACTION, RAID_JOINS
+    return (cfg.raid_action if cfg.raid_action is not None else RAID_ACTION,
+            cfg.raid_joins if cfg.raid_joins is not None else RAID_JOINS)
+
+
+class RaidGuard:
+    # 길드별 (입장 시각 순) deque + 창 안 이름 뼈대 개수 → 입장 하나당 O(1) (분할 상환)
+    # 감지되면 의심 계정을 묶음으로: 제한된 동시 처리 → 경고 한 번에 저장 → 요약 로그 한 줄
+    def __init__(self):
+        self._joins: dict[int, deque[_Join]] = {}
+        self._names: dict[int, dict[str, int]] = {}
+        self._raid_until: dict[int, float] = {}
+        self._pending: dict[int, list[discord.Member]] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+        # 통계
+        self.raids = 0
+        self.actioned = 0
+        self.failed = 0
+
+    @staticmethod
+    def _name_key(member: discord.Member) -> str:
+        # raider123 / Raider_456 → "raider"
+        return _NAME_KEY_RE.sub("", (member.global_name or member.name).lower())[:16]
+
+    def active(self, guild_id: int, now: float) -> bool:
+        return self._raid_until.get(guild_id, 0.0) > now
+
+    def _suspicious(self, join: _Join, names: dict[str, int]) -> bool:
+        similar = len(join.name_key) >= 3 and names.get(join.name_key, 0) >= RAID_SIMILAR_NAMES
+        return join.young or similar
+
+    def on_join(self, member: discord.Member, now: float) -> None:
+        gid = member.guild.id
+        q = self._joins.setdefault(gid, deque())
+        names = self._names.setdefault(gid, {})
+        while q and now - q[0].at > RAID_WINDOW_SECONDS:
+            old = q.popleft()
+            left = names[old.name_key] - 1
+            if left:
+                names[old.name_key] = left
+            else:
+                del names[old.name_key]
+        if not q:
+            names.clear()
+
+        age = discord.utils.utcnow() - member.created_at
+        join = _Join(now, member, age < timedelta(days=RAID_MIN_ACCOUNT_AGE_DAYS), self._name_key(member))
+        q.append(join)
+        names[join.name_key] = names.get(join.name_key, 0) + 1
+
+        if self.active(gid, now):
+            if self._suspicious(join, names):
+                self._queue(member.guild, [member], RAID_BATCH_SECONDS, None)
+            return
+        if len(q) < raid_policy(gid)[1]:
+            return
+
+        # 감지: 창 안 의심 계정 전부 한 묶음으로
+        self.raids += 1
+        self._raid_until[gid] = now + RAID_MODE_SECONDS
+        cohort = [j.member for j in q if self._suspicious(j, names)]
+        note = f"{RAID_WINDOW_SECONDS:.0f}초 안에 {len(q)}명 입장"
+        q.clear()
+        names.clear()
+        self._queue(member.guild, cohort, 0.0, note)
+
+    def _queue(self, guild: discord.Guild, members: list[discord.Member], delay: float, note: str | None) -> None:
+        self._pending.setdefault(guild.id, []).extend(members)
+        if note is not None or guild.id not in self._tasks:
+            self._tasks[guild.id] = asyncio.get_running_loop().create_task(self._flush(guild, delay, note))
+
+    async def _flush(self, guild: discord.Guild, delay: float, note: str | None) -> None:
+        try:
+            if delay:
+                await asyncio.sleep(delay)
+            members = self._pending.pop(guild.id, [])
+            if members or note:
+                await self.respond(guild, members, note or "레이드 모드 중 의심 입장")
+        finally:
+            if self._tasks.get(guild.id) is asyncio.current_task():
+                del self._tasks[guild.id]
+
+    async def respond(self, guild: discord.Guild, members: list[discord.Member], note: str) -> None:
+        # 중복 제거(같은 계정이 나갔다 다시 들어온 경우 등)
+        members = list({m.id: m for m in members}.values())
+        action = raid_policy(guild.id)[0]
+        action = action if action in ("timeout", "kick") else None
+        reason = f"raid: {note}"
+        until = discord.utils.utcnow() + timedelta(minutes=RAID_TIMEOUT_MINUTES)
+        sem = asyncio.Semaphore(RAID_CONCURRENCY)
+
+        async def act(member: discord.Member) -> bool:
+            async with sem:
+                try:
+                    if action == "kick":
+                        await outbound(PRIO_MODERATION, member.kick, reason=reason, bucket=("guild", guild.id))
+                    else:
+                        await outbound(PRIO_MODERATION, member.timeout, until, reason=reason, bucket=("guild", guild.id))
+                    return True
+                except discord.NotFound:
+                    return False  # 이미 나감
+                except discord.HTTPException as e:
+                    print(f"[raid] {action} failed guild={guild.id} user={member.id}: {e}")
+                    return False
+
+        done: list[discord.Member] = []
+        if action and members:
+            results = await asyncio.gather(*(act(m) for m in members))
+            done = [m for m, ok in zip(members, results) if ok]
+            self.actioned += len(done)
+            self.failed += len(members) - len(done)
+            RAID_ACTIONS.inc("ok", amount=len(done))
+            RAID_ACTIONS.inc("failed", amount=len(members) - len(done))
+
+            ts = discord.utils.utcnow().isoformat()
+            by = str(client.user.id if client.user else 0)
+            await record_warnings(guild.id, [(m.id, {"by": by, "reason": reason, "ts": ts}) for m in done])
+
+        what = {"timeout": f"타임아웃 {RAID_TIMEOUT_MINUTES}분", "kick": "강퇴"}.get(action, "기록만")
+        shown = " ".join(m.mention for m in (done or members)[:30])
+        more = len(done or members) - 30
+        line = f"🚨 레이드: {note} → 의심 {len(members)}명 {what}"
+        if action:
+            line += f" (성공 {len(done)}, 실패 {len(members) - len(done)})"
+        if shown:
+            line += f"\n대상: {shown}" + (f" 외 {more}명" if more > 0 else "")
+        await log_action(guild, line)
+
+
+RAID_GUARD = RaidGuard()
+
+
+@tree.command(name="raidguard", description="(현재 서버) 레이드 대응 설정 (timeout/kick = 의심 계정 처벌, log = 알림만, off = 감지 끔)")
+@app_commands.checks.has_permissions(manage_guild=True)
+async def raidguard(
+    interaction: discord.Interaction,
+    action: Literal["timeout", "kick", "log", "off"],
+    joins: app_commands.Range[int, 3, 1000] | None = None,
+):
+    if not interaction.guild:
+        return await safe_reply(interaction, "서버에서만 가능.", ephemeral=True)
+
+    CONFIG.set_raid(interaction.guild.id, action, joins)
+    action, joins = raid_policy(interaction.guild.id)
+
+    what = {"timeout": f"의심 계정 타임아웃 {RAID_TIMEOUT_MINUTES}분 + 경고", "kick": "의심 계정 강퇴 + 경고",
+            "log": "로그 알림만", "off": "감지 안 함"}[action]
+    if action != "off":
+        what += f" ({RAID_WINDOW_SECONDS:.0f}초 안에 {joins}명 입장 시)"
+    await safe_reply(interaction, f"레이드 대응 설정: {what}", ephemeral=True)
+    await log_action(interaction.guild, f"🛡️ 레이드 대응 설정: {what} (관리자: {interaction.user.mention})")
+
+
+@client.event
+async def on_member_join(member: discord.Member):
+    if member.bot or raid_policy(member.guild.id)[0] == "off":
+        return
+    RAID_GUARD.on_join(member, time.monotonic())
+
+
 # =========================================================
 # 공통 에러 처리
 # =========================================================
@@ -462,21 +3867,181 @@ async def clearwarnings(interaction: discord.Interaction, member: discord.Member
 @setlog_g.error
 @setauto_g.error
 @delauto_g.error
+@bulkconfig.error
 @clear.error
 @warn.error
 @warnings.error
 @clearwarnings.error
+@warnexpiry.error
+@exportwarnings.error
+@filteradd.error
+@filterdel.error
+@filters.error
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    _observe_command(interaction, COMMAND_DURATION_SECONDS, "error")
     if isinstance(error, app_commands.MissingPermissions):
         return await safe_reply(interaction, "그 명령어 쓸 권한이 없어.", ephemeral=True)
     return await safe_reply(interaction, f"에러: {error}", ephemeral=True)
 
 
+# =========================
+# 정상 종료 (SIGTERM / SIGINT)
+# =========================
+_shutdown_task: asyncio.Task | None = None
+
+
+def write_warm_start() -> None:
+    snap = {
+        "v": 1,
+        "saved_at": time.time(),
+        "token": _token_tag(),
+        "shard_mode": SHARD_MODE,
+        "shard_count": client.shard_count,
+        "scheduler": AUTO_SCHEDULER.positions(),
+    }
+    try:
+        size = _write_json_atomic(WARM_START_FILE, snap)
+        print(f"[warm] snapshot saved ({size} bytes, {len(snap['scheduler'])} auto jobs)")
+    except Exception as e:
+        print(f"[warm] snapshot failed: {e}")
+
+
+async def graceful_shutdown(reason: str) -> None:
+    started = time.monotonic()
+    deadline = started + SHUTDOWN_DRAIN_SECONDS
+    print(f"[shutdown] {reason}: draining (max {SHUTDOWN_DRAIN_SECONDS:.0f}s)")
+    try:
+        await _drain(deadline)
+        # 상태 저장 한 번 + 웜 스타트 스냅샷
+        await _saver.flush()
+        await DELETE_QUEUE._saver.flush()
+        write_warm_start()
+    except Exception as e:
+        print(f"[shutdown] drain failed: {e}")
+    finally:
+        # 게이트웨이 정상 종료 (close 1000) → client.start()가 돌아옴
+        print(f"[shutdown] done in {time.monotonic() - started:.2f}s, closing gateway")
+        await client.close()
+
+
+async def _drain(deadline: float) -> None:
+    # 1) 새 예약 작업 중단. 셋 다 중간에 끊겨도 안전 (run_due는 동기, 정리/폴링은 다음에 다시 하면 됨)
+    #    stop()은 다음 회차까지 자는 동안엔 안 깨움(정리 주기 6시간) → cancel. 삭제 큐는 비우는 동안 계속 돌림
+    for loop_task in (auto_message_task, warn_compact_task, config_poll_task):
+        loop_task.cancel()
+    BACKGROUND_CHUNKER.cancel()
+    LOG_BATCHER.drain()
+
+    # 2) 나가는 요청 / 이미 시작한 예약 전송 / 로그가 다 빌 때까지 (interaction은 닫기 전까지 계속 받음)
+    while time.monotonic() < deadline:
+        if not (OUTBOUND.inflight or OUTBOUND.depth() or AUTO_SCHEDULER.busy() or LOG_BATCHER.busy()):
+            break
+        await asyncio.sleep(0.05)
+    else:
+        print(f"[shutdown] drain deadline: outbound inflight={OUTBOUND.inflight} queued={OUTBOUND.depth()} "
+              f"logs={LOG_BATCHER.depth()}")
+
+    # 3) 삭제 큐: 쉬는 중이면 바로 끝, 지우는 중이면 그 회차까지 (남은 예약은 파일에 저장 → 다음 시작 때 이어서)
+    if not DELETE_QUEUE.running:
+        auto_delete_task.cancel()
+    elif auto_delete_task.is_running():
+        auto_delete_task.stop()
+        while auto_delete_task.is_running() and time.monotonic() < deadline + 2:
+            await asyncio.sleep(0.05)
+
+
+def request_shutdown(reason: str) -> None:
+    global _shutdown_task
+    if _shutdown_task is not None:
+        print(f"[shutdown] {reason} again, already shutting down")
+        return
+    _shutdown_task = asyncio.get_running_loop().create_task(graceful_shutdown(reason))
+
+
 # =========================
 # 실행 (Render 포트 바인딩 포함)
 # =========================
 async def main():
-    await start_web_server()
-    await client.start(TOKEN)
+    lag_task = asyncio.create_task(loop_lag_monitor())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, request_shutdown, sig.name)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: 기존처럼 KeyboardInterrupt
+    try:
+        if IS_PRIMARY:  # cluster면 0번 워커만 포트를 잡음
+            await start_web_server()
+        await client.start(TOKEN)
+    finally:
+        lag_task.cancel()
+        await _saver.flush()
+        await DELETE_QUEUE._saver.flush()
+
+
+def recommended_shard_count() -> int:
+    import urllib.request
 
-asyncio.run(main())
+    req = urllib.request.Request(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={"Authorization": f"Bot {TOKEN}", "User-Agent": "DiscordBot (sbot, 1.0)"},
+    )
+    with urllib.request.urlopen(req, timeout=10) as res:
+        return int(json.load(res)["shards"])
+
+
+def run_cluster():
+    # 슈퍼바이저: 샤드를 CLUSTER_PROCESSES개 연속 구간으로 나눠 워커 프로세스(python sbot.py)를 띄우고,
+    # 죽으면 다시 띄움. SIGTERM 받으면 워커에 전달하고 다 끝날 때까지 기다림
+    warm = read_warm_start(os.getenv("WARM_START_FILE", "sbot_warm.0.json"), consume=False)  # 0번 워커가 남긴 것
+    total = SHARD_COUNT or (warm or {}).get("shard_count") or recommended_shard_count()
+    procs = max(1, min(CLUSTER_PROCESSES, total))
+    ranges = [list(range(i * total // procs, (i + 1) * total // procs)) for i in range(procs)]
+    print(f"[cluster] shards={total} processes={procs} ranges={[(r[0], r[-1]) for r in ranges]}")
+
+    def spawn(i: int) -> subprocess.Popen:
+        env = dict(os.environ, SHARD_MODE="cluster", CLUSTER_ID=str(i),
+                   SHARD_COUNT=str(total), SHARD_IDS=",".join(map(str, ranges[i])))
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+
+    workers = {i: spawn(i) for i in range(procs)}
+    started = {i: time.monotonic() for i in workers}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for p in workers.values():
+            if p.poll() is None:
+                p.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    backoff = {i: 1.0 for i in workers}
+    while True:
+        time.sleep(1)
+        if stopping:
+            for p in workers.values():
+                p.wait()
+            return
+        for i, p in list(workers.items()):
+            code = p.poll()
+            if code is None:
+                continue
+            if time.monotonic() - started[i] > 60:
+                backoff[i] = 1.0  # 한동안 잘 돌다 죽은 건 바로 재시작
+            print(f"[cluster] worker {i} exited ({code}), restarting in {backoff[i]:.0f}s")
+            time.sleep(backoff[i])
+            backoff[i] = min(backoff[i] * 2, 60)
+            workers[i] = spawn(i)
+            started[i] = time.monotonic()
+
+
+if __name__ == "__main__":
+    if not TOKEN:
+        raise RuntimeError("DISCORD_TOKEN 환경변수 설정 안 됨 (토큰을 환경변수로 넣어야 함)")
+    if SHARD_MODE == "cluster" and not IS_CLUSTER_WORKER:
+        run_cluster()
+    else:
+        asyncio.run(main())